@@ -0,0 +1,301 @@
+"""
+Headless HTTP API for Fashion Frenzy: chat (plain and streamed), product
+search, wardrobe CRUD and try-on jobs, without a Streamlit session.
+
+Run with several workers behind a load balancer:
+
+    uv run uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Model-calling requests carry the caller's Gemini key in the `X-Gemini-Key`
+header; only callers presenting FASHION_API_TOKEN as a Bearer token may fall
+back to the server's GEMINI_API_KEY. Changing the wardrobe always needs the
+token. State shared between workers lives in SQLite
+(conversations, catalog) and on disk (wardrobe, finished try-ons).
+"""
+import os
+import hmac
+import json
+import asyncio
+import tempfile
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse, FileResponse, Response
+from starlette.routing import Route
+
+from modules import wardrobe, telemetry, async_runtime, conversation_store, image_io, cutouts
+
+DEFAULT_CHAT_MODEL = "gemini-2.0-flash"
+DEFAULT_VTON_MODEL = "models/nano-banana-pro-preview"
+
+# Finished try-ons are written here so any worker can answer a poll
+TRYON_RESULTS_DIR = os.environ.get("FASHION_TRYON_DIR", os.path.join("data", "tryon"))
+
+# Largest accepted wardrobe upload (bytes)
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# Try-on jobs remembered per worker (finished results stay on disk regardless)
+MAX_TRACKED_JOBS = 256
+
+# Callers sending `Authorization: Bearer <token>` may change the wardrobe and use the server's
+# GEMINI_API_KEY; unset = nobody may
+API_TOKEN = os.environ.get("FASHION_API_TOKEN", "")
+
+_jobs = {}  # job id -> Future of (image, seconds), for renders started by this worker
+
+def _has_token(request: Request) -> bool:
+    presented = request.headers.get("authorization", "").encode("utf-8")
+    return bool(API_TOKEN) and hmac.compare_digest(presented, f"Bearer {API_TOKEN}".encode("utf-8"))
+
+def _require_token(request: Request):
+    """Wardrobe-changing routes: a Gemini key proves nothing about the caller, so only the API token counts."""
+    if not _has_token(request):
+        raise HTTPException(401, "Changing the wardrobe needs 'Authorization: Bearer <FASHION_API_TOKEN>'")
+
+def _api_key(request: Request) -> str:
+    """Gemini key for a model call: the caller's own, or the server's for API token holders only."""
+    api_key = request.headers.get("x-gemini-key")
+    if api_key:
+        return api_key
+    if not _has_token(request):
+        raise HTTPException(401, "Missing X-Gemini-Key header")
+    api_key = os.environ.get("GEMINI_API_KEY", "")
+    if not api_key:
+        raise HTTPException(503, "GEMINI_API_KEY is not configured on the server")
+    return api_key
+
+async def _json_body(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise HTTPException(400, "Body must be JSON")
+    if not isinstance(body, dict) or not body.get("message"):
+        raise HTTPException(400, "'message' is required")
+    return body
+
+def _chat_kwargs(request: Request, body: dict) -> dict:
+    """Arguments for chatbot.chat_with_gemini from a request body; persists to the user's conversation by default."""
+    api_key = _api_key(request)
+    conversation_ids = None
+    if body.get("persist", True):
+        user_id = conversation_store.user_id_for(api_key)
+        conversation_ids = (user_id, conversation_store.resume_session(user_id))
+    return {
+        "user_input": body["message"],
+        "history": body.get("history") or [],
+        "wardrobe_context": wardrobe.get_wardrobe_inventory(),
+        "api_key": api_key,
+        "model_name": body.get("model") or DEFAULT_CHAT_MODEL,
+        "user_gender": body.get("gender") or "Male",
+        "fast_mode": bool(body.get("fast", False)),
+        "conversation_ids": conversation_ids,
+    }
+
+def _run_chat(kwargs: dict, on_event=None) -> str:
+    from modules import chatbot
+    conversation_ids = kwargs["conversation_ids"]
+    if conversation_ids:
+        conversation_store.append_message(*conversation_ids, "user", kwargs["user_input"])
+    reply = chatbot.chat_with_gemini(**kwargs, on_event=on_event)
+    if conversation_ids:
+        conversation_store.append_message(*conversation_ids, "assistant", reply)
+    return reply
+
+async def chat(request: Request):
+    """POST /v1/chat {message, history?, gender?, model?, fast?, persist?} -> {reply}"""
+    kwargs = _chat_kwargs(request, await _json_body(request))
+    reply = await run_in_threadpool(_run_chat, kwargs)
+    return JSONResponse({"reply": reply})
+
+async def chat_stream(request: Request):
+    """
+    POST /v1/chat/stream, same body as /v1/chat. Server-sent events:
+    tool_call and products (cards ready before the intro is written), then reply.
+    """
+    kwargs = _chat_kwargs(request, await _json_body(request))
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_event(kind, data):
+        loop.call_soon_threadsafe(events.put_nowait, (kind, data))
+
+    async def produce():
+        try:
+            reply = await run_in_threadpool(_run_chat, kwargs, on_event)
+            await events.put(("reply", {"reply": reply}))
+        finally:
+            await events.put(None)
+
+    async def stream():
+        task = asyncio.create_task(produce())
+        try:
+            while (event := await events.get()) is not None:
+                kind, data = event
+                yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            task.cancel()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+async def search(request: Request):
+    """GET /v1/search?q=...&count=5 -> {products}; ranked and de-duplicated like chat results."""
+    from modules import ranking
+    from modules.ecommerce_scraper import search_products_async, SCRAPE_TIMEOUT
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        raise HTTPException(400, "'q' is required")
+    try:
+        count = max(1, min(int(request.query_params.get("count", "5")), 20))
+    except ValueError:
+        raise HTTPException(400, "'count' must be an integer")
+    # The scraper's browser lives on the shared async runtime loop, not on uvicorn's
+    future = async_runtime.submit(search_products_async(query, count, _api_key(request)))
+    try:
+        products = await asyncio.wait_for(asyncio.wrap_future(future), SCRAPE_TIMEOUT)
+    except asyncio.TimeoutError:
+        future.cancel()
+        raise HTTPException(504, f"Search did not finish within {SCRAPE_TIMEOUT:g}s")
+    return JSONResponse({"products": ranking.rank_products(products, query, count, request.query_params.get("gender"))})
+
+async def list_wardrobe(request: Request):
+    """GET /v1/wardrobe -> {folder: [file names]}"""
+    items = await run_in_threadpool(wardrobe.list_items)
+    return JSONResponse({wardrobe.CATEGORIES[category]: files for category, files in items.items()})
+
+def _item_path(request: Request) -> str:
+    path = wardrobe.item_path(request.path_params["folder"], request.path_params["name"])
+    if path is None:
+        raise HTTPException(404, "Unknown wardrobe category or file type")
+    return path
+
+async def get_item(request: Request):
+    path = _item_path(request)
+    if not os.path.exists(path):
+        raise HTTPException(404, "Item not found")
+    return FileResponse(path)
+
+async def put_item(request: Request):
+    """PUT /v1/wardrobe/{folder}/{name} with the raw image as the body; streamed to disk in chunks."""
+    _require_token(request)
+    path = _item_path(request)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    received = 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > MAX_UPLOAD_BYTES:
+                    raise HTTPException(413, "Upload too large")
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    cutouts.schedule(path)
+    telemetry.incr("api_uploads_total")
+    return JSONResponse({"path": path, "bytes": received}, status_code=201)
+
+async def delete_item(request: Request):
+    _require_token(request)
+    ok, msg = wardrobe.delete_item(_item_path(request))
+    return JSONResponse({"message": msg}, status_code=200 if ok else 404)
+
+def _result_path(job_id: str) -> str:
+    if not job_id.isalnum():
+        raise HTTPException(404, "Unknown job")
+    return os.path.join(TRYON_RESULTS_DIR, f"{job_id}.png")
+
+def _save_result(job_id: str, future):
+    if future.exception() is not None:
+        return
+    image, _ = future.result()
+    os.makedirs(TRYON_RESULTS_DIR, exist_ok=True)
+    tmp_path = _result_path(job_id) + ".tmp"
+    image.save(tmp_path, format="PNG")
+    os.replace(tmp_path, _result_path(job_id))
+
+async def _form_image(form, name: str, loader=image_io.load_image):
+    upload = form.get(name)
+    if upload is None or isinstance(upload, str):
+        return None
+    data = await upload.read()
+    return await run_in_threadpool(loader, data)
+
+async def submit_tryon(request: Request):
+    """
+    POST /v1/tryon (multipart): person file plus a garment file or
+    garment_item='<folder>/<name>' from the wardrobe; optional model.
+    Returns {job_id}; the id is the content hash, so resubmits are free.
+    """
+    from modules import vton
+    api_key = _api_key(request)
+    async with request.form(max_part_size=MAX_UPLOAD_BYTES) as form:
+        person = await _form_image(form, "person")
+        garment = await _form_image(form, "garment", cutouts.load_garment)
+        garment_item = form.get("garment_item")
+        model_name = form.get("model") or DEFAULT_VTON_MODEL
+    if garment is None and isinstance(garment_item, str) and "/" in garment_item:
+        path = wardrobe.item_path(*garment_item.split("/", 1))
+        if path and os.path.exists(path):
+            garment = await run_in_threadpool(cutouts.load_garment, path)
+    if person is None or garment is None:
+        raise HTTPException(400, "'person' and 'garment' (or 'garment_item') images are required")
+
+    job_id = await run_in_threadpool(vton.result_key, person, garment, model_name)
+    if not os.path.exists(_result_path(job_id)):
+        future = vton.start_full_render(person, garment, api_key, model_name)
+        future.add_done_callback(lambda f: _save_result(job_id, f))
+        _jobs[job_id] = future
+        while len(_jobs) > MAX_TRACKED_JOBS:
+            _jobs.pop(next(iter(_jobs)))
+    return JSONResponse({"job_id": job_id}, status_code=202)
+
+async def get_tryon(request: Request):
+    """GET /v1/tryon/{job_id} -> {status: pending|done|failed, seconds?, error?}"""
+    job_id = request.path_params["job_id"]
+    future = _jobs.get(job_id)
+    if os.path.exists(_result_path(job_id)):
+        finished = future is not None and future.done() and future.exception() is None
+        seconds = future.result()[1] if finished else None
+        return JSONResponse({"status": "done", "seconds": seconds, "image_url": f"/v1/tryon/{job_id}/image"})
+    if future is None:
+        raise HTTPException(404, "Unknown job (it may be running on another worker)")
+    if not future.done():
+        return JSONResponse({"status": "pending"})
+    if future.exception() is not None:
+        return JSONResponse({"status": "failed", "error": str(future.exception())})
+    # Finished but not yet on disk: the save callback is still writing
+    return JSONResponse({"status": "pending"})
+
+async def get_tryon_image(request: Request):
+    path = _result_path(request.path_params["job_id"])
+    if not os.path.exists(path):
+        raise HTTPException(404, "Result not ready")
+    return FileResponse(path, media_type="image/png")
+
+async def health(request: Request):
+    return Response("ok", media_type="text/plain")
+
+async def metrics(request: Request):
+    return Response(telemetry.export_prometheus(), media_type="text/plain; version=0.0.4")
+
+routes = [
+    Route("/healthz", health),
+    Route("/metrics", metrics),
+    Route("/v1/chat", chat, methods=["POST"]),
+    Route("/v1/chat/stream", chat_stream, methods=["POST"]),
+    Route("/v1/search", search),
+    Route("/v1/wardrobe", list_wardrobe),
+    Route("/v1/wardrobe/{folder}/{name}", get_item, methods=["GET"]),
+    Route("/v1/wardrobe/{folder}/{name}", put_item, methods=["PUT"]),
+    Route("/v1/wardrobe/{folder}/{name}", delete_item, methods=["DELETE"]),
+    Route("/v1/tryon", submit_tryon, methods=["POST"]),
+    Route("/v1/tryon/{job_id}", get_tryon),
+    Route("/v1/tryon/{job_id}/image", get_tryon_image),
+]
+
+wardrobe.init_wardrobe()
+app = Starlette(routes=routes)
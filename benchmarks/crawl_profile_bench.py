@@ -0,0 +1,145 @@
+"""
+Page-load benchmark for the scraper's crawl profiles against a local fixture
+storefront, so it needs no network and no Gemini key (extraction is skipped).
+
+The fixture search page mimics an Amazon results page: a few result cards up
+front and more appended as the user scrolls, a web font, an autoplaying promo
+video, an ad script and tracking pixels. "full" is the old page load (every
+resource, fixed-sleep scroll script); "lean" blocks fonts, media and trackers
+and waits until enough result cards exist.
+
+Usage (from the repo root; needs `crawl4ai-setup` to have installed a browser):
+    uv run python benchmarks/crawl_profile_bench.py [--pages 5] [--cards 10]
+"""
+import os
+import re
+import sys
+import asyncio
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import crawl_profile, storefronts
+
+CARDS_PER_BATCH = 4
+MAX_CARDS = 24
+
+SEARCH_PAGE = """<!doctype html>
+<html><head>
+<style>
+  @font-face { font-family: Brand; src: url(/fonts/brand.woff2); }
+  body { font-family: Brand, sans-serif; }
+  .s-result-item { height: 420px; }
+</style>
+<script src="/ads/banner.js"></script>
+</head><body>
+<video src="/media/promo.mp4" autoplay muted></video>
+<img src="/analytics/pixel.gif" width="1" height="1">
+<div class="s-main-slot"></div>
+<script>
+  const slot = document.querySelector('.s-main-slot');
+  let made = 0, loading = false;
+  function batch() {
+    for (let i = 0; i < %(batch)d && made < %(max)d; i++, made++) {
+      slot.insertAdjacentHTML('beforeend',
+        '<div class="s-result-item" data-component-type="s-search-result">' +
+        '<a href="/dp/B0FIXTURE' + made + '"><h2>Fixture kurta ' + made + '</h2></a>' +
+        '<img src="/images/' + made + '.jpg"><span class="a-price">₹' + (499 + made * 50) + '</span>' +
+        '<span class="a-icon-alt">4.' + (made %% 10) + ' out of 5 stars</span></div>');
+    }
+  }
+  batch();
+  // Next batch arrives a moment after the user nears the bottom, like a lazy-loading API call
+  window.addEventListener('scroll', () => {
+    if (loading || made >= %(max)d) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 800) return;
+    loading = true;
+    setTimeout(() => { batch(); loading = false; }, 250);
+  });
+</script>
+</body></html>
+"""
+
+# Static payloads by path prefix: (content type, size in bytes)
+ASSETS = {
+    "/fonts/": ("font/woff2", 180 * 1024),
+    "/media/": ("video/mp4", 2 * 1024 * 1024),
+    "/ads/": ("application/javascript", 90 * 1024),
+    "/analytics/": ("image/gif", 43),
+    "/images/": ("image/jpeg", 12 * 1024),
+}
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/s"):
+            body = (SEARCH_PAGE % {"batch": CARDS_PER_BATCH, "max": MAX_CARDS}).encode("utf-8")
+            content_type = "text/html; charset=utf-8"
+        else:
+            prefix = next((p for p in ASSETS if self.path.startswith(p)), None)
+            if prefix is None:
+                self.send_error(404)
+                return
+            content_type, size = ASSETS[prefix]
+            body = b"/" * size if content_type.endswith("javascript") else b"\0" * size
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_fixture_server() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+async def run_profile(profile: str, base_url: str, pages: int, cards: int) -> list:
+    from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+
+    adapter = storefronts.AmazonAdapter(base_url=base_url)
+    runs = []
+    async with AsyncWebCrawler(config=BrowserConfig(headless=True, verbose=False)) as crawler:
+        crawl_profile.install_hooks(crawler)
+        for page in range(1, pages + 1):
+            run_config = CrawlerRunConfig(
+                cache_mode=CacheMode.BYPASS,
+                page_timeout=30000,
+                **crawl_profile.run_config_kwargs(adapter, cards, profile)
+            )
+            with crawl_profile.track_page(adapter.name, profile) as stats:
+                result = await crawler.arun(url=adapter.build_url("kurta", page), config=run_config)
+            stats["cards"] = len(re.findall(r'data-component-type="s-search-result"', result.html or ""))
+            runs.append(stats)
+    return runs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=5, help="page loads per profile")
+    parser.add_argument("--cards", type=int, default=10, help="result cards the scraper asks for")
+    args = parser.parse_args()
+
+    base_url = start_fixture_server()
+    print(f"Fixture storefront at {base_url}")
+    summary = {}
+    for profile in ("full", "lean"):
+        runs = asyncio.run(run_profile(profile, base_url, args.pages, args.cards))
+        summary[profile] = {
+            "seconds": statistics.median(r["seconds"] for r in runs),
+            "kb": statistics.median(r["bytes"] for r in runs) / 1024,
+            "blocked": statistics.median(sum(r["blocked"].values()) for r in runs),
+            "cards": min(r["cards"] for r in runs),
+        }
+
+    print(f"\n{'profile':>8} {'median s/page':>14} {'median KB/page':>15} {'blocked':>8} {'min cards':>10}")
+    for profile, row in summary.items():
+        print(f"{profile:>8} {row['seconds']:>14.2f} {row['kb']:>15.0f} {row['blocked']:>8.0f} {row['cards']:>10}")
+    full, lean = summary["full"], summary["lean"]
+    print(f"\nlean saves {full['seconds'] - lean['seconds']:.2f}s and {full['kb'] - lean['kb']:.0f} KB per page")
+
+if __name__ == "__main__":
+    main()
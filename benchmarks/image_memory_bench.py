@@ -0,0 +1,103 @@
+"""
+Memory benchmark for wardrobe image handling: RSS and open file handles while
+several sessions render the wardrobe grid, as the wardrobe grows.
+
+"naive" mimics the old render_left_column: Image.open per file, full decode,
+and st.image re-encoding the full-resolution image into each session's media
+store. "image_io" uses modules.image_io: draft-mode thumbnails, closed
+handles and one shared decoded-image LRU. Each case runs in a fresh
+interpreter so the numbers do not bleed into each other.
+
+Usage (from the repo root):
+    uv run python benchmarks/image_memory_bench.py [--sizes 10 30 60] [--sessions 4]
+"""
+import io
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Typical phone photo of a garment
+ITEM_SIZE = (2448, 3264)
+
+def make_wardrobe(root: str, count: int, start: int = 0):
+    """Writes synthetic JPEG items start..count-1 into root."""
+    from PIL import Image, ImageDraw
+    os.makedirs(root, exist_ok=True)
+    for i in range(start, count):
+        img = Image.new("RGB", ITEM_SIZE, (40 + i * 7 % 200, 90, 160))
+        draw = ImageDraw.Draw(img)
+        for y in range(0, ITEM_SIZE[1], 48):
+            draw.line([(0, y), (ITEM_SIZE[0], (y * 3 + i * 11) % ITEM_SIZE[1])], fill=(i * 13 % 255, y % 255, 200), width=9)
+        img.save(os.path.join(root, f"item_{i:03d}.jpg"), quality=90)
+
+def _rss_mb() -> float:
+    import psutil
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
+def _open_fds() -> int:
+    import psutil
+    process = psutil.Process()
+    return process.num_fds() if hasattr(process, "num_fds") else len(process.open_files())
+
+def run_case(mode: str, root: str, sessions: int) -> dict:
+    """Child process: renders the grid once per session and reports memory."""
+    sys.path.insert(0, REPO_ROOT)
+    from PIL import Image
+    from modules import image_io
+
+    paths = sorted(os.path.join(root, f) for f in os.listdir(root))
+    baseline = _rss_mb()
+    media_stores = []  # per-session bytes, like Streamlit's media file manager
+    for _ in range(sessions):
+        store = []
+        for path in paths:
+            if mode == "naive":
+                img = Image.open(path)  # never closed explicitly, as before
+                img.load()
+            else:
+                img = image_io.load_thumbnail(path)
+            with io.BytesIO() as buf:
+                img.save(buf, format="JPEG", quality=90)
+                store.append(buf.getvalue())
+        media_stores.append(store)
+    return {
+        "rss_mb": round(_rss_mb() - baseline, 1),
+        "per_session_mb": round(sum(len(b) for b in media_stores[-1]) / 1024 / 1024, 2),
+        "open_fds": _open_fds(),
+        "decoded_cache_mb": round(image_io.cache_stats()["bytes"] / 1024 / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 30, 60], help="wardrobe sizes to test")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "ROOT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child[0], args.child[1], args.sessions)))
+        return
+
+    print(f"{'items':>6} {'mode':>9} {'RSS +MB':>9} {'media MB/session':>17} {'open fds':>9} {'LRU MB':>7}")
+    with tempfile.TemporaryDirectory() as root:
+        made = 0
+        for size in sorted(args.sizes):
+            # Grow the same wardrobe instead of regenerating it
+            make_wardrobe(root, size, start=made)
+            made = size
+            for mode in ("naive", "image_io"):
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--sessions", str(args.sessions), "--child", mode, root],
+                    cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+                )
+                result = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{size:>6} {mode:>9} {result['rss_mb']:>9} {result['per_session_mb']:>17} "
+                      f"{result['open_fds']:>9} {result['decoded_cache_mb']:>7}")
+
+if __name__ == "__main__":
+    main()
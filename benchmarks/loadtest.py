@@ -0,0 +1,436 @@
+"""
+Load test: how many concurrent sessions one app process handles before it
+saturates.
+
+Each simulated session runs scripted user journeys through the same service
+calls a Streamlit rerun makes: open the page (wardrobe scan, grid thumbnails,
+inventory context), upload a garment, chat (half the questions trigger a
+product search), and generate a try-on. Streamlit's AppTest cannot run
+sessions concurrently, so sessions are threads calling the service layer.
+
+Nothing leaves the machine: a local Gemini stand-in answers generateContent
+calls (text, search tool calls and try-on images) after a lognormal delay,
+and a stand-in storefront serves search pages that the scraper's page step
+fetches and parses instead of launching a browser. Both run in a separate
+process, so their encoding work and threads are not counted against the app.
+Everything else (rate limiter, caches, ranking, catalog, conversation store)
+is the real code.
+
+Before the first stage the app modules are imported and one untimed journey
+runs, so lazy imports and clients are not billed to the first stage's memory.
+Concurrency ramps through --stages; each stage reports throughput, step
+latency percentiles, CPU and memory per session, and the run ends with the
+estimated saturation point.
+
+Usage (from the repo root):
+    uv run python benchmarks/loadtest.py [--stages 1 2 4 8 16 32] [--stage-seconds 30]
+        [--gemini-latency 1.2] [--store-latency 0.8] [--shared-key] [--no-rate-limit]
+"""
+import io
+import os
+import re
+import sys
+import json
+import math
+import time
+import base64
+import contextlib
+import random
+import asyncio
+import argparse
+import shutil
+import tempfile
+import threading
+import multiprocessing
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHAT_MODEL = "gemini-2.0-flash"
+VTON_MODEL = "models/nano-banana-pro-preview"
+
+STYLING_QUESTIONS = [
+    "What goes with a black shirt?",
+    "What should I wear to the office tomorrow?",
+    "Wedding outfit ideas from my wardrobe",
+    "Is navy a good match for beige chinos?",
+    "What to wear for a casual brunch",
+    "How do I style a white kurta?",
+]
+SHOPPING_QUESTIONS = [
+    "Find me a red kurta for Diwali",
+    "Show me white sneakers under 3000",
+    "I need a navy blazer for a wedding",
+    "Search for linen shirts for summer",
+    "Get me black formal shoes",
+    "Looking for a beige chinos pant",
+]
+GARMENT_NAMES = ["black_shirt", "white_kurta", "navy_blazer", "beige_chinos", "blue_jeans", "red_saree"]
+
+# Kept per session; older uploads are deleted, which also exercises cache invalidation
+MAX_UPLOADS_PER_SESSION = 3
+
+STEPS = ("page", "upload", "chat", "tryon")
+
+# --- Stand-ins ---------------------------------------------------------------
+
+def _sample_latency(mean: float) -> float:
+    return random.lognormvariate(math.log(max(mean, 0.001)), 0.35)
+
+class GeminiStandIn(BaseHTTPRequestHandler):
+    """Answers POST .../models/<model>:generateContent like the Gemini REST API."""
+    latency = 1.2
+    image_latency = 6.0
+    image_bytes = b""
+
+    def do_POST(self):
+        match = re.search(r"/models/(.+):generateContent", self.path)
+        if not match:
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = body.get("generationConfig") or {}
+        if "IMAGE" in (config.get("responseModalities") or []):
+            time.sleep(_sample_latency(self.image_latency))
+            parts = [{"inlineData": {"mimeType": "image/jpeg", "data": base64.b64encode(self.image_bytes).decode()}}]
+        else:
+            time.sleep(_sample_latency(self.latency))
+            parts = [self._chat_part(body)]
+        payload = json.dumps({
+            "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": 900, "candidatesTokenCount": 80, "totalTokenCount": 980},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _chat_part(self, body: dict) -> dict:
+        from modules import prefetch
+        last = (body.get("contents") or [{}])[-1]
+        text = " ".join(p.get("text", "") for p in last.get("parts", []))
+        if body.get("tools") and text and prefetch.SHOPPING_INTENT.search(text):
+            query = prefetch.extract_candidate_query(text, "male") or text
+            return {"functionCall": {"name": "search_products", "args": {"product_name": query, "record_count": 5}}}
+        return {"text": "Pair it with neutral chinos and white sneakers for an easy, polished look."}
+
+    def log_message(self, *args):
+        pass
+
+class StorefrontStandIn(BaseHTTPRequestHandler):
+    """Search result pages with one product card per line, after a storefront-like delay."""
+    latency = 0.8
+    cards = 16
+
+    def do_GET(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        words = (query.get("k") or query.get("q") or ["item"])[0].replace("+", " ")
+        time.sleep(_sample_latency(self.latency))
+        rows = []
+        for i in range(self.cards):
+            rows.append(
+                f'<div class="card" data-name="{words} style {i}" data-price="{499 + 37 * i}" '
+                f'data-rating="{3.5 + (i % 15) / 10:.1f}" data-link="/dp/B0LOAD{i:04d}" data-image="/img/{i}.jpg"></div>'
+            )
+        body = "\n".join(rows).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+CARD = re.compile(r'data-name="([^"]+)" data-price="(\d+)" data-rating="([\d.]+)" data-link="([^"]+)" data-image="([^"]+)"')
+
+async def standin_scrape_page(adapter, product_name, page, record_count, api_key):
+    """Replaces the browser crawl + LLM extraction of one page with an HTTP fetch and a regex."""
+    def fetch():
+        with urllib.request.urlopen(adapter.build_url(product_name, page), timeout=30) as response:
+            return response.read().decode("utf-8")
+    html = await asyncio.to_thread(fetch)
+    products = [{
+        "product_name": name, "actual_price": f"₹{int(price) + 300}", "offer_price": f"₹{price}",
+        "rating": f"{rating} out of 5 stars", "review_count": "1,024 ratings",
+        "image_link": image, "product_link": link, "occasion_fit": "",
+    } for name, price, rating, link, image in CARD.findall(html)]
+    return adapter.parse([{"products": products}])
+
+def _serve(handler) -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def _run_standins(latencies: tuple, conn):
+    """Child process entry: serves both stand-ins and sends their URLs back until terminated."""
+    sys.path.insert(0, REPO_ROOT)
+    GeminiStandIn.latency, GeminiStandIn.image_latency, StorefrontStandIn.latency = latencies
+    GeminiStandIn.image_bytes = _jpeg((768, 1024), (180, 160, 150))
+    conn.send((_serve(GeminiStandIn), _serve(StorefrontStandIn)))
+    conn.close()
+    threading.Event().wait()
+
+def start_standins(args):
+    """Starts the stand-ins in their own process; returns (process, gemini_url, store_url)."""
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe()
+    process = context.Process(
+        target=_run_standins, args=((args.gemini_latency, args.image_latency, args.store_latency), child), daemon=True
+    )
+    process.start()
+    gemini_url, store_url = parent.recv()
+    return process, gemini_url, store_url
+
+# --- Sessions ----------------------------------------------------------------
+
+class _Upload:
+    """Just enough of Streamlit's UploadedFile for wardrobe.save_uploaded_item."""
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self._data = data
+
+    def getbuffer(self):
+        return memoryview(self._data)
+
+def _jpeg(size, color) -> bytes:
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+class Session(threading.Thread):
+    def __init__(self, session_no: int, deadline: float, args, results: list):
+        super().__init__(daemon=True)
+        self.no = session_no
+        self.deadline = deadline
+        self.args = args
+        self.results = results  # shared list of (step, seconds, ok)
+        self.api_key = "loadtest-shared" if args.shared_key else f"loadtest-{session_no}"
+        self.uploads = []
+        self.history = []
+        self.journeys = 0
+
+    def _timed(self, step: str, fn):
+        start = time.perf_counter()
+        ok = True
+        try:
+            ok = fn() is not False
+        except Exception as e:
+            ok = False
+            print(f"⚠️ LOADTEST: session {self.no} {step} failed: {e}")
+        self.results.append((step, time.perf_counter() - start, ok))
+        return ok
+
+    def _think(self):
+        time.sleep(random.uniform(0, 2 * self.args.think))
+
+    def page(self):
+        from modules import wardrobe, image_io
+        for category, files in wardrobe.list_items().items():
+            folder = wardrobe.CATEGORIES[category]
+            for name in files:
+                path = os.path.join(wardrobe.WARDROBE_ROOT, folder, name)
+                if os.path.exists(path):
+                    image_io.load_thumbnail(path)
+        self.inventory = wardrobe.get_wardrobe_inventory()
+
+    def upload(self):
+        from modules import wardrobe
+        name = f"s{self.no}_{len(self.uploads)}_{random.choice(GARMENT_NAMES)}.jpg"
+        category = random.choice(["Upper Body", "Lower Body"])
+        color = tuple(random.randrange(256) for _ in range(3))
+        self.uploads.append(wardrobe.save_uploaded_item(_Upload(name, _jpeg((1200, 1600), color)), category))
+        while len(self.uploads) > MAX_UPLOADS_PER_SESSION:
+            wardrobe.delete_item(self.uploads.pop(0))
+
+    def chat(self):
+        from modules import chatbot, conversation_store
+        question = random.choice(SHOPPING_QUESTIONS if random.random() < 0.5 else STYLING_QUESTIONS)
+        if random.random() >= self.args.repeat_ratio:
+            # A detail no other question shares, so the semantic cache cannot answer it
+            question += f" (size {random.randint(26, 46)}, budget {random.randint(5, 99) * 100})"
+        user_id = conversation_store.user_id_for(self.api_key)
+        reply = chatbot.chat_with_gemini(
+            question, self.history[-6:], self.inventory, api_key=self.api_key, model_name=CHAT_MODEL,
+            user_gender="Male", fast_mode=False, conversation_ids=(user_id, f"loadtest-{self.no}"),
+        )
+        self.history += [{"role": "user", "content": question}, {"role": "assistant", "content": reply}]
+        return not reply.startswith("Error connecting to Gemini")
+
+    def tryon(self):
+        from modules import vton, cutouts
+        garment = cutouts.load_garment(self.uploads[-1])
+        vton.generate_tryon(self.person, garment, self.api_key, VTON_MODEL)
+
+    def run(self):
+        from PIL import Image
+        self.person = Image.new("RGB", (768, 1024), (120 + self.no % 100, 100, 90))
+        self.inventory = ""
+        while time.monotonic() < self.deadline:
+            for step in STEPS:
+                if time.monotonic() >= self.deadline:
+                    return
+                self._timed(step, getattr(self, step))
+                self._think()
+            self.journeys += 1
+
+# --- Measurement -------------------------------------------------------------
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else float("nan")
+
+class ResourceSampler(threading.Thread):
+    """Samples process CPU time and RSS while a stage runs."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        import psutil
+        self.process = psutil.Process()
+        self.stop = threading.Event()
+        self.peak_rss = self.process.memory_info().rss
+
+    def run(self):
+        while not self.stop.wait(0.5):
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def cpu_seconds(self) -> float:
+        times = self.process.cpu_times()
+        return times.user + times.system
+
+# Everything a journey imports lazily; loaded before the first stage's baseline RSS
+APP_MODULES = (
+    "modules.chatbot", "modules.vton", "modules.cutouts", "modules.ecommerce_scraper", "modules.ranking",
+    "modules.image_io", "modules.conversation_store", "modules.product_catalog", "modules.prefetch",
+)
+
+def warm_up(args):
+    """Imports the app modules and runs one untimed journey, so stage 1 measures sessions, not startup."""
+    import importlib
+    from PIL import Image
+    from modules import wardrobe
+    for name in APP_MODULES:
+        importlib.import_module(name)
+    session = Session(-1, float("inf"), args, [])
+    session.api_key = "loadtest-warmup"
+    session.person = Image.new("RGB", (768, 1024), (120, 100, 90))
+    session.inventory = ""
+    for step in STEPS:
+        session._timed(step, getattr(session, step))
+    for path in session.uploads:
+        wardrobe.delete_item(path)
+
+def run_stage(sessions: int, args) -> dict:
+    results = []
+    sampler = ResourceSampler()
+    baseline_rss = sampler.process.memory_info().rss
+    cpu_start, wall_start = sampler.cpu_seconds(), time.perf_counter()
+    sampler.start()
+    deadline = time.monotonic() + args.stage_seconds
+    threads = [Session(n, deadline, args, results) for n in range(sessions)]
+    for thread in threads:
+        thread.start()
+        time.sleep(args.ramp_gap)  # stagger arrivals
+    for thread in threads:
+        thread.join()
+    sampler.stop.set()
+    wall = time.perf_counter() - wall_start
+    cpu = sampler.cpu_seconds() - cpu_start
+
+    by_step = {step: [s for name, s, ok in results if name == step and ok] for step in STEPS}
+    errors = sum(1 for _, _, ok in results if not ok)
+    journeys = sum(t.journeys for t in threads)
+    return {
+        "sessions": sessions,
+        "journeys_per_min": journeys / wall * 60,
+        "steps_per_s": len(results) / wall,
+        "error_rate": errors / len(results) if results else 0.0,
+        "latency": {step: (_percentile(v, 0.5), _percentile(v, 0.95), _percentile(v, 0.99)) for step, v in by_step.items()},
+        "cpu_cores": cpu / wall,
+        "cpu_per_session": cpu / wall / sessions,
+        "rss_mb": sampler.peak_rss / 1024 / 1024,
+        "rss_per_session_mb": max(0, sampler.peak_rss - baseline_rss) / 1024 / 1024 / sessions,
+    }
+
+def saturation_point(stages: list) -> str:
+    """First stage where adding sessions stops adding throughput, or latency/errors blow up."""
+    base_p95 = stages[0]["latency"]["chat"][1]
+    for prev, cur in zip(stages, stages[1:]):
+        gain = cur["journeys_per_min"] / prev["journeys_per_min"] if prev["journeys_per_min"] else 0
+        expected = cur["sessions"] / prev["sessions"]
+        if cur["error_rate"] > 0.01:
+            return f"~{prev['sessions']} sessions (errors reach {cur['error_rate']:.1%} at {cur['sessions']})"
+        if gain < 1 + 0.25 * (expected - 1):
+            return f"~{prev['sessions']} sessions (throughput grows only {gain:.2f}x from {prev['sessions']} to {cur['sessions']})"
+        if cur["latency"]["chat"][1] > 2 * base_p95:
+            return f"~{prev['sessions']} sessions (chat p95 doubles at {cur['sessions']})"
+    return f"not reached at {stages[-1]['sessions']} sessions; extend --stages"
+
+def print_stage(row: dict):
+    lat = " ".join(f"{step} {row['latency'][step][0]:.2f}/{row['latency'][step][1]:.2f}/{row['latency'][step][2]:.2f}"
+                   for step in STEPS)
+    print(f"{row['sessions']:>5} {row['journeys_per_min']:>9.1f} {row['steps_per_s']:>8.2f} {row['error_rate']:>6.1%} "
+          f"{row['cpu_cores']:>6.2f} {row['cpu_per_session']:>8.3f} {row['rss_mb']:>7.0f} {row['rss_per_session_mb']:>8.1f}   {lat}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="concurrent sessions per stage")
+    parser.add_argument("--stage-seconds", type=float, default=30)
+    parser.add_argument("--ramp-gap", type=float, default=0.1, help="seconds between session starts")
+    parser.add_argument("--think", type=float, default=0.5, help="mean user think time between steps (s)")
+    parser.add_argument("--gemini-latency", type=float, default=1.2, help="median chat response time (s)")
+    parser.add_argument("--image-latency", type=float, default=6.0, help="median try-on response time (s)")
+    parser.add_argument("--store-latency", type=float, default=0.8, help="median storefront page time (s)")
+    parser.add_argument("--shared-key", action="store_true", help="all sessions share one Gemini key (one rate-limit bucket)")
+    parser.add_argument("--no-rate-limit", action="store_true", help="lift per-model request limits to find raw capacity")
+    parser.add_argument("--repeat-ratio", type=float, default=0.3,
+                        help="share of chat questions asked verbatim from a small pool (semantic cache hits)")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    parser.add_argument("--json", help="also write the stage results to this file")
+    args = parser.parse_args()
+
+    standins, gemini_url, store_url = start_standins(args)
+
+    # Relative data paths (wardrobe, SQLite stores, try-on dir) land in a scratch directory
+    workdir = tempfile.mkdtemp(prefix="fashion-loadtest-")
+    os.chdir(workdir)
+    os.environ["GEMINI_BASE_URL"] = gemini_url
+    os.environ["SCRAPER_SITES"] = "amazon"
+    os.environ["AMAZON_BASE_URL"] = store_url
+    sys.path.insert(0, REPO_ROOT)
+
+    from modules import wardrobe, rate_limiter, ecommerce_scraper
+    wardrobe.init_wardrobe()
+    ecommerce_scraper._scrape_page = standin_scrape_page
+    if args.no_rate_limit:
+        rate_limiter.MODEL_LIMITS.clear()
+        rate_limiter.DEFAULT_RPM, rate_limiter.DEFAULT_CONCURRENCY = 10 ** 6, 10 ** 4
+
+    print(f"Gemini stand-in {gemini_url}, storefront stand-in {store_url}, data in {workdir}")
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+        warm_up(args)
+    print(f"\n{'sess':>5} {'jour/min':>9} {'steps/s':>8} {'errors':>6} {'CPU':>6} {'CPU/sess':>8} {'RSS MB':>7} {'MB/sess':>8}"
+          f"   step latency p50/p95/p99 (s)")
+    stages = []
+    for sessions in args.stages:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+            row = run_stage(sessions, args)
+        stages.append(row)
+        print_stage(row)
+
+    print(f"\nSaturation point: {saturation_point(stages)}")
+    if args.json:
+        with open(os.path.join(REPO_ROOT, args.json) if not os.path.isabs(args.json) else args.json, "w") as f:
+            json.dump(stages, f, indent=2)
+    os.chdir(REPO_ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+    standins.terminate()
+
+if __name__ == "__main__":
+    main()
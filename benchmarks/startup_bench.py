@@ -0,0 +1,83 @@
+"""
+Cold-start benchmark: time from the start of the Streamlit script to its first
+render (the welcome screen), in fresh interpreters.
+
+Each run executes main.py once with streamlit.testing's AppTest, which runs the
+script exactly as a new browser session would (imports, page config, CSS,
+widgets) and returns when the first render is complete. Importing Streamlit
+itself is excluded, since a server has it loaded before any session starts.
+Pass --baseline to run the same measurement on another commit (checked out
+into a temporary git worktree) and print the difference.
+
+Usage (from the repo root):
+    uv run python benchmarks/startup_bench.py [--runs 7] [--baseline <git ref>]
+
+e.g. --baseline fc383c0 compares against main.py before heavy imports were deferred.
+"""
+import os
+import sys
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy packages worth reporting when the first render already needed them
+HEAVY_PACKAGES = ("google.genai", "crawl4ai", "playwright", "pydantic", "PIL", "numpy")
+
+# Runs main.py to its first render; prints the seconds it took and the heavy packages it loaded
+FIRST_RENDER = f"""
+import sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file("main.py", default_timeout=120).run()
+elapsed = time.perf_counter() - start
+if app.exception:
+    raise SystemExit(f"main.py raised: {{app.exception[0].value}}")
+print("loaded:" + ",".join(p for p in {HEAVY_PACKAGES!r} if p in sys.modules))
+print(elapsed)
+"""
+
+def time_first_render(tree: str, runs: int) -> tuple:
+    """(seconds per run, heavy packages loaded by the first render)."""
+    timings, loaded = [], ""
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", FIRST_RENDER], cwd=tree, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(f"❌ First render failed in {tree}:\n{proc.stderr.strip()[-2000:]}")
+        loaded, elapsed = proc.stdout.strip().splitlines()[-2:]
+        timings.append(float(elapsed))
+        loaded = loaded[len("loaded:"):]
+    return timings, loaded
+
+def report(label: str, tree: str, runs: int) -> float:
+    timings, loaded = time_first_render(tree, runs)
+    median = statistics.median(timings)
+    print(f"{label:<24} median {median * 1000:8.1f} ms  (min {min(timings) * 1000:.1f} ms over {runs} runs)")
+    print(f"{'':<24} loaded before first render: {loaded.replace(',', ', ') or 'none of ' + ', '.join(HEAVY_PACKAGES)}")
+    return median
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--baseline", help="git ref to compare against, e.g. fc383c0")
+    args = parser.parse_args()
+
+    now = report("current tree", REPO_ROOT, args.runs)
+    if not args.baseline:
+        return
+
+    with tempfile.TemporaryDirectory(prefix="startup-bench-") as tmp:
+        tree = os.path.join(tmp, "baseline")
+        subprocess.run(["git", "worktree", "add", "--detach", "--quiet", tree, args.baseline], cwd=REPO_ROOT, check=True)
+        try:
+            before = report(f"baseline ({args.baseline})", tree, args.runs)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", tree], cwd=REPO_ROOT, check=True)
+
+    print(f"\nTime to first render: {before * 1000:.1f} ms -> {now * 1000:.1f} ms, "
+          f"{(before - now) * 1000:.1f} ms saved ({(1 - now / before) * 100:.0f}%)")
+
+if __name__ == "__main__":
+    main()
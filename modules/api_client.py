@@ -0,0 +1,67 @@
+import os
+import time
+from typing import List, Dict, Optional
+
+# When set, the Streamlit app sends chat and try-on work to this api.py deployment instead of running it in-process
+API_URL = os.environ.get("FASHION_API_URL", "").rstrip("/")
+
+CHAT_TIMEOUT = 120
+TRYON_TIMEOUT = 300
+POLL_INTERVAL = 1.0
+
+_client = None
+
+def enabled() -> bool:
+    return bool(API_URL)
+
+def _http():
+    global _client
+    if _client is None:
+        # Imported lazily: only thin-client deployments need it
+        import httpx
+        # One pooled client per Streamlit server process
+        _client = httpx.Client(base_url=API_URL, timeout=httpx.Timeout(30.0, read=CHAT_TIMEOUT))
+    return _client
+
+def chat(message: str, history: List[Dict], api_key: str, model: str, gender: str, fast: bool) -> str:
+    """Runs one chat turn on the API. The app persists its own history, so the API does not."""
+    response = _http().post(
+        "/v1/chat",
+        json={
+            "message": message,
+            "history": [{"role": m["role"], "content": m["content"]} for m in history],
+            "model": model,
+            "gender": gender,
+            "fast": fast,
+            "persist": False,
+        },
+        headers={"X-Gemini-Key": api_key},
+    )
+    response.raise_for_status()
+    return response.json()["reply"]
+
+def tryon(person_bytes: bytes, garment_bytes: bytes, api_key: str, model: str) -> Optional[bytes]:
+    """Submits a try-on job and polls until the PNG is ready; returns None on failure or timeout."""
+    http = _http()
+    response = http.post(
+        "/v1/tryon",
+        files={"person": ("person", person_bytes), "garment": ("garment", garment_bytes)},
+        data={"model": model},
+        headers={"X-Gemini-Key": api_key},
+    )
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    deadline = time.monotonic() + TRYON_TIMEOUT
+    while time.monotonic() < deadline:
+        response = http.get(f"/v1/tryon/{job_id}")
+        # 404: the job is running on another worker and its result is not on shared disk yet
+        status = response.json() if response.status_code == 200 else {}
+        if status.get("status") == "done":
+            return http.get(status["image_url"]).content
+        if status.get("status") == "failed":
+            print(f"❌ API CLIENT: Try-on failed: {status.get('error')}")
+            return None
+        time.sleep(POLL_INTERVAL)
+    print("⚠️ API CLIENT: Try-on timed out")
+    return None
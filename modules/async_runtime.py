@@ -0,0 +1,79 @@
+import atexit
+import asyncio
+import threading
+import concurrent.futures
+
+# One long-lived event loop for all async I/O (scraper browser, Gemini aio client, prefetch).
+# Streamlit script threads never run a loop themselves; they submit work here and wait on futures.
+
+_loop = None
+_thread = None
+_lock = threading.Lock()
+_shutdown_hooks = []
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Returns the shared loop, starting its daemon thread on first use."""
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            _thread = threading.Thread(target=_run, name="async-runtime", daemon=True)
+            _thread.start()
+            ready.wait()
+            _loop = loop
+            print("🔁 ASYNC RUNTIME: Background event loop started")
+        return _loop
+
+def in_runtime_thread() -> bool:
+    return _thread is not None and threading.current_thread() is _thread
+
+def submit(coro) -> concurrent.futures.Future:
+    """Schedules a coroutine on the shared loop from any thread. Cancelling the future cancels the task."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+def run(coro, timeout: float = None):
+    """Blocks the calling thread until the coroutine finishes on the shared loop."""
+    if in_runtime_thread():
+        coro.close()
+        raise RuntimeError("async_runtime.run() called from the runtime thread; await the coroutine instead.")
+    future = submit(coro)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+def shutdown(timeout: float = 5):
+    """Stops the loop after running registered cleanups (e.g. closing the shared browser)."""
+    global _loop
+    with _lock:
+        loop, _loop = _loop, None
+    if loop is None or loop.is_closed():
+        return
+
+    async def _drain():
+        for hook in list(_shutdown_hooks):
+            try:
+                await hook()
+            except Exception as e:
+                print(f"⚠️ ASYNC RUNTIME: Shutdown hook failed: {e}")
+
+    try:
+        asyncio.run_coroutine_threadsafe(_drain(), loop).result(timeout=timeout)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+
+def on_shutdown(hook):
+    """Registers an async cleanup callable run on the loop at interpreter exit."""
+    _shutdown_hooks.append(hook)
+    return hook
+
+atexit.register(shutdown)
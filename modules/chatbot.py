@@ -1,17 +1,39 @@
+import os
 import json
+import functools
 import streamlit as st
 from google import genai
 from google.genai import types
 
-# Import the scraper from your module
-from modules.ecommerce_scraper import run_scraper_tool
+from modules import telemetry, model_router, prefetch, product_cards, conversation_store, async_runtime, semantic_cache
+
+# Instruction for the post-search call: product cards are rendered by product_cards.py
+BLURB_INSTRUCTION = (
+    "The search results will be shown to the user as product cards directly below your reply. "
+    "Do NOT list, repeat or format the products. Write only a warm 1-2 sentence intro tied to the "
+    "user's occasion and, if useful, one short styling tip referencing their wardrobe. "
+    "If the results are empty, apologise briefly and suggest a different search."
+)
+BLURB_MAX_TOKENS = 120
+
+# Above this many wardrobe items the file-name inventory is replaced by the measured colour summary
+COMPACT_CONTEXT_MIN_ITEMS = 30
+
+# Point the Gemini SDK at another endpoint (e.g. the load-test stand-in); empty = Google's API
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "")
 
 def get_gemini_client():
     """Get Gemini client using API key from session state."""
     api_key = st.session_state.get('gemini_api_key')
     if not api_key:
         raise ValueError("Gemini API key not found. Please enter it in the sidebar.")
-    return genai.Client(api_key=api_key)
+    return _client_for_key(api_key)
+
+@functools.lru_cache(maxsize=32)
+def _client_for_key(api_key: str) -> genai.Client:
+    # Reused across turns so the aio client's connection pool on the async runtime is shared
+    http_options = types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
+    return genai.Client(api_key=api_key, http_options=http_options)
 
 def get_chat_model():
     """Get the selected chat model from session state."""
@@ -41,71 +63,49 @@ SCRAPER_TOOL = types.Tool(
     ]
 )
 
-def chat_with_gemini(user_input: str, history: list, wardrobe_context: str) -> str:
+def chat_with_gemini(user_input: str, history: list, wardrobe_context: str, api_key: str = None,
+                     model_name: str = None, user_gender: str = None, fast_mode: bool = None,
+                     conversation_ids: tuple = None, on_event=None) -> str:
     """
     Chat function using Google Gemini:
     1. Sends context + user prompt to Gemini.
     2. Checks if Gemini wants to use the 'search_products' tool.
-    3. If yes, executes the scraper, gets results, and sends them back.
-    4. Returns the final natural language response.
+    3. If yes, executes the scraper and renders the products as cards locally.
+    4. Asks Gemini only for a short intro (skipped in fast mode) and returns intro + cards.
+    Shopping-style messages also start a speculative scrape in parallel with
+    the first model call, which the tool call reuses when the queries match.
+
+    Settings left as None are read from the Streamlit session, so callers
+    outside Streamlit (api.py) pass them explicitly. `on_event(kind, data)` is
+    told about the tool call and the rendered products before the final reply.
     """
+    speculative = None
     try:
-        client = get_gemini_client()
-        model_name = get_chat_model()
+        if api_key is None:
+            api_key = st.session_state.get('gemini_api_key')
+        if not api_key:
+            raise ValueError("Gemini API key not found. Please enter it in the sidebar.")
+        client = _client_for_key(api_key)
+        model_name = model_name or get_chat_model()
         # Get user gender preference
-        user_gender = st.session_state.get('user_gender', 'Male')
+        user_gender = user_gender or st.session_state.get('user_gender', 'Male')
+        if fast_mode is None:
+            fast_mode = st.session_state.get('fast_shopping_mode', False)
+        if conversation_ids is None:
+            conversation_ids = st.session_state.get('conversation_ids')
         
-        # System instruction with wardrobe and gender context
-        system_instruction = (
-            f"You are an intelligent personalized wardrobe curator and shopping companion for a {user_gender.upper()} user. "
-            "You are helpful, stylish, and friendly. "
-            f"IMPORTANT: The user is {user_gender}. Always search for and recommend {user_gender.lower()}'s clothing/fashion items. "
-            "You have access to the user's existing wardrobe (listed below) to suggest outfits. "
-            "You ALSO have a tool to search for new products online. "
-            f"When searching, always include '{user_gender.lower()}' or 'men' or 'women' appropriately in the search query. "
-            "If the user asks to buy something or needs a specific item to complete an outfit, use the 'search_products' tool.\n\n"
-            
-            "CRITICAL: When displaying product results, you MUST format each product as a beautiful card using HTML for images:\n\n"
-            
-            "---\n"
-            "### 🛍️ [Product Name]\n\n"
-            '<img src="IMAGE_URL_HERE" alt="Product" width="200" style="border-radius: 10px; margin: 10px 0;">\n\n'
-            "| Detail | Info |\n"
-            "|--------|------|\n"
-            "| 💰 **Price** | ~~₹Original~~ **₹Offer Price** |\n"
-            "| ⭐ **Rating** | 4.5/5 stars |\n"
-            "| 🎯 **Why it's perfect** | [Occasion fit explanation] |\n\n"
-            "🔗 [**Buy Now →**](product_link)\n\n"
-            "---\n\n"
-            
-            "FORMATTING RULES:\n"
-            "1. Start with a brief intro like 'Here are some perfect options for your friend's wedding!'\n"
-            "2. Show EACH product as a separate card with the format above\n"
-            "3. Use the table format for structured details\n"
-            '4. CRITICAL: Display images using HTML: <img src="URL" alt="Product" width="200">\n'
-            "5. Make the 'Buy Now' link clickable using markdown: [Buy Now](url)\n"
-            "6. Add a brief personal recommendation at the end\n"
-            "7. If prices have discounts, show original price struck through (~~₹X~~)\n"
-            "8. Use the occasion_fit field to explain why this product suits the event\n\n"
-            
-            f"USER GENDER: {user_gender}\n"
-            f"USER WARDROBE CONTEXT:\n{wardrobe_context}"
-        )
+        with telemetry.span("prompt_build"):
+            # "What should I wear" questions get only the top locally composed outfits, not the full inventory
+            from modules import outfits
+            wardrobe_context = outfits.outfit_context(user_input, user_gender) or _compact_inventory(wardrobe_context)
+            system_instruction, contents = _build_prompt(user_input, history, wardrobe_context, user_gender)
         
-        # Build conversation history for Gemini
-        contents = []
-        for msg in history:
-            role = "user" if msg["role"] == "user" else "model"
-            contents.append(types.Content(
-                role=role,
-                parts=[types.Part.from_text(text=msg["content"])]
-            ))
+        # Near-duplicate questions from any user are answered without a model call
+        cached = semantic_cache.lookup(user_input, history, user_gender, wardrobe_context)
+        if cached is not None:
+            return cached
         
-        # Add current user message
-        contents.append(types.Content(
-            role="user",
-            parts=[types.Part.from_text(text=user_input)]
-        ))
+        speculative = prefetch.start_for_message(user_input, user_gender, api_key)
         
         # Generate config
         config = types.GenerateContentConfig(
@@ -114,12 +114,14 @@ def chat_with_gemini(user_input: str, history: list, wardrobe_context: str) -> s
             temperature=0.7
         )
         
-        # First API call
-        response = client.models.generate_content(
-            model=model_name,
-            contents=contents,
-            config=config
-        )
+        # First API call, on the cheapest model that suits this kind of turn
+        route = model_router.classify_turn(user_input, history)
+        with telemetry.span("first_model_call", route=route):
+            response, _ = model_router.call(api_key, route, model_name, lambda model: async_runtime.run(client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config
+            )), stage="first_model_call")
         
         # Check if there are function calls
         if response.candidates and response.candidates[0].content.parts:
@@ -133,9 +135,45 @@ def chat_with_gemini(user_input: str, history: list, wardrobe_context: str) -> s
                         record_count = func_call.args.get("record_count", 5)
                         
                         print(f"🤖 Gemini requested tool: Searching for '{product_name}'...")
+                        if on_event:
+                            on_event("tool_call", {"name": func_call.name, "product_name": product_name})
+                        
+                        if conversation_ids:
+                            conversation_store.append_tool_call(*conversation_ids, func_call.name, dict(func_call.args))
+                        
+                        # Execute the scraper (or reuse a speculative / previously stored result)
+                        with telemetry.span("tool_execution", tool=func_call.name):
+                            tool_result = speculative.take(product_name, record_count) if speculative else None
+                            if tool_result is None:
+                                tool_result = conversation_store.find_search_results(product_name, record_count)
+                            if tool_result is None:
+                                # Imported lazily: pulls in pydantic and the crawler stack
+                                from modules.ecommerce_scraper import run_scraper_tool, stream_scraper_tool
+                                if on_event:
+                                    # Each product reaches the listener as soon as its storefront page is extracted
+                                    tool_result = []
+                                    for product in stream_scraper_tool(product_name, record_count, api_key):
+                                        tool_result.append(product)
+                                        on_event("product", {"product": product, "card": product_cards.render_product_card(product)})
+                                else:
+                                    tool_result = run_scraper_tool(product_name, record_count, api_key)
+                            # Collapse variants/duplicates and put the best matches first
+                            from modules import ranking
+                            tool_result = ranking.rank_products(
+                                tool_result, product_name, record_count, user_gender, wardrobe_context
+                            )
+                        
+                        if conversation_ids:
+                            conversation_store.append_tool_result(*conversation_ids, func_call.name, dict(func_call.args), tool_result)
                         
-                        # Execute the scraper
-                        tool_result = run_scraper_tool(product_name, record_count)
+                        cards = product_cards.render_product_cards(tool_result)
+                        if on_event:
+                            on_event("products", {"products": tool_result, "cards": cards})
+                        if tool_result and fast_mode:
+                            # Fast mode: no second model call at all
+                            return semantic_cache.store(user_input, history, user_gender, wardrobe_context,
+                                                        f"Here are some picks for **{product_name}**:\n\n{cards}",
+                                                        ttl=semantic_cache.SHOPPING_TTL)
                         
                         # Add function call and result to conversation
                         contents.append(types.Content(
@@ -150,32 +188,88 @@ def chat_with_gemini(user_input: str, history: list, wardrobe_context: str) -> s
                             role="user",
                             parts=[types.Part.from_function_response(
                                 name=func_call.name,
-                                response={"result": tool_result}
+                                response={"result": product_cards.summarize_for_model(tool_result)}
                             )]
                         ))
                         
-                        # Second API call to process tool results
-                        final_response = client.models.generate_content(
-                            model=model_name,
-                            contents=contents,
-                            config=types.GenerateContentConfig(
-                                system_instruction=system_instruction,
-                                temperature=0.7
-                            )
-                        )
+                        # Second API call only writes a short intro; the cards are rendered locally
+                        with telemetry.span("second_model_call", route="format"):
+                            final_response, _ = model_router.call(api_key, "format", model_name, lambda model: async_runtime.run(client.aio.models.generate_content(
+                                model=model,
+                                contents=contents,
+                                config=types.GenerateContentConfig(
+                                    system_instruction=system_instruction + "\n\n" + BLURB_INSTRUCTION,
+                                    temperature=0.7,
+                                    max_output_tokens=BLURB_MAX_TOKENS
+                                )
+                            )), stage="second_model_call")
                         
-                        return final_response.text
+                        reply = f"{(final_response.text or '').strip()}\n\n{cards}"
+                        if not tool_result:
+                            return reply
+                        return semantic_cache.store(user_input, history, user_gender, wardrobe_context, reply,
+                                                    ttl=semantic_cache.SHOPPING_TTL)
         
         # No function call, return text response
-        return response.text
+        return semantic_cache.store(user_input, history, user_gender, wardrobe_context, response.text)
         
     except Exception as e:
         error_msg = str(e)
         print(f"❌ CHATBOT ERROR: {error_msg}")
+        telemetry.incr("chat_errors_total")
         return f"Error connecting to Gemini: {error_msg}"
+    finally:
+        if speculative:
+            speculative.cancel()
+
+def _compact_inventory(wardrobe_context: str) -> str:
+    """Large wardrobes are described by counts, measured colours and gaps instead of every file name."""
+    from modules import wardrobe, wardrobe_analytics
+    if sum(len(files) for files in wardrobe.list_items().values()) < COMPACT_CONTEXT_MIN_ITEMS:
+        return wardrobe_context
+    try:
+        return wardrobe_analytics.compact_context()
+    except Exception as e:
+        print(f"⚠️ CHATBOT: Wardrobe analytics unavailable ({e}); using the inventory list")
+        return wardrobe_context
+
+def _build_prompt(user_input: str, history: list, wardrobe_context: str, user_gender: str):
+    """Builds the system instruction and Gemini conversation contents for a turn."""
+    # System instruction with wardrobe and gender context
+    system_instruction = (
+        f"You are an intelligent personalized wardrobe curator and shopping companion for a {user_gender.upper()} user. "
+        "You are helpful, stylish, and friendly. "
+        f"IMPORTANT: The user is {user_gender}. Always search for and recommend {user_gender.lower()}'s clothing/fashion items. "
+        "You have access to the user's existing wardrobe (listed below) to suggest outfits. "
+        "You ALSO have a tool to search for new products online. "
+        f"When searching, always include '{user_gender.lower()}' or 'men' or 'women' appropriately in the search query. "
+        "If the user asks to buy something or needs a specific item to complete an outfit, use the 'search_products' tool.\n\n"
+        
+        "Product search results are rendered as cards by the app, so never re-list or reformat them yourself.\n\n"
+        
+        f"USER GENDER: {user_gender}\n"
+        f"USER WARDROBE CONTEXT:\n{wardrobe_context}"
+    )
+    
+    # Build conversation history for Gemini
+    contents = []
+    for msg in history:
+        role = "user" if msg["role"] == "user" else "model"
+        contents.append(types.Content(
+            role=role,
+            parts=[types.Part.from_text(text=msg["content"])]
+        ))
+    
+    # Add current user message
+    contents.append(types.Content(
+        role="user",
+        parts=[types.Part.from_text(text=user_input)]
+    ))
+
+    return system_instruction, contents
 
-def run_chat_tool(user_input: str, history: list, wardrobe_context: str) -> str:
+def run_chat_tool(user_input: str, history: list, wardrobe_context: str, on_event=None) -> str:
     """
     Synchronous wrapper for chat_with_gemini.
     """
-    return chat_with_gemini(user_input, history, wardrobe_context)
\ No newline at end of file
+    return chat_with_gemini(user_input, history, wardrobe_context, on_event=on_event)
\ No newline at end of file
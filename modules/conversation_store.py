@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+
+from modules import telemetry
+
+# Append-only conversation log shared by all Streamlit sessions of this server
+CONVERSATION_DB = os.environ.get("FASHION_CONVERSATION_DB", os.path.join("data", "conversations.db"))
+
+# A session touched within this window is resumed instead of starting a new one
+RESUME_WINDOW = 24 * 60 * 60
+# Scrape results older than this are not reused for new searches
+TOOL_RESULT_MAX_AGE = 24 * 60 * 60
+# Compaction: tool traffic is dropped from sessions older than this, and only the newest sessions are kept
+COMPACT_AFTER_DAYS = 30
+KEEP_SESSIONS = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,          -- 'message' | 'tool_call' | 'tool_result'
+    role TEXT,
+    name TEXT,                   -- tool name
+    query TEXT,                  -- normalized search query for tool events
+    content TEXT NOT NULL,       -- message text or JSON payload
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_events_session ON events (session_id, kind, id);
+CREATE INDEX IF NOT EXISTS idx_events_query ON events (kind, query, created_at);
+"""
+
+_conn = None
+_lock = threading.Lock()
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CONVERSATION_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(CONVERSATION_DB, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _conn = conn
+    return _conn
+
+def user_id_for(api_key: str) -> str:
+    """Stable, non-reversible user id derived from the Gemini API key."""
+    return hashlib.sha256((api_key or "anonymous").encode("utf-8")).hexdigest()[:16]
+
+def _normalize(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+def resume_session(user_id: str) -> str:
+    """Returns the user's most recent session if still fresh, otherwise starts a new one."""
+    now = time.time()
+    with _lock:
+        db = _db()
+        row = db.execute(
+            "SELECT session_id FROM sessions WHERE user_id = ? AND updated_at > ? ORDER BY updated_at DESC LIMIT 1",
+            (user_id, now - RESUME_WINDOW),
+        ).fetchone()
+        if row:
+            return row[0]
+        session_id = uuid.uuid4().hex
+        db.execute(
+            "INSERT INTO sessions (session_id, user_id, started_at, updated_at) VALUES (?, ?, ?, ?)",
+            (session_id, user_id, now, now),
+        )
+        db.commit()
+        return session_id
+
+def _append(user_id: str, session_id: str, kind: str, content: str, role=None, name=None, query=None) -> int:
+    now = time.time()
+    with _lock:
+        db = _db()
+        cur = db.execute(
+            "INSERT INTO events (session_id, user_id, kind, role, name, query, content, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, user_id, kind, role, name, query, content, now),
+        )
+        db.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (now, session_id))
+        db.commit()
+        return cur.lastrowid
+
+def append_message(user_id: str, session_id: str, role: str, content: str) -> int:
+    return _append(user_id, session_id, "message", content, role=role)
+
+def append_tool_call(user_id: str, session_id: str, name: str, args: dict) -> int:
+    return _append(user_id, session_id, "tool_call", json.dumps(args), name=name, query=_normalize(args.get("product_name", "")))
+
+def append_tool_result(user_id: str, session_id: str, name: str, args: dict, result) -> int:
+    return _append(user_id, session_id, "tool_result", json.dumps(result), name=name, query=_normalize(args.get("product_name", "")))
+
+def load_messages(session_id: str, limit: int, before_id: int = None):
+    """
+    Loads up to `limit` messages of a session, newest window first, in display order.
+    Returns (messages, has_more); each message carries its `event_id` for paging.
+    """
+    with _lock:
+        rows = _db().execute(
+            "SELECT id, role, content FROM events WHERE session_id = ? AND kind = 'message' AND id < ? "
+            "ORDER BY id DESC LIMIT ?",
+            (session_id, before_id if before_id is not None else 2 ** 62, limit + 1),
+        ).fetchall()
+    has_more = len(rows) > limit
+    messages = [{"role": role, "content": content, "event_id": event_id} for event_id, role, content in reversed(rows[:limit])]
+    return messages, has_more
+
+def find_search_results(query: str, record_count: int = 5, max_age: float = TOOL_RESULT_MAX_AGE):
+    """Returns products from a recent stored search for the same query, or None."""
+    with _lock:
+        row = _db().execute(
+            "SELECT content FROM events WHERE kind = 'tool_result' AND query = ? AND created_at > ? "
+            "ORDER BY id DESC LIMIT 1",
+            (_normalize(query), time.time() - max_age),
+        ).fetchone()
+    if not row:
+        return None
+    products = json.loads(row[0])
+    if not isinstance(products, list) or len(products) < record_count:
+        return None
+    telemetry.incr("cache_hits_total", cache="conversation_store")
+    return products[:record_count]
+
+def compact(user_id: str, older_than_days: int = COMPACT_AFTER_DAYS, keep_sessions: int = KEEP_SESSIONS):
+    """
+    Drops tool traffic from old sessions and deletes sessions beyond the newest
+    `keep_sessions`, so the log stays small for fast resume.
+    """
+    cutoff = time.time() - older_than_days * 86400
+    with _lock:
+        db = _db()
+        stale = [row[0] for row in db.execute(
+            "SELECT session_id FROM sessions WHERE user_id = ? ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+            (user_id, keep_sessions),
+        )]
+        for session_id in stale:
+            db.execute("DELETE FROM events WHERE session_id = ?", (session_id,))
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        trimmed = db.execute(
+            "DELETE FROM events WHERE user_id = ? AND kind != 'message' AND created_at < ?",
+            (user_id, cutoff),
+        ).rowcount
+        db.commit()
+    if stale or trimmed:
+        print(f"🗜️ CONVERSATIONS: Compacted {len(stale)} sessions, {trimmed} tool events")
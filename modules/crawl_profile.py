@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import contextvars
+
+from modules import telemetry
+
+# "lean" blocks unneeded resources and waits for result cards; "full" loads everything
+# and scrolls with fixed sleeps, as the scraper always did
+CRAWL_PROFILE = os.environ.get("SCRAPER_PROFILE", "lean")
+
+# Playwright resource types the extraction never needs. Images stay allowed so
+# lazy-loading scripts still swap the real product image URLs into the markup.
+BLOCKED_RESOURCE_TYPES = {"font", "media"}
+
+# URL fragments of ad, tracking and beacon requests
+BLOCKED_URL_PATTERNS = (
+    "doubleclick.net", "googlesyndication", "googletagmanager", "google-analytics",
+    "amazon-adsystem", "adservice", "/ads/", "/analytics", "/beacon", "/pixel",
+    "facebook.net", "hotjar", "scorecardresearch", "criteo", "taboola",
+)
+
+# Legacy lazy-loading scroll: two fixed one-second sleeps on every page
+FULL_SCROLL_SCRIPT = """
+    window.scrollTo(0, document.body.scrollHeight / 2);
+    await new Promise(r => setTimeout(r, 1000));
+    window.scrollTo(0, document.body.scrollHeight);
+    await new Promise(r => setTimeout(r, 1000));
+"""
+
+# The card wait gives up on more cards once the count has not grown for this long
+CARDS_SETTLE_MS = 1500
+
+_page_stats = contextvars.ContextVar("crawl_page_stats", default=None)
+
+def block_reason(resource_type: str, url: str):
+    """"font"/"media" or "tracker" when the lean profile drops this request, else None."""
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return resource_type
+    if any(p in url for p in BLOCKED_URL_PATTERNS):
+        return "tracker"
+    return None
+
+def card_wait_condition(selector: str, count: int, container: str = "", no_results_text: str = "") -> str:
+    """
+    crawl4ai `js:` wait condition: true once `count` result cards exist. Each
+    poll scrolls one screen to trigger lazy loading, and a page that stops
+    growing (fewer results than asked for) is accepted after CARDS_SETTLE_MS.
+    A page without results (the site's "no results" text, or its results
+    container settled with no cards) is accepted too, instead of timing out.
+    """
+    return f"""js:() => {{
+        const n = document.querySelectorAll({json.dumps(selector)}).length;
+        window.scrollBy(0, window.innerHeight);
+        const w = window.__cardWait = window.__cardWait || {{last: -1, since: Date.now()}};
+        if (n !== w.last) {{ w.last = n; w.since = Date.now(); }}
+        const settled = Date.now() - w.since > {CARDS_SETTLE_MS};
+        const marker = {json.dumps(no_results_text)};
+        const empty = marker !== "" && document.body !== null && document.body.innerText.includes(marker);
+        const box = {json.dumps(container)};
+        const hasBox = box !== "" && document.querySelector(box) !== null;
+        return n >= {int(count)} || (n > 0 && settled) || (n === 0 && (empty || (hasBox && settled)));
+    }}"""
+
+def run_config_kwargs(adapter, record_count: int, profile: str = None) -> dict:
+    """Page-loading part of the CrawlerRunConfig for a profile."""
+    if (profile or CRAWL_PROFILE) == "full":
+        return {"wait_for": adapter.wait_for, "js_code": FULL_SCROLL_SCRIPT}
+    return {
+        "wait_for": card_wait_condition(
+            adapter.result_selector, record_count, adapter.results_container, adapter.no_results_text
+        ),
+        "wait_for_timeout": 15000,
+    }
+
+async def _on_page_context_created(page, context=None, **kwargs):
+    """crawl4ai hook: blocks and measures requests of pages loaded inside track_page()."""
+    stats = _page_stats.get()
+    if stats is None:
+        return page
+
+    async def route(route):
+        reason = None if stats["profile"] == "full" else block_reason(route.request.resource_type, route.request.url)
+        if reason:
+            stats["blocked"][reason] = stats["blocked"].get(reason, 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def finished(request):
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        stats["requests"] += 1
+        stats["bytes"] += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+
+    await page.route("**/*", route)
+    page.on("requestfinished", finished)
+    return page
+
+def install_hooks(crawler):
+    crawler.crawler_strategy.set_hook("on_page_context_created", _on_page_context_created)
+
+class track_page:
+    """
+    Collects transfer stats for the crawl run inside the block (per asyncio
+    task), and on exit logs them and feeds the crawler_* metrics:
+
+        with crawl_profile.track_page(adapter.name) as stats:
+            result = await crawler.arun(url=url, config=run_config)
+    """
+
+    def __init__(self, site: str, profile: str = None):
+        self.site = site
+        self.stats = {"profile": profile or CRAWL_PROFILE, "requests": 0, "bytes": 0, "blocked": {}, "seconds": 0.0}
+
+    def __enter__(self):
+        self._token = _page_stats.set(self.stats)
+        self._start = time.perf_counter()
+        return self.stats
+
+    def __exit__(self, *exc):
+        _page_stats.reset(self._token)
+        stats, profile = self.stats, self.stats["profile"]
+        stats["seconds"] = time.perf_counter() - self._start
+        telemetry.observe("crawler_page_seconds", stats["seconds"], site=self.site, profile=profile)
+        telemetry.incr("crawler_bytes_total", stats["bytes"], site=self.site, profile=profile)
+        for reason, blocked in stats["blocked"].items():
+            telemetry.incr("crawler_blocked_requests_total", blocked, site=self.site, reason=reason)
+        print(f"📦 SCRAPER: {self.site} page ({profile}) loaded in {stats['seconds']:.2f}s, "
+              f"{stats['bytes'] / 1024:.0f} KB over {stats['requests']} requests, "
+              f"{sum(stats['blocked'].values())} blocked")
+        return False
@@ -0,0 +1,230 @@
+"""
+Garment cutouts: each wardrobe photo cropped to the garment with its
+background removed, computed once on the CPU (NumPy + Pillow) when the item
+is uploaded and stored under WARDROBE_ROOT/.cutouts/ keyed by the photo's
+content hash. Try-ons and wardrobe thumbnails use the cutout when one
+exists, so the model gets a smaller, uncluttered garment image.
+
+The background is whatever connects to the image border through pixels
+close to one of the border's main colours, which handles plain studio
+backdrops, walls and "fake transparency" checkerboards alike.
+"""
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from modules import wardrobe, telemetry, image_io
+
+# Set to "off" to send try-ons and thumbnails the original photos
+CUTOUTS_ENABLED = os.environ.get("FASHION_GARMENT_CUTOUTS", "on").lower() not in ("off", "0", "false")
+
+CUTOUT_DIR = os.path.join(wardrobe.WARDROBE_ROOT, ".cutouts")
+
+# Part of the content key, so changing the algorithm recomputes every cutout
+CUTOUT_VERSION = 1
+
+# The mask is computed at this size and scaled up to the photo
+MASK_SIDE = 256
+
+# Border colours that count as backdrop, and how far (RGB distance) a pixel may be from one:
+# a multiple of the border's own noise, so a clean studio white does not swallow a white garment
+BORDER_COLORS = 6
+BACKDROP_TOLERANCE = (6.0, 40.0)
+BACKDROP_NOISE_FACTOR = 8.0
+
+# A mask covering less or more than this share of the photo means segmentation failed
+MIN_FOREGROUND = 0.03
+MAX_FOREGROUND = 0.97
+
+# Stored as lossy WebP with alpha: a fraction of a PNG's size and no visible loss at try-on resolution
+CUTOUT_QUALITY = 90
+
+# Padding around the garment's bounding box, as a share of its larger side
+CROP_MARGIN = 0.04
+
+# One worker: cutouts are background work and the mask itself is vectorized
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cutouts")
+_pending = {}       # content digest -> Future
+_digests = {}       # (path, mtime_ns, size) -> content digest
+_unusable = set()   # digests whose photo could not be segmented
+_lock = threading.Lock()
+
+def _hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(f"cutout-v{CUTOUT_VERSION}:".encode("utf-8") + data).hexdigest()[:32]
+
+def content_digest(source) -> str:
+    """Content key of a path, bytes or file-like upload; file hashes are remembered by size and mtime."""
+    if isinstance(source, str):
+        stat = os.stat(source)
+        key = (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+        digest = _digests.get(key)
+        if digest is None:
+            with open(source, "rb") as f:
+                digest = _digests[key] = _hash_bytes(f.read())
+        return digest
+    return _hash_bytes(source.getvalue() if hasattr(source, "getvalue") else bytes(source))
+
+def _cutout_file(digest: str) -> str:
+    return os.path.join(CUTOUT_DIR, f"{digest}.webp")
+
+# --- Segmentation -------------------------------------------------------------
+
+def _border_palette(rgb: np.ndarray) -> np.ndarray:
+    """(k, 3) main colours of the image border, by median-cut quantization."""
+    border = np.concatenate([rgb[0], rgb[-1], rgb[:, 0], rgb[:, -1]]).astype(np.uint8)
+    strip = Image.fromarray(border[None, :, :]).quantize(BORDER_COLORS, method=Image.Quantize.MEDIANCUT)
+    used = sorted({i for _, i in strip.getcolors()})
+    palette = np.array(strip.getpalette()[:3 * (max(used) + 1)], dtype=np.float32).reshape(-1, 3)
+    return palette[used]
+
+def _shift_or(mask: np.ndarray) -> np.ndarray:
+    """Mask dilated by one pixel (4-neighbourhood)."""
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown
+
+def _erode(mask: np.ndarray) -> np.ndarray:
+    return ~_shift_or(~mask)
+
+def garment_mask(rgb: np.ndarray) -> np.ndarray:
+    """Boolean garment mask of an (H, W, 3) image: everything not flood-reachable from the border through backdrop colours."""
+    rgb = rgb.astype(np.float32)
+    palette = _border_palette(rgb)
+    distance = np.sqrt(((rgb[:, :, None, :] - palette[None, None]) ** 2).sum(axis=-1)).min(axis=-1)
+    border_distance = np.concatenate([distance[0], distance[-1], distance[:, 0], distance[:, -1]])
+    tolerance = np.clip(np.percentile(border_distance, 90) * BACKDROP_NOISE_FACTOR, *BACKDROP_TOLERANCE)
+    backdrop_like = distance < tolerance
+
+    background = np.zeros_like(backdrop_like)
+    background[[0, -1], :] = backdrop_like[[0, -1], :]
+    background[:, [0, -1]] |= backdrop_like[:, [0, -1]]
+    # Geodesic flood fill: grow from the border, only through backdrop-like pixels
+    for _ in range(sum(rgb.shape[:2]) * 2):
+        grown = _shift_or(background) & backdrop_like
+        if np.array_equal(grown, background):
+            break
+        background = grown
+
+    # Opening drops backdrop specks (noise, shadow edges) left as foreground
+    return _shift_or(_erode(~background))
+
+def make_cutout(img: Image.Image) -> Optional[Image.Image]:
+    """RGBA cutout of the garment cropped to its bounding box (matted on white), or None if segmentation fails."""
+    small = img.convert("RGB")
+    small.thumbnail((MASK_SIDE, MASK_SIDE))
+    mask = garment_mask(np.asarray(small))
+    share = mask.mean()
+    if not MIN_FOREGROUND <= share <= MAX_FOREGROUND:
+        return None
+
+    rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    scale_x, scale_y = img.width / small.width, img.height / small.height
+    margin = CROP_MARGIN * max((cols[-1] - cols[0]) * scale_x, (rows[-1] - rows[0]) * scale_y)
+    box = (
+        max(0, int(cols[0] * scale_x - margin)),
+        max(0, int(rows[0] * scale_y - margin)),
+        min(img.width, int((cols[-1] + 1) * scale_x + margin)),
+        min(img.height, int((rows[-1] + 1) * scale_y + margin)),
+    )
+
+    alpha = Image.fromarray(mask.astype(np.uint8) * 255).resize(img.size, Image.Resampling.BILINEAR)
+    alpha = alpha.filter(ImageFilter.GaussianBlur(max(img.width, img.height) / MASK_SIDE / 2)).crop(box)
+    garment = img.convert("RGB").crop(box)
+    # Matte on white so the RGB channels alone are a clean product shot
+    cutout = Image.composite(garment, Image.new("RGB", garment.size, "white"), alpha)
+    cutout.putalpha(alpha)
+    return cutout
+
+# --- Cutout store ---------------------------------------------------------------
+
+def cutout_path(source) -> Optional[str]:
+    """Path of the stored cutout for this photo, or None if it has not been made (or cannot be)."""
+    if not CUTOUTS_ENABLED:
+        return None
+    try:
+        path = _cutout_file(content_digest(source))
+    except OSError:
+        return None
+    return path if os.path.exists(path) else None
+
+def ensure_cutout(source) -> Optional[str]:
+    """Makes and stores the cutout if missing; returns its path, or None if the photo cannot be segmented."""
+    digest = content_digest(source)
+    path = _cutout_file(digest)
+    if os.path.exists(path):
+        return path
+    if digest in _unusable:
+        return None
+    with telemetry.span("garment_cutout"):
+        cutout = make_cutout(image_io.load_image(source))
+    if cutout is None:
+        _unusable.add(digest)
+        telemetry.incr("garment_cutouts_total", outcome="unusable")
+        return None
+    os.makedirs(CUTOUT_DIR, exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    cutout.save(tmp_path, format="WEBP", quality=CUTOUT_QUALITY)
+    os.replace(tmp_path, path)
+    telemetry.incr("garment_cutouts_total", outcome="ok")
+    return path
+
+def schedule(path: str):
+    """Makes the cutout for a wardrobe photo in the background (no-op when it exists or is already queued)."""
+    if not CUTOUTS_ENABLED:
+        return
+    try:
+        digest = content_digest(path)
+    except OSError:
+        return
+    if digest in _unusable or os.path.exists(_cutout_file(digest)):
+        return
+
+    def run():
+        try:
+            ensure_cutout(path)
+        except Exception as e:
+            print(f"⚠️ CUTOUT: Failed for {os.path.basename(path)}: {str(e)}")
+            telemetry.incr("garment_cutouts_total", outcome="error")
+        finally:
+            with _lock:
+                _pending.pop(digest, None)
+
+    with _lock:
+        if digest not in _pending:
+            _pending[digest] = _executor.submit(run)
+
+def load_garment(source) -> Image.Image:
+    """
+    Try-on garment image: the cutout on white (made now if missing) or the
+    original photo when cutouts are off or the photo cannot be segmented.
+    """
+    if CUTOUTS_ENABLED:
+        try:
+            path = ensure_cutout(source)
+            if path:
+                return image_io.load_image(path).convert("RGB")
+        except Exception as e:
+            print(f"⚠️ CUTOUT: Using the original photo: {str(e)}")
+    return image_io.load_image(source)
+
+def thumbnail(path: str) -> Image.Image:
+    """Wardrobe grid preview: the cutout if ready, otherwise the photo (and the cutout is queued)."""
+    cutout = cutout_path(path)
+    if cutout:
+        return image_io.load_thumbnail(cutout)
+    schedule(path)
+    return image_io.load_thumbnail(path)
+
+def discard(path: str):
+    """Removes the cutout of a wardrobe photo that is about to be deleted."""
+    cutout = cutout_path(path)
+    if cutout:
+        os.remove(cutout)
@@ -1,12 +1,50 @@
 import asyncio
+import importlib.util
 import json
-import nest_asyncio
-from typing import List, Dict, Any
+import time
+import queue
+import threading
+from typing import List, Dict, Any, AsyncIterator, Iterator
 from pydantic import BaseModel, Field
 import streamlit as st
 
-# --- Apply nest_asyncio for Jupyter/Streamlit compatibility ---
-nest_asyncio.apply()
+from modules import telemetry, rate_limiter, async_runtime, product_catalog, storefronts, resilience, crawl_profile
+
+# litellm provider string used by crawl4ai's LLMExtractionStrategy
+EXTRACTION_MODEL = "gemini/gemini-2.0-flash"
+
+# Search results are reused across turns and sessions for this long (seconds)
+SEARCH_CACHE_TTL = 15 * 60
+SEARCH_CACHE_MAX_ENTRIES = 256
+
+_search_cache = {}  # normalized query -> (timestamp, products)
+_search_cache_lock = threading.Lock()
+
+# Result pages crawled per storefront before giving up on reaching record_count
+MAX_PAGES = 3
+
+# Upper bound for one search submitted from a Streamlit thread (seconds)
+SCRAPE_TIMEOUT = 60
+
+# Stale-while-revalidate: expired cache entries up to this age are served when a fresh
+# scrape fails, or has not finished within SWR_GRACE seconds (it then refreshes the cache in the background)
+STALE_MAX_AGE = 24 * 60 * 60
+SWR_GRACE = 8.0
+
+_background_refreshes = set()  # keeps revalidation tasks alive after the caller has been answered
+
+# One browser shared by every search; lives on the async runtime loop.
+# The generation changes on every relaunch, so only one of several crawls that
+# failed on the same dead browser recycles it.
+_crawler = None
+_crawler_lock = None
+_crawler_generation = 0
+
+# Error text from Playwright/crawl4ai meaning the browser itself is gone, not just one page
+BROWSER_GONE_MARKERS = (
+    "target page, context or browser has been closed", "browser has been closed", "browser has disconnected",
+    "target closed", "connection closed", "browser closed",
+)
 
 # --- Data Schemas ---
 class ProductItem(BaseModel):
@@ -14,38 +52,111 @@ class ProductItem(BaseModel):
     actual_price: str = Field(..., description="Original price. Use 'N/A' if missing.")
     offer_price: str = Field(..., description="Discounted selling price.")
     rating: str = Field(..., description="Product rating (e.g., '4.5 out of 5 stars'). Use 'N/A' if missing.")
+    review_count: str = Field(default="N/A", description="Number of ratings/reviews shown (e.g., '12,345 ratings'). Use 'N/A' if missing.")
     image_link: str = Field(..., description="Full absolute URL of the product image starting with https://")
-    product_link: str = Field(..., description="Full absolute URL to the product page starting with https://www.amazon.in/. If relative URL found like /dp/XXX, prepend https://www.amazon.in")
+    product_link: str = Field(..., description="Full absolute URL to the product page. If a relative URL is found (e.g. /dp/XXX), prepend the site's base URL.")
     occasion_fit: str = Field(default="", description="Brief explanation of how this product fits the occasion (e.g., 'Perfect for weddings', 'Great for formal events').")
 
 class ProductList(BaseModel):
     products: List[ProductItem] = Field(..., description="List of products found.")
 
-async def scrape_product_async(product_name: str, record_count: int = 5) -> List[Dict[str, Any]]:
-    """
-    Scrapes Amazon for products using crawl4ai with Gemini for extraction.
-    """
-    print(f"🕵️ SCRAPER: Starting search for '{product_name}' (Target: {record_count} items)...")
-    
-    # Get API key from session state
-    api_key = st.session_state.get('gemini_api_key', '')
-    if not api_key:
-        print("❌ SCRAPER: No API key found in session state")
-        return []
-    
-    try:
-        from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-        from crawl4ai.extraction_strategy import LLMExtractionStrategy
-        from crawl4ai.async_configs import LLMConfig
-    except ImportError:
-        print("❌ SCRAPER: crawl4ai not installed. Returning empty results.")
-        return []
-    
-    url = f"https://www.amazon.in/s?k={product_name.replace(' ', '+')}"
+async def _get_crawler():
+    """Returns (shared crawler, its generation), launching the browser on first use."""
+    global _crawler, _crawler_lock, _crawler_generation
+    if _crawler_lock is None:
+        _crawler_lock = asyncio.Lock()
+    async with _crawler_lock:
+        if _crawler is None:
+            from crawl4ai import AsyncWebCrawler, BrowserConfig
+            browser_config = BrowserConfig(
+                headless=True, 
+                verbose=False, 
+                user_agent_mode="random"
+            )
+            with telemetry.span("browser_launch"):
+                crawler = AsyncWebCrawler(config=browser_config)
+                crawl_profile.install_hooks(crawler)
+                await crawler.__aenter__()
+            _crawler = crawler
+            _crawler_generation += 1
+        return _crawler, _crawler_generation
+
+def _browser_gone(error: Exception) -> bool:
+    text = str(error).lower()
+    return any(marker in text for marker in BROWSER_GONE_MARKERS)
+
+async def _recycle_crawler(generation: int):
+    """Closes the shared browser if it is still the one that failed; later launches are left alone."""
+    if _crawler_lock is None:
+        return
+    async with _crawler_lock:
+        if _crawler is None or generation != _crawler_generation:
+            return
+        print("♻️ SCRAPER: Browser is gone, relaunching on the next crawl")
+        telemetry.incr("browser_relaunches_total")
+        await _close_crawler()
+
+@async_runtime.on_shutdown
+async def _close_crawler():
+    """Closes the shared browser (also used to recover after a crash)."""
+    global _crawler
+    crawler, _crawler = _crawler, None
+    if crawler is not None:
+        try:
+            await crawler.__aexit__(None, None, None)
+        except Exception as e:
+            print(f"⚠️ SCRAPER: Error closing browser: {e}")
+
+def normalize_query(product_name: str) -> str:
+    """Lower-cases and de-duplicates whitespace so equivalent searches share a cache entry."""
+    return " ".join(product_name.lower().split())
+
+def get_cached_results(product_name: str, record_count: int = 5):
+    """Returns cached products for the query, or None when missing, stale or too few."""
+    key = normalize_query(product_name)
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+    if entry and time.time() - entry[0] < SEARCH_CACHE_TTL and len(entry[1]) >= record_count:
+        telemetry.incr("cache_hits_total", cache="search")
+        return entry[1][:record_count]
+    telemetry.incr("cache_misses_total", cache="search")
+    return None
+
+def get_stale_results(product_name: str, record_count: int = 5, max_age: float = STALE_MAX_AGE):
+    """Expired-but-recent cached products for stale-while-revalidate; None when nothing usable."""
+    key = normalize_query(product_name)
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+    if entry and time.time() - entry[0] < max_age and entry[1]:
+        return entry[1][:record_count]
+    return None
+
+def store_cached_results(product_name: str, products: List[Dict[str, Any]]):
+    """Caches a non-empty scrape result, evicting the oldest entry when full."""
+    if not products:
+        return
+    key = normalize_query(product_name)
+    with _search_cache_lock:
+        previous = _search_cache.get(key)
+        if previous and len(previous[1]) > len(products) and time.time() - previous[0] < SEARCH_CACHE_TTL:
+            return
+        _search_cache[key] = (time.time(), list(products))
+        if len(_search_cache) > SEARCH_CACHE_MAX_ENTRIES:
+            oldest = min(_search_cache, key=lambda k: _search_cache[k][0])
+            del _search_cache[oldest]
+
+async def _scrape_page(adapter, product_name: str, page: int, record_count: int, api_key: str,
+                       priority: int = rate_limiter.PRIORITY_INTERACTIVE) -> List[Dict[str, Any]]:
+    """Crawls and extracts one search-results page of one storefront; raises when the crawl fails."""
+    from crawl4ai import CrawlerRunConfig, CacheMode
+    from crawl4ai.extraction_strategy import LLMExtractionStrategy
+    from crawl4ai.async_configs import LLMConfig
+
+    url = adapter.build_url(product_name, page)
     
     # Configure Gemini for extraction - NOTE: litellm uses "gemini/" prefix
     llm_config = LLMConfig(
-        provider="gemini/gemini-2.0-flash",
+        provider=EXTRACTION_MODEL,
         api_token=api_key
     )
 
@@ -53,91 +164,296 @@ async def scrape_product_async(product_name: str, record_count: int = 5) -> List
         llm_config=llm_config,
         schema=ProductList.model_json_schema(),
         extraction_type="schema",
-        instruction=(
-            f"Extract valid products with their names, prices, ratings, images, and links. "
-            f"Ignore sponsored ads. Return at least {record_count} items. "
-            "CRITICAL FOR LINKS: "
-            "- For product_link: Extract the FULL absolute URL starting with https://www.amazon.in/. "
-            "  If you find a relative URL like '/dp/B0XXX...' or '/gp/...', prepend 'https://www.amazon.in' to make it absolute. "
-            "- For image_link: Extract the FULL image URL starting with https://. "
-            "For each product, also provide an 'occasion_fit' field explaining how well the product suits the searched occasion."
-        ),
+        instruction=adapter.extraction_instruction(record_count),
         chunk_token_threshold=2000,
         overlap_rate=0.1
     )
 
-    browser_config = BrowserConfig(
-        headless=True, 
-        verbose=False, 
-        user_agent_mode="random"
-    )
-
-    # Scroll script to load lazy-loaded content
-    scroll_script = """
-        window.scrollTo(0, document.body.scrollHeight / 2);
-        await new Promise(r => setTimeout(r, 1000));
-        window.scrollTo(0, document.body.scrollHeight);
-        await new Promise(r => setTimeout(r, 1000));
-    """
-
+    # Extraction runs as its own stage below so page load and LLM time are traced separately.
+    # The profile decides what the page loads and how long to wait for lazy-loaded cards.
     run_config = CrawlerRunConfig(
-        extraction_strategy=llm_strategy,
         cache_mode=CacheMode.BYPASS,
-        wait_for="css:.s-main-slot", 
-        js_code=scroll_script,
         magic=True,
-        page_timeout=30000
+        page_timeout=30000,
+        **crawl_profile.run_config_kwargs(adapter, record_count)
     )
 
-    all_products = []
+    print(f"🚀 SCRAPER: Crawling {url}")
+    crawler, generation = await _get_crawler()
+    try:
+        with telemetry.span("page_load", site=adapter.name), crawl_profile.track_page(adapter.name):
+            result = await crawler.arun(url=url, config=run_config)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Page-level errors leave the shared browser to the other crawls using it
+        if _browser_gone(e):
+            await _recycle_crawler(generation)
+        raise
+    
+    if not result.success:
+        raise RuntimeError(f"Failed to extract content: {result.error_message}")
 
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        print(f"🚀 SCRAPER: Crawling {url}")
+    markdown = getattr(result.markdown, "raw_markdown", None) or str(result.markdown or "")
+    with telemetry.span("extraction", site=adapter.name):
+        # litellm calls share the per-key limiter with the chat and try-on clients
+        blocks = await asyncio.to_thread(
+            rate_limiter.call, api_key, EXTRACTION_MODEL, lambda: llm_strategy.run(url, [markdown]), priority
+        )
+    
+    products_found = adapter.parse(blocks)
+    if products_found:
+        print(f"✅ SCRAPER: Found {len(products_found)} items on {adapter.name} page {page}")
+    else:
+        print(f"⚠️ SCRAPER: Content extracted but no products found.")
+    return products_found
+
+async def _scrape_page_resilient(adapter, product_name: str, page: int, record_count: int,
+                                 api_key: str, priority: int = rate_limiter.PRIORITY_INTERACTIVE) -> List[Dict[str, Any]]:
+    """
+    _scrape_page behind the site's circuit breaker, hedged with a second crawl
+    once it runs past the site's recent p95 latency (or fails early).
+    Returns [] instead of raising, so one broken site never sinks a search.
+    """
+    breaker = resilience.breaker_for(adapter.name)
+    if not breaker.allow():
+        telemetry.incr("scraper_short_circuits_total", site=adapter.name)
+        print(f"🔌 SCRAPER: Skipping {adapter.name} (circuit open)")
+        return []
+    trial = breaker.state == "half_open"
+    latency = resilience.latency_for(adapter.name)
+    start = time.perf_counter()
+    try:
+        products = await resilience.hedged(
+            lambda: _scrape_page(adapter, product_name, page, record_count, api_key, priority),
+            latency.hedge_delay(),
+            label=adapter.name,
+        )
+    except asyncio.CancelledError:
+        # iter_products cancels pending pages once it has enough; a cancelled trial must not leave the site half-open
+        if trial:
+            breaker.release_trial()
+        raise
+    except Exception as e:
+        print(f"⚠️ SCRAPER CRASH: {str(e)}")
+        telemetry.incr("scraper_errors_total", site=adapter.name)
+        breaker.record_failure()
+        return []
+    latency.record(time.perf_counter() - start)
+    # An empty first page usually means a blocked or changed page, so it counts against the site;
+    # deeper pages run out legitimately (pagination past the end, niche queries)
+    if products or page > 1:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+    return products
+
+async def iter_products(product_name: str, record_count: int = 5, api_key: str = None,
+                        sites: List[str] = None, max_pages: int = MAX_PAGES,
+                        priority: int = rate_limiter.PRIORITY_INTERACTIVE) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async generator over products from every storefront, yielded as each
+    site/page finishes. Sites are crawled concurrently one page depth at a
+    time; remaining crawls are cancelled once `record_count` items are out.
+    `priority` is the rate limiter priority of the extraction calls.
+    """
+    print(f"🕵️ SCRAPER: Starting search for '{product_name}' (Target: {record_count} items)...")
+    
+    # Get API key from session state
+    if api_key is None:
+        api_key = st.session_state.get('gemini_api_key', '')
+    if not api_key:
+        print("❌ SCRAPER: No API key found in session state")
+        return
+    
+    if importlib.util.find_spec("crawl4ai") is None:
+        print("❌ SCRAPER: crawl4ai not installed. Returning empty results.")
+        return
+
+    # Imported lazily: numpy is only needed once a scrape actually runs
+    from modules.ranking import VariantFilter
+
+    adapters = storefronts.get_adapters(sites)
+    # Colour/size variants and cross-site repeats do not count towards record_count
+    variants = VariantFilter()
+    yielded = 0
+    for page in range(1, max_pages + 1):
+        tasks = [
+            asyncio.create_task(_scrape_page_resilient(adapter, product_name, page, record_count, api_key, priority))
+            for adapter in adapters
+        ]
+        page_had_products = False
         try:
-            result = await crawler.arun(url=url, config=run_config)
-            
-            if result.success and result.extracted_content:
-                data = json.loads(result.extracted_content)
-                
-                products_found = []
-                if isinstance(data, dict) and "products" in data:
-                    products_found = data["products"]
-                elif isinstance(data, list):
-                    products_found = data
-                
-                if products_found:
-                    print(f"✅ SCRAPER: Found {len(products_found)} items")
-                    all_products.extend(products_found[:record_count])
-                else:
-                    print(f"⚠️ SCRAPER: Content extracted but no products found.")
-            else:
-                print(f"❌ SCRAPER: Failed to extract content. Error: {result.error_message}")
-                
-        except Exception as e:
-            print(f"⚠️ SCRAPER CRASH: {str(e)}")
+            for next_done in asyncio.as_completed(tasks):
+                for product in await next_done:
+                    page_had_products = True
+                    if not variants.is_new(product):
+                        continue
+                    yield product
+                    yielded += 1
+                    if yielded >= record_count:
+                        return
+        finally:
+            for task in tasks:
+                task.cancel()
+        if not page_had_products:
+            # Deeper pages will not do better than an empty page
+            break
 
+async def scrape_product_async(product_name: str, record_count: int = 5, api_key: str = None,
+                               sites: List[str] = None, priority: int = rate_limiter.PRIORITY_INTERACTIVE) -> List[Dict[str, Any]]:
+    """
+    Scrapes the configured storefronts using crawl4ai with Gemini for extraction.
+    Pass `api_key` explicitly when calling from a thread without a Streamlit session.
+    """
+    all_products = [p async for p in iter_products(product_name, record_count, api_key, sites, priority=priority)]
+    telemetry.incr("scraped_products_total", len(all_products))
     return all_products
 
-def run_scraper_tool(product_name: str, record_count: int = 5) -> List[Dict[str, Any]]:
+async def _scrape_and_store(product_name: str, record_count: int, api_key: str,
+                            priority: int = rate_limiter.PRIORITY_INTERACTIVE) -> List[Dict[str, Any]]:
+    results = await scrape_product_async(product_name, record_count, api_key, priority=priority)
+    store_cached_results(product_name, results)
+    product_catalog.add_products(results)
+    return results
+
+async def search_products_async(product_name: str, record_count: int, api_key: str,
+                                priority: int = rate_limiter.PRIORITY_INTERACTIVE) -> List[Dict[str, Any]]:
+    """
+    Cache-aware search; runs on the async runtime loop. Speculative callers pass
+    rate_limiter.PRIORITY_BACKGROUND so their extraction calls yield to chat turns. Price/rating-constrained
+    queries are answered from the product catalog when it has enough matches.
+    If a stale cached answer exists, it is served when the fresh scrape fails or
+    is still running after SWR_GRACE; with nothing cached, failed scrapes fall
+    back to matching catalog products.
+    """
+    cached = get_cached_results(product_name, record_count)
+    if cached is not None:
+        print(f"⚡ SCRAPER: Cache hit for '{product_name}'")
+        return cached
+    cataloged = product_catalog.search_catalog(product_name, record_count)
+    if cataloged is not None:
+        return cataloged
+
+    stale = get_stale_results(product_name, record_count)
+    if stale is None:
+        results = await _scrape_and_store(product_name, record_count, api_key, priority)
+        if not results:
+            # Every parsed constraint applies: "kurta under ₹2000" must not fall back to ₹5000 kurtas
+            results = product_catalog.query_products(**product_catalog.parse_constraints(product_name), limit=record_count)
+            if results:
+                telemetry.incr("stale_served_total", source="catalog")
+                print(f"📚 SCRAPER: Scrape failed; serving {len(results)} cataloged products for '{product_name}'")
+        return results
+
+    refresh = asyncio.ensure_future(_scrape_and_store(product_name, record_count, api_key, priority))
+    done, _ = await asyncio.wait({refresh}, timeout=SWR_GRACE)
+    if done and not refresh.exception() and refresh.result():
+        return refresh.result()
+    if not done:
+        # Let the scrape finish in the background and refresh the cache for the next ask
+        _background_refreshes.add(refresh)
+        refresh.add_done_callback(_background_refreshes.discard)
+    telemetry.incr("stale_served_total", source="search_cache")
+    print(f"🕰️ SCRAPER: Serving stale results for '{product_name}' while revalidating")
+    return stale
+
+def run_scraper_tool(product_name: str, record_count: int = 5, api_key: str = None) -> List[Dict[str, Any]]:
     """
-    Synchronous wrapper that safely calls the async scraper.
+    Synchronous wrapper that runs the search on the shared async runtime thread.
+    Results are served from the search cache when a recent scrape covers the query.
     """
+    cached = get_cached_results(product_name, record_count)
+    if cached is not None:
+        print(f"⚡ SCRAPER: Cache hit for '{product_name}'")
+        return cached
+
+    if api_key is None:
+        api_key = st.session_state.get('gemini_api_key', '')
+
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Create a new loop in a thread for Streamlit compatibility
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(
-                    lambda: asyncio.run(scrape_product_async(product_name, record_count))
-                )
-                return future.result(timeout=60)
-        else:
-            return asyncio.run(scrape_product_async(product_name, record_count))
+        return async_runtime.run(search_products_async(product_name, record_count, api_key), timeout=SCRAPE_TIMEOUT)
     except Exception as e:
         print(f"⚠️ SCRAPER ERROR: {str(e)}")
         return []
 
+def stream_scraper_tool(product_name: str, record_count: int = 5, api_key: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Synchronous generator yielding products as soon as each storefront page is
+    extracted, for callers that can show partial results (the chat tool call
+    when it has an event listener). Answers like search_products_async: the
+    search cache and catalog first; with a stale answer on hand, it is served
+    if nothing has streamed within SWR_GRACE (the scrape then refreshes the
+    cache in the background); a stream that finds nothing falls back to
+    matching catalog products. The whole stream ends after SCRAPE_TIMEOUT.
+    """
+    cached = get_cached_results(product_name, record_count)
+    if cached is not None:
+        print(f"⚡ SCRAPER: Cache hit for '{product_name}'")
+        yield from cached
+        return
+    cataloged = product_catalog.search_catalog(product_name, record_count)
+    if cataloged is not None:
+        yield from cataloged
+        return
+
+    if api_key is None:
+        api_key = st.session_state.get('gemini_api_key', '')
+
+    done = object()
+    items = queue.Queue()
+
+    async def pump():
+        collected = []
+        try:
+            async for product in iter_products(product_name, record_count, api_key):
+                collected.append(product)
+                items.put(product)
+            store_cached_results(product_name, collected)
+            product_catalog.add_products(collected)
+        finally:
+            items.put(done)
+
+    stale = get_stale_results(product_name, record_count)
+    start = time.monotonic()
+    deadline = start + SCRAPE_TIMEOUT
+    future = async_runtime.submit(pump())
+    streamed = 0
+    try:
+        while True:
+            # Until something streams, a stale answer only waits SWR_GRACE for the fresh one
+            wait_until = min(deadline, start + SWR_GRACE) if stale is not None and not streamed else deadline
+            try:
+                item = items.get(timeout=max(0.0, wait_until - time.monotonic()))
+            except queue.Empty:
+                if wait_until < deadline:
+                    telemetry.incr("stale_served_total", source="search_cache")
+                    print(f"🕰️ SCRAPER: Serving stale results for '{product_name}' while revalidating")
+                    # The scrape keeps running on the runtime loop and refreshes the cache
+                    future = None
+                    yield from stale
+                    return
+                print(f"⚠️ SCRAPER: Search for '{product_name}' did not finish within {SCRAPE_TIMEOUT}s, ending stream")
+                telemetry.incr("scraper_errors_total", site="stream_timeout")
+                break
+            if item is done:
+                break
+            streamed += 1
+            yield item
+    finally:
+        if future is not None:
+            future.cancel()
+
+    if not streamed:
+        # Every parsed constraint applies, as in search_products_async
+        fallback = stale or product_catalog.query_products(
+            **product_catalog.parse_constraints(product_name), limit=record_count
+        )
+        if fallback:
+            telemetry.incr("stale_served_total", source="search_cache" if stale else "catalog")
+            print(f"🕰️ SCRAPER: Stream found nothing; serving {len(fallback)} earlier results for '{product_name}'")
+        yield from fallback
+
 if __name__ == "__main__":
     # Test run
     test_product = "mechanical keyboard"
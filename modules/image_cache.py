@@ -0,0 +1,167 @@
+import io
+import os
+import re
+import html
+import socket
+import fnmatch
+import hashlib
+import ipaddress
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import concurrent.futures
+from PIL import Image
+
+from modules import telemetry
+
+# Served by Streamlit static file serving (see .streamlit/config.toml) at app/static/product_images/
+CACHE_DIR = os.path.join("static", "product_images")
+STATIC_URL_PREFIX = "app/static/product_images"
+
+# Cards render at width=200, so keep 2x for high-DPI screens
+MAX_WIDTH = 400
+JPEG_QUALITY = 85
+CACHE_MAX_BYTES = int(os.environ.get("PRODUCT_IMAGE_CACHE_MB", "200")) * 1024 * 1024
+FETCH_TIMEOUT = 10
+USER_AGENT = "Mozilla/5.0 (FashionFrenzy image proxy)"
+
+# The proxy only fetches from storefront image CDNs (shell-style patterns); other URLs are left untouched
+ALLOWED_HOSTS = [
+    h.strip().lower() for h in os.environ.get(
+        "PRODUCT_IMAGE_HOSTS",
+        "m.media-amazon.com,images-na.ssl-images-amazon.com,images-eu.ssl-images-amazon.com,rukminim*.flixcart.com",
+    ).split(",") if h.strip()
+]
+
+IMG_SRC_PATTERN = re.compile(r'(<img\s[^>]*?src=")(https?://[^"]+)(")', re.IGNORECASE)
+
+_lock = threading.Lock()
+_total_bytes = None  # computed lazily from disk on first write
+_generation = 0      # bumped whenever eviction deletes files, so rendered HTML can be invalidated
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="img-proxy")
+
+def _cache_name(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".jpg"
+
+def _host_allowed(url: str) -> bool:
+    parts = urllib.parse.urlsplit(url)
+    host = (parts.hostname or "").lower()
+    return parts.scheme in ("http", "https") and any(fnmatch.fnmatchcase(host, pattern) for pattern in ALLOWED_HOSTS)
+
+def is_fetchable(url: str) -> bool:
+    """Allow-listed CDN host that resolves only to public addresses (no private, loopback or link-local)."""
+    if not _host_allowed(url):
+        return False
+    parts = urllib.parse.urlsplit(url)
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80),
+                                       proto=socket.IPPROTO_TCP)
+    except (OSError, ValueError):
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(a[4][0].split("%")[0]).is_global for a in addresses)
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    """Follows redirects only to URLs that pass the same checks as the original."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not is_fetchable(newurl):
+            raise urllib.error.HTTPError(newurl, code, "Redirect to a disallowed host", headers, fp)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+_opener = urllib.request.build_opener(_CheckedRedirects)
+
+def _fetch_and_resize(url: str) -> bytes:
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with _opener.open(request, timeout=FETCH_TIMEOUT) as response:
+        raw = response.read()
+    with Image.open(io.BytesIO(raw)) as img:
+        img.draft("RGB", (MAX_WIDTH, MAX_WIDTH * 4))
+        img = img.convert("RGB")
+        if img.width > MAX_WIDTH:
+            img = img.resize((MAX_WIDTH, round(img.height * MAX_WIDTH / img.width)), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+def _evict_if_needed(incoming: int):
+    """Deletes least-recently-used files (by mtime, refreshed on every hit) until under budget."""
+    global _total_bytes, _generation
+    with _lock:
+        if _total_bytes is None:
+            # The incoming file is already on disk, so the scan counts it
+            _total_bytes = sum(entry.stat().st_size for entry in os.scandir(CACHE_DIR) if entry.is_file())
+        else:
+            _total_bytes += incoming
+        if _total_bytes <= CACHE_MAX_BYTES:
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(CACHE_DIR) if entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        _generation += 1
+        for entry in entries:
+            if _total_bytes <= CACHE_MAX_BYTES * 0.9:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                _total_bytes -= size
+                telemetry.incr("cache_evictions_total", cache="product_image")
+            except OSError:
+                pass
+
+def generation() -> int:
+    """Changes whenever cached files were evicted; HTML pointing at the cache is stale across a change."""
+    return _generation
+
+def cached_image_url(url: str) -> str:
+    """
+    Returns a local static URL for a resized copy of `url`, fetching it on first use.
+    Falls back to the original URL when the image cannot be fetched or decoded,
+    or is not on an allow-listed storefront CDN.
+    """
+    if not _host_allowed(url):
+        telemetry.incr("image_proxy_rejected_total")
+        return url
+    name = _cache_name(url)
+    path = os.path.join(CACHE_DIR, name)
+    if os.path.exists(path):
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        telemetry.incr("cache_hits_total", cache="product_image")
+        return f"{STATIC_URL_PREFIX}/{name}"
+
+    telemetry.incr("cache_misses_total", cache="product_image")
+    if not is_fetchable(url):
+        telemetry.incr("image_proxy_rejected_total")
+        return url
+    try:
+        with telemetry.span("image_proxy_fetch"):
+            data = _fetch_and_resize(url)
+    except Exception as e:
+        print(f"⚠️ IMAGE CACHE: Could not cache {url}: {e}")
+        return url
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    _evict_if_needed(len(data))
+    return f"{STATIC_URL_PREFIX}/{name}"
+
+def rewrite_card_images(content: str) -> str:
+    """
+    Points every remote <img src> in an assistant message (product cards) at
+    the local cache, fetching misses in parallel. Never pass user-typed text:
+    only allow-listed CDN hosts are fetched, but cards are the only intended input.
+    """
+    urls = list(dict.fromkeys(m.group(2) for m in IMG_SRC_PATTERN.finditer(content)))
+    if not urls:
+        return content
+    # Card HTML escapes attribute values, so unescape before fetching
+    local = dict(zip(urls, _executor.map(lambda u: cached_image_url(html.unescape(u)), urls)))
+    return IMG_SRC_PATTERN.sub(lambda m: m.group(1) + local[m.group(2)] + m.group(3), content)
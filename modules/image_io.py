@@ -0,0 +1,115 @@
+import io
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from PIL import Image, ImageOps
+
+from modules import telemetry
+
+# Decoded images shared by every session, bounded by their pixel memory
+DECODED_CACHE_BYTES = int(os.environ.get("FASHION_DECODED_IMAGE_MB", "128")) * 1024 * 1024
+
+# Wardrobe grid thumbnails (3 per row in a narrow column; 2x for high-DPI screens)
+THUMBNAIL_SIDE = 320
+
+# Largest side sent to the image model; bigger photos only cost memory and upload time
+MODEL_MAX_SIDE = 1536
+
+_cache = OrderedDict()  # key -> (image, bytes)
+_cache_bytes = 0
+_lock = threading.Lock()
+
+def _image_bytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+def _get(key):
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        _cache.move_to_end(key)
+        return entry[0]
+
+def _put(key, img: Image.Image):
+    global _cache_bytes
+    size = _image_bytes(img)
+    if size > DECODED_CACHE_BYTES:
+        return
+    with _lock:
+        if key in _cache:
+            _cache_bytes -= _cache.pop(key)[1]
+        _cache[key] = (img, size)
+        _cache_bytes += size
+        while _cache_bytes > DECODED_CACHE_BYTES:
+            _, (_, evicted) = _cache.popitem(last=False)
+            _cache_bytes -= evicted
+            telemetry.incr("cache_evictions_total", cache="decoded_image")
+
+@contextmanager
+def open_image(source):
+    """
+    Opens a path, bytes or file-like object (e.g. a Streamlit upload) and
+    always closes the underlying file handle on exit.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    elif hasattr(source, "getvalue"):
+        source = io.BytesIO(source.getvalue())
+    img = Image.open(source)
+    try:
+        yield img
+    finally:
+        img.close()
+
+def _decode(source, max_side: int) -> Image.Image:
+    """Decodes at reduced size: JPEG draft mode scales by 1/2..1/8 during decode, then an exact thumbnail."""
+    with open_image(source) as img:
+        if max_side:
+            img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGB")
+        if max_side:
+            img.thumbnail((max_side, max_side))
+        img.load()
+        return img
+
+def _source_key(source, max_side: int):
+    if isinstance(source, str):
+        stat = os.stat(source)
+        return ("path", os.path.abspath(source), stat.st_mtime_ns, stat.st_size, max_side)
+    data = source.getvalue() if hasattr(source, "getvalue") else bytes(source)
+    return ("bytes", hashlib.sha256(data).hexdigest(), max_side)
+
+def load_image(source, max_side: int = MODEL_MAX_SIDE) -> Image.Image:
+    """
+    Decoded image no larger than `max_side`, shared through the byte-budget
+    LRU. Callers must treat the result as read-only (copy before mutating).
+    """
+    key = _source_key(source, max_side)
+    img = _get(key)
+    if img is not None:
+        telemetry.incr("cache_hits_total", cache="decoded_image")
+        return img
+    telemetry.incr("cache_misses_total", cache="decoded_image")
+    img = _decode(source, max_side)
+    _put(key, img)
+    return img
+
+def load_thumbnail(path: str) -> Image.Image:
+    """Small preview for grids; decodes a fraction of the pixels of a full load."""
+    return load_image(path, THUMBNAIL_SIDE)
+
+def encode(img: Image.Image, img_format: str = "JPEG", quality: int = 95) -> bytes:
+    """Encodes to bytes without keeping the intermediate buffer alive."""
+    if img_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    with io.BytesIO() as buf:
+        img.save(buf, format=img_format, quality=quality)
+        return buf.getvalue()
+
+def cache_stats() -> dict:
+    with _lock:
+        return {"entries": len(_cache), "bytes": _cache_bytes, "budget": DECODED_CACHE_BYTES}
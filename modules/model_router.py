@@ -0,0 +1,137 @@
+import os
+import re
+import time
+
+from modules import telemetry, rate_limiter, resilience
+
+# Set to "off" to send every call to the model picked on the welcome screen
+ROUTING_ENABLED = os.environ.get("FASHION_MODEL_ROUTING", "on").lower() not in ("off", "0", "false")
+
+# Chat models the router may pick: relative cost (USD per 1M input tokens) and a
+# quality tier (1 = fine for short/formatting replies, 2 = styling and tool calls, 3 = best)
+MODEL_PROFILES = {
+    "gemini-2.0-flash-lite": {"cost": 0.075, "quality": 1},
+    "gemini-1.5-flash": {"cost": 0.075, "quality": 2},
+    "gemini-2.0-flash": {"cost": 0.10, "quality": 2},
+    "gemini-1.5-pro": {"cost": 1.25, "quality": 3},
+}
+
+# Per turn type: lowest acceptable quality tier, p95 latency target (seconds), and
+# whether the user's own model choice takes precedence when it meets the tier
+ROUTES = {
+    "smalltalk": {"min_quality": 1, "latency_target": 2.0, "prefer_selected": False},
+    "format": {"min_quality": 1, "latency_target": 2.0, "prefer_selected": False},
+    "wardrobe": {"min_quality": 2, "latency_target": 6.0, "prefer_selected": True},
+    "shopping": {"min_quality": 2, "latency_target": 6.0, "prefer_selected": True},
+}
+
+# Models tried per call, including fallbacks
+MAX_CHAIN = 3
+
+# Retries on a model before falling back to the next one; the last model gets the full budget
+FALLBACK_RETRIES = 1
+
+SMALLTALK = re.compile(
+    r"^\s*(hi|hii+|hello|hey|thanks|thank you|thx|ok|okay|cool|great|nice|awesome|bye|good (?:morning|night)|"
+    r"lol|haha|yes|no|sure|got it|perfect)\b[\s!.?]*$",
+    re.IGNORECASE,
+)
+
+# Replies that accept an offer ("Shall I search for kurtas?" - "yes please") continue the previous turn
+AFFIRMATIVE = re.compile(
+    r"^\s*(yes|yeah|yep|yup|sure|ok|okay|go ahead|do it|please do|why not|sounds good)\b", re.IGNORECASE,
+)
+
+def _previous_route(history: list):
+    """Route of the last assistant turn: "shopping" if it showed cards or offered a search, "wardrobe" if it styled."""
+    from modules import prefetch, outfits, product_cards
+    last = next((m["content"] for m in reversed(history or []) if m.get("role") == "assistant"), None)
+    if not last:
+        return None
+    if product_cards.has_cards(last) or prefetch.SHOPPING_INTENT.search(last):
+        return "shopping"
+    words = set(re.findall(r"[a-z'-]+", last.lower()))
+    if outfits.is_outfit_question(last) or words & prefetch.PRODUCT_WORDS or "wardrobe" in words:
+        return "wardrobe"
+    return None
+
+def classify_turn(user_input: str, history: list = None) -> str:
+    """
+    "smalltalk", "shopping" or "wardrobe" for a user message, by keyword rules.
+    Short follow-ups ("yes please", "make it cheaper") inherit the route of the
+    previous assistant turn; only explicit pleasantries are small talk.
+    """
+    from modules import prefetch, outfits
+    previous = _previous_route(history)
+    if SMALLTALK.match(user_input) and not (previous and AFFIRMATIVE.match(user_input)):
+        return "smalltalk"
+    if prefetch.SHOPPING_INTENT.search(user_input):
+        return "shopping"
+    words = set(re.findall(r"[a-z'-]+", user_input.lower()))
+    if outfits.is_outfit_question(user_input) or words & prefetch.PRODUCT_WORDS or "wardrobe" in words:
+        return "wardrobe"
+    return previous or "wardrobe"
+
+def _latency(model: str) -> resilience.LatencyTracker:
+    return resilience.latency_for(f"model:{model}")
+
+def route_chain(route: str, selected_model: str) -> list:
+    """
+    Models to try for one call, in order: the cheapest meeting the route's
+    quality tier whose recent p95 latency is within target, then the next
+    eligible models by cost. The user's model leads on routes that prefer it
+    and otherwise closes the chain as the last resort.
+    """
+    if not ROUTING_ENABLED or route not in ROUTES:
+        return [selected_model]
+    target = ROUTES[route]
+    eligible = [m for m, p in MODEL_PROFILES.items() if p["quality"] >= target["min_quality"]]
+
+    def too_slow(model):
+        p95 = _latency(model).percentile(resilience.HEDGE_PERCENTILE)
+        return p95 is not None and p95 > target["latency_target"]
+
+    eligible.sort(key=lambda m: (too_slow(m), MODEL_PROFILES[m]["cost"], MODEL_PROFILES[m]["quality"]))
+    selected_quality = MODEL_PROFILES.get(selected_model, {}).get("quality", target["min_quality"])
+    if target["prefer_selected"] and selected_quality >= target["min_quality"]:
+        eligible.insert(0, selected_model)
+    chain = list(dict.fromkeys(eligible))[:MAX_CHAIN - 1]
+    if selected_model not in chain:
+        chain.append(selected_model)
+    return chain
+
+def call(api_key: str, route: str, selected_model: str, fn, stage: str):
+    """
+    Runs `fn(model)` for the first model in the route's chain that answers,
+    falling back down the chain on errors (rate limits included, after a
+    short retry). Returns (response, model); raises the last error when every
+    model fails.
+    """
+    chain = route_chain(route, selected_model)
+    last_error = None
+    for i, model in enumerate(chain):
+        last = i == len(chain) - 1
+        start = time.perf_counter()
+        try:
+            response = rate_limiter.call(
+                api_key, model, lambda: fn(model),
+                max_retries=rate_limiter.MAX_RETRIES if last else FALLBACK_RETRIES,
+            )
+        except Exception as e:
+            last_error = e
+            code = rate_limiter._status_code(e)
+            telemetry.incr("model_fallbacks_total", route=route, model=model, code=code or "error")
+            if not last:
+                print(f"🔀 ROUTER: {model} failed for {route} ({code or type(e).__name__}), falling back to {chain[i + 1]}")
+            continue
+        elapsed = time.perf_counter() - start
+        _latency(model).record(elapsed)
+        telemetry.observe("route_latency_seconds", elapsed, route=route, model=model)
+        telemetry.incr("routed_calls_total", route=route, model=model)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            telemetry.incr("route_tokens_total", getattr(usage, "prompt_token_count", None) or 0, route=route, model=model, kind="prompt")
+            telemetry.incr("route_tokens_total", getattr(usage, "candidates_token_count", None) or 0, route=route, model=model, kind="output")
+        telemetry.record_token_usage(response, model, stage)
+        return response, model
+    raise last_error
@@ -0,0 +1,125 @@
+import re
+from typing import Dict, Any, Optional
+
+# Currency symbols/codes seen on storefront listings, mapped to ISO codes
+CURRENCY_SYMBOLS = {
+    "₹": "INR", "rs": "INR", "rs.": "INR", "inr": "INR",
+    "$": "USD", "usd": "USD",
+    "€": "EUR", "eur": "EUR",
+    "£": "GBP", "gbp": "GBP",
+}
+DEFAULT_CURRENCY = "INR"
+
+_AMOUNT = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_CURRENCY = re.compile(r"(₹|\$|€|£|\brs\.?|\binr\b|\busd\b|\beur\b|\bgbp\b)", re.IGNORECASE)
+_ASIN = re.compile(r"/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?:[/?]|$)")
+_REVIEWS = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*([kK])?\s*(?:ratings?|reviews?|global ratings?)|\((\d[\d,]*)\)")
+
+def parse_price(value: str) -> Optional[float]:
+    """'₹1,299.00' -> 1299.0; returns None for 'N/A' or unparseable text."""
+    if not value:
+        return None
+    match = _AMOUNT.search(str(value))
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(",", ""))
+    except ValueError:
+        return None
+
+def parse_currency(value: str) -> Optional[str]:
+    """'₹1,299' -> 'INR'; None when the text has no amount at all."""
+    if not value or parse_price(value) is None:
+        return None
+    match = _CURRENCY.search(str(value))
+    if not match:
+        return DEFAULT_CURRENCY
+    return CURRENCY_SYMBOLS.get(match.group(1).lower(), DEFAULT_CURRENCY)
+
+def parse_rating(value: str) -> Optional[float]:
+    """'4.5 out of 5 stars' -> 4.5; returns None when missing or out of range."""
+    if not value:
+        return None
+    match = re.search(r"\d(?:\.\d+)?", str(value))
+    if not match:
+        return None
+    rating = float(match.group(0))
+    return rating if 0 <= rating <= 5 else None
+
+def parse_review_count(value: str) -> Optional[int]:
+    """'12,345 ratings' / '(1,204)' / '2.3K reviews' -> int."""
+    if not value:
+        return None
+    text = str(value)
+    match = _REVIEWS.search(text)
+    if not match:
+        # A bare number field such as '1,204'
+        bare = re.fullmatch(r"\s*(\d[\d,]*)\s*", text)
+        return int(bare.group(1).replace(",", "")) if bare else None
+    if match.group(3):
+        return int(match.group(3).replace(",", ""))
+    count = float(match.group(1).replace(",", ""))
+    return int(count * 1000) if match.group(2) else int(count)
+
+def discount_percent(actual: Optional[float], offer: Optional[float]) -> Optional[int]:
+    """Whole-number discount, or None when there is no real markdown."""
+    if not actual or not offer or offer >= actual:
+        return None
+    return round((actual - offer) / actual * 100)
+
+def extract_asin(product_link: str) -> Optional[str]:
+    """Amazon ASIN from a product URL, e.g. https://www.amazon.in/dp/B0ABCDEFGH -> 'B0ABCDEFGH'."""
+    if not product_link:
+        return None
+    match = _ASIN.search(product_link)
+    return match.group(1) if match else None
+
+def normalize_product(product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a copy of a scraped ProductItem dict with numeric fields added:
+    currency, actual_amount, offer_amount, discount_percent, rating_value,
+    review_count_value and asin. Missing values stay None.
+    """
+    actual = parse_price(product.get("actual_price", ""))
+    offer = parse_price(product.get("offer_price", ""))
+    if offer is None:
+        offer = actual
+    normalized = dict(product)
+    normalized.update(
+        currency=parse_currency(product.get("offer_price", "")) or parse_currency(product.get("actual_price", "")),
+        actual_amount=actual,
+        offer_amount=offer,
+        discount_percent=discount_percent(actual, offer),
+        rating_value=parse_rating(product.get("rating", "")),
+        review_count_value=parse_review_count(product.get("review_count", "")) or parse_review_count(product.get("rating", "")),
+        asin=extract_asin(product.get("product_link", "")),
+    )
+    return normalized
+
+def parse_constraints(query: str) -> Dict[str, Any]:
+    """
+    Splits price/rating filters out of a free-text search:
+    'kurta under ₹2000 rated 4+' -> {'terms': 'kurta', 'max_price': 2000.0, 'min_rating': 4.0, ...}
+    """
+    text = query
+    constraints = {"max_price": None, "min_price": None, "min_rating": None}
+
+    patterns = (
+        ("max_price", r"\b(?:under|below|less than|within|upto|up to|max)\s*(?:₹|rs\.?|inr)?\s*(\d[\d,]*)"),
+        ("min_price", r"\b(?:above|over|more than|min)\s*(?:₹|rs\.?|inr)?\s*(\d[\d,]{2,})"),
+        ("min_rating", r"\b(?:rated|rating(?: above| over| of)?)\s*(\d(?:\.\d)?)\s*\+?(?:\s*stars?)?(?:\s*(?:and|&)\s*(?:above|up))?"),
+        ("min_rating", r"\b(\d(?:\.\d)?)\s*\+\s*(?:stars?|rating|rated)?"),
+        ("min_rating", r"\b(\d(?:\.\d)?)\s*stars?\s*(?:and|&)\s*(?:above|up)"),
+    )
+    for field, pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match and constraints[field] is None:
+            value = float(match.group(1).replace(",", ""))
+            if field == "min_rating" and value > 5:
+                continue
+            constraints[field] = value
+            text = text[:match.start()] + " " + text[match.end():]
+
+    text = re.sub(r"[,₹]+", " ", text)
+    constraints["terms"] = " ".join(text.split())
+    return constraints
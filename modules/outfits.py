@@ -0,0 +1,243 @@
+import os
+import re
+import threading
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from modules import wardrobe, telemetry
+
+# Colour families; neutrals pair with everything
+COLOR_FAMILIES = {
+    "neutral": {"black", "white", "grey", "gray", "charcoal", "navy", "beige", "cream", "ivory", "khaki", "denim", "silver"},
+    "earth": {"brown", "tan", "camel", "olive", "rust", "mustard", "coffee", "chocolate", "bronze", "gold", "golden"},
+    "warm": {"red", "maroon", "wine", "orange", "peach", "coral", "pink", "yellow"},
+    "cool": {"blue", "sky", "teal", "green", "mint", "purple", "lavender", "turquoise"},
+}
+FAMILY_NAMES = ["neutral", "earth", "warm", "cool", "unknown"]
+# Pairwise colour-family compatibility (rows/cols follow FAMILY_NAMES)
+COLOR_COMPAT = np.array([
+    [1.0, 1.0, 1.0, 1.0, 0.8],
+    [1.0, 0.8, 0.7, 0.6, 0.7],
+    [1.0, 0.7, 0.5, 0.4, 0.6],
+    [1.0, 0.6, 0.4, 0.7, 0.6],
+    [0.8, 0.7, 0.6, 0.6, 0.7],
+])
+
+# Garment keywords -> (formality 0..1, style); style is one of ethnic / western / sport / lounge
+GARMENT_ATTRIBUTES = {
+    "sherwani": (1.0, "ethnic"), "saree": (0.9, "ethnic"), "sari": (0.9, "ethnic"), "lehenga": (1.0, "ethnic"),
+    "kurta": (0.6, "ethnic"), "kurti": (0.5, "ethnic"), "dhoti": (0.7, "ethnic"), "juttis": (0.7, "ethnic"),
+    "mojari": (0.7, "ethnic"), "dupatta": (0.6, "ethnic"), "churidar": (0.6, "ethnic"), "bindi": (0.6, "ethnic"),
+    "suit": (1.0, "western"), "blazer": (0.9, "western"), "tie": (0.9, "western"), "oxford": (0.9, "western"),
+    "loafer": (0.7, "western"), "loafers": (0.7, "western"), "shirt": (0.6, "western"), "trouser": (0.7, "western"),
+    "trousers": (0.7, "western"), "pant": (0.6, "western"), "pants": (0.6, "western"), "chinos": (0.5, "western"),
+    "shoe": (0.6, "western"), "shoes": (0.6, "western"), "heels": (0.8, "western"), "dress": (0.7, "western"),
+    "gown": (1.0, "western"), "skirt": (0.5, "western"), "watch": (0.6, "western"), "glasses": (0.5, "western"),
+    "hat": (0.4, "western"), "jeans": (0.3, "western"), "tshirt": (0.2, "western"), "tee": (0.2, "western"),
+    "sneakers": (0.2, "sport"), "joggers": (0.1, "sport"), "shorts": (0.1, "sport"), "hoodie": (0.2, "sport"),
+    "cap": (0.1, "sport"), "tracksuit": (0.0, "sport"), "slippers": (0.0, "lounge"), "flip": (0.0, "lounge"),
+    "pyjama": (0.0, "lounge"), "pajama": (0.0, "lounge"),
+}
+STYLES = ["ethnic", "western", "sport", "lounge"]
+
+# Garments worn by one gender only (file-name keywords); anything else is treated as unisex
+GENDERED_GARMENTS = {
+    "Female": {"saree", "sari", "lehenga", "kurti", "dupatta", "gown", "dress", "skirt", "heels", "bindi",
+               "blouse", "earrings", "women", "womens", "ladies", "girls"},
+    "Male": {"sherwani", "dhoti", "men", "mens", "gents", "boys"},
+}
+
+# Being more formal than the occasion costs this share of being as much less formal:
+# a shirt and trousers suit a casual day better than a wedding
+OVERDRESS_PENALTY = 0.5
+
+# Occasions at or above this target formality never get loungewear (slippers, pyjamas)
+LOUNGE_MAX_FORMALITY = 0.5
+
+# Occasion -> (target formality, preferred styles); first matching keyword wins
+OCCASIONS = {
+    "wedding": (0.9, {"ethnic", "western"}),
+    "festival": (0.7, {"ethnic"}),
+    "interview": (0.85, {"western"}),
+    "office": (0.7, {"western", "ethnic"}),
+    "party": (0.6, {"western", "ethnic"}),
+    "date": (0.5, {"western"}),
+    "casual": (0.3, {"western", "sport"}),
+    "gym": (0.0, {"sport"}),
+    "home": (0.0, {"lounge", "sport"}),
+}
+OCCASION_KEYWORDS = {
+    "wedding": ("wedding", "shaadi", "reception", "sangeet", "mehendi", "engagement"),
+    "festival": ("festival", "diwali", "eid", "puja", "pooja", "navratri", "holi", "temple"),
+    "interview": ("interview",),
+    "office": ("office", "work", "meeting", "formal", "conference", "presentation"),
+    "party": ("party", "club", "birthday", "cocktail", "night out"),
+    "date": ("date", "dinner"),
+    "gym": ("gym", "workout", "run", "running", "yoga", "sport"),
+    "home": ("home", "lounge", "sleep"),
+    "casual": ("casual", "college", "weekend", "brunch", "travel", "outing", "movie"),
+}
+DEFAULT_OCCASION = "casual"
+
+# Messages that ask for an outfit from the existing wardrobe
+OUTFIT_QUESTION = re.compile(
+    r"\b(what (?:should|shall|can|do) i wear|what to wear|outfit|style me|dress (?:up )?for|"
+    r"what goes with|pair (?:it|this|my)|from my wardrobe|combination)\b",
+    re.IGNORECASE,
+)
+
+# Beam search order; the overlap category covers both upper and lower body
+SLOT_ORDER = ["Upper Body", "Lower Body", "Feet", "Neck", "Face (Glasses/Masks)", "Head/Hair"]
+OVERLAP_CATEGORY = "Special: Saree/Drapes (Overlap)"
+OVERLAP_COVERS = {"Upper Body", "Lower Body"}
+REQUIRED_SLOTS = {"Upper Body", "Lower Body", "Feet"}
+BEAM_WIDTH = 16
+TOP_OUTFITS = 3
+
+_outfit_cache = {}  # (occasion, wardrobe fingerprint) -> outfits
+_cache_lock = threading.Lock()
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z]+", text.lower())
+
+def item_attributes(category: str, file_name: str) -> Dict[str, Any]:
+    """Attributes guessed from an item's file name: colour family, formality and style."""
+    words = _words(os.path.splitext(file_name)[0])
+    family = next((name for name in FAMILY_NAMES[:-1] if COLOR_FAMILIES[name] & set(words)), "unknown")
+    formality, style = 0.5, None
+    for word in words:
+        if word in GARMENT_ATTRIBUTES:
+            formality, style = GARMENT_ATTRIBUTES[word]
+            break
+    if style is None and category == OVERLAP_CATEGORY:
+        formality, style = 0.9, "ethnic"
+    gender = next((g for g, keywords in GENDERED_GARMENTS.items() if keywords & set(words)), None)
+    if gender is None and category == OVERLAP_CATEGORY:
+        gender = "Female"
+    return {"category": category, "file_name": file_name, "color": family, "formality": formality, "style": style,
+            "gender": gender}
+
+def _suits(item: Dict[str, Any], occasion: str, user_gender: Optional[str]) -> bool:
+    """Whether an item may appear in an outfit: right gender (or unisex), and no loungewear for dressy occasions."""
+    if user_gender and item["gender"] not in (None, user_gender.capitalize()):
+        return False
+    return not (item["style"] == "lounge" and OCCASIONS[occasion][0] >= LOUNGE_MAX_FORMALITY)
+
+def _embedding(item: Dict[str, Any]) -> np.ndarray:
+    """[formality, style one-hot...]; items without a known style sit in the middle of every style."""
+    style = np.full(len(STYLES), 1 / len(STYLES)) if item["style"] is None else np.array(
+        [1.0 if s == item["style"] else 0.0 for s in STYLES])
+    return np.concatenate(([item["formality"]], style))
+
+def _occasion_fit(items: List[Dict[str, Any]], occasion: str) -> np.ndarray:
+    target, styles = OCCASIONS[occasion]
+    gap = target - np.array([i["formality"] for i in items])
+    style_ok = np.array([1.0 if i["style"] in styles else 0.6 if i["style"] is None else 0.2 for i in items])
+    return (1 - np.where(gap > 0, gap, -gap * OVERDRESS_PENALTY)) * 0.6 + style_ok * 0.4
+
+def _pair_compat(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    color = COLOR_COMPAT[FAMILY_NAMES.index(a["color"]), FAMILY_NAMES.index(b["color"])]
+    ea, eb = a["embedding"], b["embedding"]
+    style = float(ea[1:] @ eb[1:] / (np.linalg.norm(ea[1:]) * np.linalg.norm(eb[1:])))
+    formality = 1 - abs(ea[0] - eb[0])
+    return float(0.4 * color + 0.35 * style + 0.25 * formality)
+
+def _fingerprint(items: Dict[str, List[str]]) -> tuple:
+    return tuple((category, tuple(files)) for category, files in sorted(items.items()))
+
+def detect_occasion(text: str) -> str:
+    lowered = text.lower()
+    for occasion, keywords in OCCASION_KEYWORDS.items():
+        if any(re.search(rf"\b{re.escape(k)}\b", lowered) for k in keywords):
+            return occasion
+    return DEFAULT_OCCASION
+
+def is_outfit_question(text: str) -> bool:
+    return bool(OUTFIT_QUESTION.search(text))
+
+def compose_outfits(occasion: str, user_gender: str = None, top_k: int = TOP_OUTFITS,
+                    beam_width: int = BEAM_WIDTH) -> List[Dict[str, Any]]:
+    """
+    Best wardrobe outfits for an occasion via beam search over SLOT_ORDER:
+    each step extends the surviving partial outfits with one item (or nothing
+    for optional slots) and keeps the `beam_width` best by mean item fit plus
+    mean pairwise compatibility. Items for the other gender, and loungewear
+    for dressy occasions, are left out. Cached per occasion and gender until
+    the wardrobe changes.
+    """
+    inventory = wardrobe.list_items()
+    key = (occasion, user_gender, _fingerprint(inventory))
+    with _cache_lock:
+        if key in _outfit_cache:
+            telemetry.incr("cache_hits_total", cache="outfits")
+            return _outfit_cache[key][:top_k]
+    telemetry.incr("cache_misses_total", cache="outfits")
+
+    with telemetry.span("outfit_search", occasion=occasion):
+        by_category = {}
+        for category, files in inventory.items():
+            items = [i for i in (item_attributes(category, f) for f in files) if _suits(i, occasion, user_gender)]
+            if not items:
+                continue
+            fits = _occasion_fit(items, occasion)
+            for item, fit in zip(items, fits):
+                item["embedding"] = _embedding(item)
+                item["fit"] = float(fit)
+            by_category[category] = items
+
+        def score(outfit):
+            if not outfit:
+                return 0.0
+            fit = sum(i["fit"] for i in outfit) / len(outfit)
+            pairs = [_pair_compat(a, b) for n, a in enumerate(outfit) for b in outfit[n + 1:]]
+            return float(0.5 * fit + 0.5 * (sum(pairs) / len(pairs) if pairs else fit))
+
+        # Each beam entry: (covered slots, items)
+        beam = [(frozenset(), [])]
+        beam += [(frozenset(OVERLAP_COVERS), [item]) for item in by_category.get(OVERLAP_CATEGORY, [])]
+        for slot in SLOT_ORDER:
+            candidates = by_category.get(slot, [])
+            extended = []
+            for covered, outfit in beam:
+                if slot in covered:
+                    extended.append((covered, outfit))
+                    continue
+                extended += [(covered | {slot}, outfit + [item]) for item in candidates]
+                # Optional slots (and required ones the wardrobe cannot fill) may stay empty
+                if slot not in REQUIRED_SLOTS or not candidates:
+                    extended.append((covered, outfit))
+            extended.sort(key=lambda entry: score(entry[1]), reverse=True)
+            beam = extended[:beam_width]
+
+        # Keep one outfit per core (clothes + shoes) so accessory swaps do not crowd out real alternatives
+        outfits, cores = [], set()
+        for _, outfit in beam:
+            core = tuple(i["file_name"] for i in outfit if i["category"] in REQUIRED_SLOTS | {OVERLAP_CATEGORY})
+            if outfit and core not in cores:
+                cores.add(core)
+                outfits.append({"items": [(i["category"], i["file_name"]) for i in outfit], "score": round(score(outfit), 3)})
+
+    with _cache_lock:
+        if len(_outfit_cache) >= len(OCCASIONS) * 8:
+            # Entries for older wardrobe states are never hit again
+            _outfit_cache.clear()
+        _outfit_cache[key] = outfits
+    return outfits[:top_k]
+
+def outfit_context(user_input: str, user_gender: str = None) -> Optional[str]:
+    """
+    Compact wardrobe context for 'what should I wear' questions: only the top
+    precomputed outfits for the detected occasion. None for other messages.
+    """
+    if not is_outfit_question(user_input):
+        return None
+    occasion = detect_occasion(user_input)
+    outfits = compose_outfits(occasion, user_gender)
+    if not outfits:
+        return None
+    lines = [f"Best outfits from the user's wardrobe for '{occasion}' (ranked; suggest from these):"]
+    for n, outfit in enumerate(outfits, 1):
+        parts = ", ".join(f"{category}: {name}" for category, name in outfit["items"])
+        lines.append(f"{n}. {parts} (match {outfit['score']:.2f})")
+    return "\n".join(lines)
@@ -0,0 +1,119 @@
+import re
+
+from modules import telemetry, async_runtime, rate_limiter
+
+# Phrases that signal the user wants to buy or find something
+SHOPPING_INTENT = re.compile(
+    r"\b(buy|purchase|shop|shopping|find|search|looking for|look for|show me|get me|need (?:a|an|some|new)|"
+    r"suggest (?:a|an|some)|recommend (?:a|an|some)|where can i get|price of|under ₹?\d+)\b",
+    re.IGNORECASE,
+)
+
+# Garment/accessory nouns; a query is only prefetched if it names one of these
+PRODUCT_WORDS = {
+    "shirt", "tshirt", "t-shirt", "tee", "top", "kurta", "kurti", "sherwani", "blazer", "jacket", "coat",
+    "hoodie", "sweater", "sweatshirt", "suit", "waistcoat", "dress", "gown", "saree", "sari", "lehenga",
+    "dupatta", "skirt", "jeans", "pant", "pants", "trousers", "chinos", "shorts", "joggers", "leggings",
+    "shoe", "shoes", "sneakers", "loafers", "boots", "sandals", "heels", "slippers", "flats", "juttis",
+    "mojari", "watch", "belt", "bag", "handbag", "clutch", "wallet", "sunglasses", "glasses", "cap",
+    "hat", "scarf", "stole", "tie", "necklace", "earrings", "bracelet", "ring", "socks",
+}
+
+STOPWORDS = {
+    "a", "an", "the", "some", "me", "my", "i", "im", "i'm", "for", "to", "of", "and", "or", "with", "in",
+    "on", "please", "can", "you", "could", "would", "want", "need", "new", "good", "nice", "best", "buy",
+    "purchase", "shop", "shopping", "find", "search", "looking", "look", "show", "get", "suggest",
+    "recommend", "where", "that", "this", "it", "is", "are", "be", "something", "online", "amazon",
+}
+
+GENDER_WORDS = {"men", "man", "mens", "men's", "male", "women", "woman", "womens", "women's", "female"}
+
+# Token-set overlap needed before a prefetched result is handed to the model's tool call
+MATCH_THRESHOLD = 0.6
+
+def _tokens(text: str) -> set:
+    words = re.findall(r"[a-z0-9₹'-]+", text.lower())
+    tokens = set()
+    for word in words:
+        if word in GENDER_WORDS:
+            tokens.add("men" if word in {"men", "man", "mens", "men's", "male"} else "women")
+        elif word not in STOPWORDS:
+            tokens.add(word[:-1] if word.endswith("s") and len(word) > 3 else word)
+    return tokens
+
+def extract_candidate_query(user_input: str, user_gender: str):
+    """
+    Cheaply guesses the search the model is likely to issue for this message.
+    Returns None when the message does not look like a shopping request.
+    """
+    if not SHOPPING_INTENT.search(user_input):
+        return None
+    words = re.findall(r"[a-z0-9₹'-]+", user_input.lower())
+    if not any(w in PRODUCT_WORDS for w in words):
+        return None
+
+    kept = [w for w in words if w not in STOPWORDS and w not in GENDER_WORDS]
+    gender_word = "men" if user_gender.lower() == "male" else "women"
+    return " ".join([*kept[:6], gender_word])
+
+def queries_match(prefetched: str, requested: str) -> bool:
+    """True when two search strings are close enough to share one scrape."""
+    if " ".join(prefetched.lower().split()) == " ".join(requested.lower().split()):
+        return True
+    a, b = _tokens(prefetched), _tokens(requested)
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= MATCH_THRESHOLD
+
+class SpeculativeSearch:
+    """A scrape started before the model has decided whether it needs one."""
+
+    def __init__(self, query: str, record_count: int, api_key: str):
+        self.query = query
+        self.record_count = record_count
+        self.used = False
+        print(f"🔮 PREFETCH: Speculatively searching '{query}'")
+        telemetry.incr("prefetch_total", outcome="started")
+        from modules.ecommerce_scraper import search_products_async
+        # Speculative extraction calls queue behind real chat turns on the per-key limiter
+        self.future = async_runtime.submit(
+            search_products_async(query, record_count, api_key, rate_limiter.PRIORITY_BACKGROUND)
+        )
+
+    def take(self, requested_query: str, record_count: int, timeout: float = 60):
+        """Returns the prefetched products if they answer the requested tool call, else None."""
+        if record_count > self.record_count or not queries_match(self.query, requested_query):
+            telemetry.incr("prefetch_total", outcome="mismatch")
+            return None
+        try:
+            products = self.future.result(timeout=timeout)
+        except Exception as e:
+            print(f"⚠️ PREFETCH: Speculative search failed: {e}")
+            return None
+        if not products:
+            return None
+        self.used = True
+        telemetry.incr("prefetch_total", outcome="used")
+        print(f"⚡ PREFETCH: Reusing speculative results for '{requested_query}'")
+        return products[:record_count]
+
+    def cancel(self):
+        """Cancels the speculative scrape (even mid-crawl) if nobody used it."""
+        if self.used:
+            return
+        if self.future.cancel():
+            telemetry.incr("prefetch_total", outcome="cancelled")
+        else:
+            telemetry.incr("prefetch_total", outcome="unused")
+
+def start_for_message(user_input: str, user_gender: str, api_key: str, record_count: int = 5):
+    """Starts a speculative search for a shopping-style message; returns None otherwise."""
+    query = extract_candidate_query(user_input, user_gender)
+    if not query or not api_key:
+        return None
+    # Only shopping messages pay for importing the scraper stack
+    from modules.ecommerce_scraper import get_cached_results
+    if get_cached_results(query, record_count) is not None:
+        # Already warm; the tool call will hit the cache directly
+        return None
+    return SpeculativeSearch(query, record_count, api_key)
@@ -0,0 +1,127 @@
+import os
+import re
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+
+from PIL import Image
+
+from modules import wardrobe, telemetry, rate_limiter, cutouts
+
+# Background try-ons allowed per user per rolling hour
+PRERENDER_BUDGET = int(os.environ.get("FASHION_PRERENDER_BUDGET", "4"))
+BUDGET_WINDOW = 60 * 60
+
+# Garments pre-rendered per uploaded person photo
+PRERENDER_CANDIDATES = 2
+
+# Wardrobe categories that make sense as try-on garments
+GARMENT_CATEGORIES = ("Upper Body", "Special: Saree/Drapes (Overlap)", "Lower Body")
+
+# Recent chat messages scanned for garment mentions
+RECENT_MESSAGES = 6
+
+# One worker: pre-renders are background work and never compete with each other
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prerender")
+_pending = {}  # result key -> Future
+_spent = {}    # user id -> deque of submission timestamps
+_lock = threading.Lock()
+
+def _name_words(file_name: str) -> set:
+    return {w for w in re.findall(r"[a-z]+", os.path.splitext(file_name)[0].lower()) if len(w) > 2}
+
+def likely_garments(messages: List[Dict], limit: int = PRERENDER_CANDIDATES) -> List[str]:
+    """
+    Wardrobe garment paths the user is most likely to try next: items named in
+    recent chat messages first, then the most recently added.
+    """
+    recent_text = " ".join(m.get("content", "") for m in messages[-RECENT_MESSAGES:]).lower()
+    recent_words = set(re.findall(r"[a-z]+", recent_text))
+
+    candidates = []
+    for category, files in wardrobe.list_items().items():
+        if category not in GARMENT_CATEGORIES:
+            continue
+        for file_name in files:
+            path = os.path.join(wardrobe.WARDROBE_ROOT, wardrobe.CATEGORIES[category], file_name)
+            words = _name_words(file_name)
+            mentioned = len(words & recent_words) / len(words) if words else 0.0
+            candidates.append((mentioned, os.path.getmtime(path), path))
+    candidates.sort(reverse=True)
+    return [path for _, _, path in candidates[:limit]]
+
+def _take_budget(user_id: str) -> bool:
+    now = time.time()
+    spent = _spent.setdefault(user_id, deque())
+    while spent and spent[0] < now - BUDGET_WINDOW:
+        spent.popleft()
+    if len(spent) >= PRERENDER_BUDGET:
+        return False
+    spent.append(now)
+    return True
+
+def _render(key: str, person_img: Image.Image, garment_path: str, api_key: str, model_name: str):
+    from modules import vton
+    try:
+        with telemetry.span("prerender", model=model_name):
+            garment_img = cutouts.load_garment(garment_path)
+            result = vton.generate_tryon(person_img, garment_img, api_key, model_name,
+                                         priority=rate_limiter.PRIORITY_BACKGROUND)
+        vton.store_result(key, result)
+        telemetry.incr("prerender_total", outcome="rendered")
+        print(f"🎨 PRERENDER: Ready for {os.path.basename(garment_path)}")
+        return result
+    except Exception as e:
+        telemetry.incr("prerender_total", outcome="failed")
+        print(f"⚠️ PRERENDER ERROR: {str(e)}")
+        return None
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+
+def schedule(person_img: Image.Image, user_id: str, api_key: str, model_name: str, messages: List[Dict] = None,
+             garments: List[str] = None) -> int:
+    """
+    Queues background try-ons of `garments` (default: the likeliest garments
+    for these chat messages) for this person photo. Finished, queued and
+    over-budget renders are skipped, but every call hashes the photos, so
+    callers should only call again when the selection changes. Returns the
+    number of newly queued renders.
+    """
+    if not api_key:
+        return 0
+    from modules import vton
+
+    queued = 0
+    for garment_path in garments if garments is not None else likely_garments(messages or []):
+        key = vton.result_key(person_img, cutouts.load_garment(garment_path), model_name)
+        with _lock:
+            if key in _pending or vton.get_cached_result(key) is not None:
+                continue
+            if not _take_budget(user_id):
+                telemetry.incr("prerender_total", outcome="over_budget")
+                break
+            _pending[key] = _executor.submit(_render, key, person_img, garment_path, api_key, model_name)
+        telemetry.incr("prerender_total", outcome="scheduled")
+        queued += 1
+    return queued
+
+def take(person_img: Image.Image, garment_img: Image.Image, model_name: str, timeout: float = None) -> Optional[Image.Image]:
+    """
+    Returns a pre-rendered try-on for this pair: from the result cache, or by
+    waiting for the background render already in flight. None if neither exists.
+    """
+    from modules import vton
+    key = vton.result_key(person_img, garment_img, model_name)
+    cached = vton.get_cached_result(key)
+    if cached is not None:
+        telemetry.incr("prerender_total", outcome="hit")
+        return cached
+    with _lock:
+        future = _pending.get(key)
+    if future is None:
+        return None
+    telemetry.incr("prerender_total", outcome="joined")
+    return future.result(timeout=timeout)
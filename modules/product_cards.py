@@ -0,0 +1,76 @@
+import html
+from typing import List, Dict, Any
+
+from modules.normalization import parse_price, parse_rating, parse_review_count, discount_percent
+
+# Heading every card starts with; marks assistant messages that showed search results
+CARD_MARKER = "### 🛍️ "
+
+# Card layout shown for every scraped product (mirrors the old LLM formatting template)
+CARD_TEMPLATE = (
+    "---\n" + CARD_MARKER + "{name}\n\n"
+    '<img src="{image}" alt="Product" width="200" style="border-radius: 10px; margin: 10px 0;">\n\n'
+    "| Detail | Info |\n"
+    "|--------|------|\n"
+    "| 💰 **Price** | {price} |\n"
+    "| ⭐ **Rating** | {rating} |\n"
+    "| 🎯 **Why it's perfect** | {occasion} |\n\n"
+    "🔗 [**Buy Now →**]({link})\n\n"
+)
+
+def has_cards(text: str) -> bool:
+    return CARD_MARKER in (text or "")
+
+def _text(text: str) -> str:
+    """Scraped free text as one line with HTML escaped (cards render with unsafe_allow_html)."""
+    return html.escape(" ".join(str(text).split()))
+
+def _cell(text: str) -> str:
+    """Makes free text safe inside a markdown table cell."""
+    return _text(text).replace("|", "\\|")
+
+def _format_amount(amount: float) -> str:
+    return f"₹{amount:,.0f}" if amount == int(amount) else f"₹{amount:,.2f}"
+
+def format_price(product: Dict[str, Any]) -> str:
+    actual = parse_price(product.get("actual_price", ""))
+    offer = parse_price(product.get("offer_price", ""))
+    if offer is None:
+        return "Price unavailable" if actual is None else f"**{_format_amount(actual)}**"
+    discount = discount_percent(actual, offer)
+    if discount:
+        return f"~~{_format_amount(actual)}~~ **{_format_amount(offer)}** ({discount}% off)"
+    return f"**{_format_amount(offer)}**"
+
+def format_rating(product: Dict[str, Any]) -> str:
+    rating = parse_rating(product.get("rating", ""))
+    if rating is None:
+        return "Not rated yet"
+    reviews = parse_review_count(product.get("review_count", ""))
+    return f"{rating:g}/5 stars ({reviews:,} reviews)" if reviews else f"{rating:g}/5 stars"
+
+def render_product_card(product: Dict[str, Any]) -> str:
+    """Formats one scraped ProductItem dict as a markdown/HTML card."""
+    return CARD_TEMPLATE.format(
+        name=_text(product.get("product_name", "Product")),
+        image=html.escape(product.get("image_link", ""), quote=True),
+        price=format_price(product),
+        rating=format_rating(product),
+        occasion=_cell(product.get("occasion_fit") or "A stylish pick for your search"),
+        link=product.get("product_link", "").replace(" ", "%20").replace(")", "%29"),
+    )
+
+def render_product_cards(products: List[Dict[str, Any]]) -> str:
+    """Formats a list of products as consecutive cards."""
+    return "".join(render_product_card(p) for p in products) + ("---\n" if products else "")
+
+def summarize_for_model(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Compact product facts for the intro prompt, so the model never sees full URLs."""
+    return [
+        {
+            "product_name": p.get("product_name", ""),
+            "offer_price": p.get("offer_price", ""),
+            "rating": p.get("rating", ""),
+        }
+        for p in products
+    ]
@@ -0,0 +1,141 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Any
+
+from modules import telemetry
+from modules.normalization import normalize_product, parse_constraints
+
+# Every scraped product accumulates here, keyed by ASIN, for instant filtered lookups
+CATALOG_DB = os.environ.get("FASHION_CATALOG_DB", os.path.join("data", "catalog.db"))
+
+# Catalog rows older than this are not served in place of a fresh scrape
+CATALOG_MAX_AGE = 3 * 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_key TEXT PRIMARY KEY,   -- ASIN, or a hash of the link for non-Amazon listings
+    asin TEXT,
+    product_name TEXT NOT NULL,
+    title_norm TEXT NOT NULL,
+    currency TEXT,
+    offer_amount REAL,
+    actual_amount REAL,
+    discount_percent INTEGER,
+    rating REAL,
+    review_count INTEGER,
+    data TEXT NOT NULL,             -- original ProductItem dict as JSON
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_price ON products (offer_amount);
+CREATE INDEX IF NOT EXISTS idx_products_rating ON products (rating);
+CREATE INDEX IF NOT EXISTS idx_products_seen ON products (last_seen);
+"""
+
+_conn = None
+_lock = threading.Lock()
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CATALOG_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(CATALOG_DB, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _conn = conn
+    return _conn
+
+def _title_norm(name: str) -> str:
+    return " " + " ".join(re.findall(r"[a-z0-9]+", (name or "").lower())) + " "
+
+def _product_key(product: Dict[str, Any]) -> str:
+    if product.get("asin"):
+        return product["asin"]
+    basis = product.get("product_link") or product.get("product_name", "")
+    return "h:" + hashlib.sha256(basis.encode("utf-8")).hexdigest()[:20]
+
+def add_products(products: List[Dict[str, Any]]):
+    """Upserts scraped products (raw ProductItem dicts) into the catalog."""
+    if not products:
+        return
+    now = time.time()
+    rows = []
+    for raw in products:
+        item = normalize_product(raw)
+        rows.append((
+            _product_key(item), item["asin"], item.get("product_name", ""), _title_norm(item.get("product_name", "")),
+            item["currency"], item["offer_amount"], item["actual_amount"], item["discount_percent"],
+            item["rating_value"], item["review_count_value"], json.dumps(raw), now, now,
+        ))
+    with _lock:
+        db = _db()
+        db.executemany(
+            "INSERT INTO products (product_key, asin, product_name, title_norm, currency, offer_amount, actual_amount, "
+            "discount_percent, rating, review_count, data, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(product_key) DO UPDATE SET product_name = excluded.product_name, title_norm = excluded.title_norm, "
+            "currency = excluded.currency, offer_amount = excluded.offer_amount, actual_amount = excluded.actual_amount, "
+            "discount_percent = excluded.discount_percent, rating = COALESCE(excluded.rating, products.rating), "
+            "review_count = COALESCE(excluded.review_count, products.review_count), data = excluded.data, "
+            "last_seen = excluded.last_seen",
+            rows,
+        )
+        db.commit()
+
+def query_products(terms: str = "", max_price: float = None, min_price: float = None, min_rating: float = None,
+                   limit: int = 5, max_age: float = CATALOG_MAX_AGE) -> List[Dict[str, Any]]:
+    """
+    Returns catalog products (raw dicts) whose titles contain every search term,
+    filtered by price/rating via the indexed columns, best rated first.
+    """
+    clauses, params = ["last_seen > ?"], [time.time() - max_age]
+    for term in re.findall(r"[a-z0-9]+", terms.lower()):
+        # Plural-insensitive whole-word-prefix match: 'kurtas' also finds 'kurta'
+        stem = term[:-1] if term.endswith("s") and len(term) > 3 else term
+        clauses.append("title_norm LIKE ?")
+        params.append(f"% {stem}%")
+    if max_price is not None:
+        clauses.append("offer_amount <= ?")
+        params.append(max_price)
+    if min_price is not None:
+        clauses.append("offer_amount >= ?")
+        params.append(min_price)
+    if min_rating is not None:
+        clauses.append("rating >= ?")
+        params.append(min_rating)
+    params.append(limit)
+
+    with _lock:
+        rows = _db().execute(
+            f"SELECT data FROM products WHERE {' AND '.join(clauses)} "
+            "ORDER BY rating IS NULL, rating DESC, review_count DESC, offer_amount ASC LIMIT ?",
+            params,
+        ).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+def search_catalog(query: str, record_count: int = 5):
+    """
+    Answers a constrained search ('kurta under ₹2000 rated 4+') from the catalog.
+    Returns None when the query has no price/rating filter or too few products match.
+    """
+    constraints = parse_constraints(query)
+    if all(constraints[k] is None for k in ("max_price", "min_price", "min_rating")):
+        return None
+    products = query_products(
+        constraints["terms"],
+        max_price=constraints["max_price"],
+        min_price=constraints["min_price"],
+        min_rating=constraints["min_rating"],
+        limit=record_count,
+    )
+    if len(products) < record_count:
+        telemetry.incr("cache_misses_total", cache="catalog")
+        return None
+    telemetry.incr("cache_hits_total", cache="catalog")
+    print(f"📚 CATALOG: Served '{query}' from {len(products)} cataloged products")
+    return products
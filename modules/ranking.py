@@ -0,0 +1,215 @@
+import re
+import hashlib
+from typing import List, Dict, Any
+
+import numpy as np
+
+from modules import telemetry
+from modules.normalization import normalize_product, parse_constraints
+
+# Words that distinguish variants of the same listing; removed before near-duplicate detection
+VARIANT_WORDS = {
+    "black", "white", "red", "blue", "navy", "green", "olive", "yellow", "mustard", "orange", "pink", "peach",
+    "purple", "maroon", "wine", "brown", "tan", "beige", "cream", "grey", "gray", "silver", "gold", "golden",
+    "multicolor", "multicolour", "light", "dark", "xs", "s", "m", "l", "xl", "xxl", "xxxl", "2xl", "3xl",
+    "small", "medium", "large", "size", "uk", "us", "eu", "pack", "of", "set", "combo", "color", "colour",
+}
+# Descriptors shared by most listings in a category; they say nothing about which product it is
+GENERIC_WORDS = {
+    "men", "mens", "women", "womens", "boys", "girls", "unisex", "solid", "regular", "slim", "relaxed", "fit",
+    "cotton", "casual", "formal", "full", "half", "sleeve", "sleeves", "shirt", "shirts", "with", "for", "and",
+    "the", "a", "in", "blend", "printed", "plain", "style", "stylish", "latest", "new", "design", "wear",
+}
+MALE_WORDS = {"men", "mens", "man", "male", "boys", "gents"}
+FEMALE_WORDS = {"women", "womens", "woman", "female", "girls", "ladies"}
+
+NUM_PERM = 64
+SIMILARITY_THRESHOLD = 0.6
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+# Score weights (each component is scaled to roughly 0..1)
+WEIGHTS = {"rating": 0.40, "discount": 0.15, "price_fit": 0.20, "relevance": 0.15, "wardrobe": 0.10}
+GENDER_MISMATCH_PENALTY = 0.5
+
+def _words(text: str) -> List[str]:
+    return [w.replace("'", "") for w in re.findall(r"[a-z0-9']+", (text or "").lower())]
+
+def _shingles(title: str) -> List[str]:
+    """Unigrams + word bigrams of the title with colour/size and generic descriptor words stripped."""
+    words = [w for w in _words(title) if w not in VARIANT_WORDS and w not in GENERIC_WORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def _brand(title: str) -> str:
+    """First word of the title, which storefronts use for the brand ("Allen Solly ...", "Amazon Brand - Symbol ...")."""
+    words = _words(title)
+    return words[0] if words else ""
+
+def _same_brand(a: str, b: str) -> bool:
+    return a == b or not a or not b
+
+def _hash_shingles(shingles: List[str]) -> np.ndarray:
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") >> 3 for s in shingles] or [0],
+        dtype=np.uint64,
+    )
+
+def minhash_signatures(titles: List[str]) -> np.ndarray:
+    """(len(titles), NUM_PERM) MinHash matrix, vectorized over permutations."""
+    signatures = np.empty((len(titles), NUM_PERM), dtype=np.uint64)
+    for row, title in enumerate(titles):
+        hashes = _hash_shingles(_shingles(title))
+        # (a*x + b) mod p per permutation/shingle pair; a*x wraps mod 2^64, which keeps it a well-mixed hash
+        permuted = (hashes[None, :] * _PERM_A[:, None] + _PERM_B[:, None]) % _MERSENNE
+        signatures[row] = permuted.min(axis=1)
+    return signatures
+
+def group_duplicates(products: List[Dict[str, Any]]) -> List[int]:
+    """
+    Assigns a group id per product: same ASIN, same link, or same brand with
+    titles whose MinHash similarity (colour/size-insensitive) crosses the threshold.
+    """
+    n = len(products)
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        parent[find(i)] = find(j)
+
+    by_key = {}
+    for i, p in enumerate(products):
+        for key in (p.get("asin"), p.get("product_link")):
+            if key:
+                if key in by_key:
+                    union(i, by_key[key])
+                else:
+                    by_key[key] = i
+
+    if n > 1:
+        titles = [p.get("product_name", "") for p in products]
+        brands = [_brand(t) for t in titles]
+        signatures = minhash_signatures(titles)
+        similarity = (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2)
+        rows, cols = np.nonzero(np.triu(similarity >= SIMILARITY_THRESHOLD, k=1))
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            # Different brands selling the same generic title are different products
+            if _same_brand(brands[i], brands[j]):
+                union(i, j)
+
+    return [find(i) for i in range(n)]
+
+def _gender_score(title_words: set, user_gender: str) -> float:
+    if not user_gender:
+        return 0.5
+    own, other = (MALE_WORDS, FEMALE_WORDS) if user_gender.lower() == "male" else (FEMALE_WORDS, MALE_WORDS)
+    if title_words & own:
+        return 1.0
+    if title_words & other:
+        return 0.0
+    return 0.5
+
+def score_products(products: List[Dict[str, Any]], query: str, user_gender: str = None,
+                   wardrobe_context: str = "") -> np.ndarray:
+    """Vectorized score per (normalized) product: rating, discount, price fit, relevance, wardrobe/gender match."""
+    n = len(products)
+    constraints = parse_constraints(query)
+    query_words = set(_words(constraints["terms"])) - MALE_WORDS - FEMALE_WORDS
+    wardrobe_words = set(_words(wardrobe_context)) & VARIANT_WORDS  # colours already owned
+
+    rating = np.array([p["rating_value"] if p["rating_value"] is not None else np.nan for p in products], dtype=float)
+    reviews = np.array([p["review_count_value"] or 0 for p in products], dtype=float)
+    discount = np.array([p["discount_percent"] or 0 for p in products], dtype=float)
+    price = np.array([p["offer_amount"] if p["offer_amount"] is not None else np.nan for p in products], dtype=float)
+
+    # Bayesian-smoothed rating: few reviews pull towards an average 3.8
+    prior, prior_weight = 3.8, 20.0
+    smoothed = (np.nan_to_num(rating, nan=prior) * reviews + prior * prior_weight) / (reviews + prior_weight)
+    smoothed = np.where(np.isnan(rating), prior, np.where(reviews > 0, smoothed, rating))
+    rating_score = np.clip((smoothed - 3.0) / 2.0, 0, 1)
+
+    discount_score = np.clip(discount / 70.0, 0, 1)
+
+    if constraints["max_price"] is not None or constraints["min_price"] is not None:
+        upper = constraints["max_price"] if constraints["max_price"] is not None else np.inf
+        lower = constraints["min_price"] or 0
+        price_fit = np.where((price >= lower) & (price <= upper), 1.0, 0.0)
+    elif n and np.isfinite(price).any():
+        median = np.nanmedian(price)
+        price_fit = np.clip(1 - np.abs(price - median) / (median or 1), 0, 1)
+    else:
+        price_fit = np.full(n, 0.5)
+    price_fit = np.nan_to_num(price_fit, nan=0.3)
+
+    relevance = np.zeros(n)
+    wardrobe = np.zeros(n)
+    gender = np.zeros(n)
+    for i, p in enumerate(products):
+        title_words = set(_words(p.get("product_name", "")))
+        if query_words:
+            relevance[i] = len(query_words & title_words) / len(query_words)
+        gender[i] = _gender_score(title_words, user_gender)
+        # New colours complement the wardrobe; repeats of owned colours are neutral
+        wardrobe[i] = 1.0 if wardrobe_words and (title_words & VARIANT_WORDS) - wardrobe_words else 0.5
+
+    score = (
+        WEIGHTS["rating"] * rating_score
+        + WEIGHTS["discount"] * discount_score
+        + WEIGHTS["price_fit"] * price_fit
+        + WEIGHTS["relevance"] * relevance
+        + WEIGHTS["wardrobe"] * (0.5 * wardrobe + 0.5 * gender)
+    )
+    # Listings explicitly for the other gender are halved rather than dropped
+    return np.where(gender == 0.0, score * GENDER_MISMATCH_PENALTY, score)
+
+def rank_products(products: List[Dict[str, Any]], query: str, record_count: int = 5, user_gender: str = None,
+                  wardrobe_context: str = "") -> List[Dict[str, Any]]:
+    """
+    Collapses duplicate/variant listings, scores the rest and returns the top
+    `record_count` raw product dicts (best variant of each group first).
+    """
+    if not products:
+        return []
+    with telemetry.span("ranking"):
+        normalized = [normalize_product(p) for p in products]
+        groups = group_duplicates(normalized)
+        scores = score_products(normalized, query, user_gender, wardrobe_context)
+
+        best = {}
+        for i, group in enumerate(groups):
+            if group not in best or scores[i] > scores[best[group]]:
+                best[group] = i
+        order = sorted(best.values(), key=lambda i: scores[i], reverse=True)
+
+    telemetry.incr("ranking_duplicates_removed_total", len(products) - len(best))
+    return [products[i] for i in order[:int(record_count)]]
+
+class VariantFilter:
+    """Incremental near-duplicate check for streaming results (see ecommerce_scraper.iter_products)."""
+
+    def __init__(self):
+        self.keys = set()
+        self.signatures = []
+        self.brands = []
+
+    def is_new(self, product: Dict[str, Any]) -> bool:
+        keys = {k for k in (normalize_product(product)["asin"], product.get("product_link")) if k}
+        if keys & self.keys:
+            return False
+        title = product.get("product_name", "")
+        brand = _brand(title)
+        signature = minhash_signatures([title])[0]
+        if self.signatures:
+            similar = (np.array(self.signatures) == signature).mean(axis=1) >= SIMILARITY_THRESHOLD
+            if any(s and _same_brand(brand, b) for s, b in zip(similar, self.brands)):
+                return False
+        self.keys |= keys
+        self.signatures.append(signature)
+        self.brands.append(brand)
+        return True
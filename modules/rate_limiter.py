@@ -0,0 +1,154 @@
+import os
+import re
+import time
+import heapq
+import random
+import hashlib
+import itertools
+import threading
+from contextlib import contextmanager
+
+from modules import telemetry
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0   # chat turns and the scrapes they trigger
+PRIORITY_BATCH = 10        # try-on generations
+PRIORITY_BACKGROUND = 20   # speculative / pre-render work
+
+# Per-model (requests per minute, max concurrent calls); unknown models use the defaults
+DEFAULT_RPM = int(os.environ.get("GEMINI_RPM", "15"))
+DEFAULT_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4"))
+MODEL_LIMITS = {
+    "gemini-2.0-flash": (15, 4),
+    "gemini-2.0-flash-lite": (30, 6),
+    "gemini-1.5-flash": (15, 4),
+    "gemini-1.5-pro": (2, 1),
+    "gemini/gemini-2.0-flash": (15, 4),
+    "models/nano-banana-pro-preview": (10, 2),
+    "gemini-2.0-flash-preview-image-generation": (10, 2),
+    "imagen-3.0-generate-002": (10, 2),
+}
+
+MAX_RETRIES = 4
+BASE_BACKOFF = 1.0   # seconds
+MAX_BACKOFF = 30.0
+RETRYABLE_CODES = {429, 500, 503}
+
+_gates = {}
+_gates_lock = threading.Lock()
+_seq = itertools.count()
+
+class _ModelGate:
+    """Token bucket plus a priority-ordered concurrency semaphore for one (key, model) pair."""
+
+    def __init__(self, rpm: int, concurrency: int):
+        self.rate = rpm / 60.0
+        self.capacity = max(1.0, rpm / 6.0)  # allow a ~10s burst
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.waiters = []
+        self.cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority: int):
+        with self.cond:
+            entry = (priority, next(_seq))
+            heapq.heappush(self.waiters, entry)
+            while True:
+                if self.waiters[0] == entry and self.in_flight < self.concurrency:
+                    self._refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        heapq.heappop(self.waiters)
+                        self.in_flight += 1
+                        self.cond.notify_all()
+                        return
+                    self.cond.wait(timeout=(1 - self.tokens) / self.rate)
+                else:
+                    self.cond.wait()
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def penalize(self):
+        """Drains the bucket after a 429 so queued callers back off too."""
+        with self.cond:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+def _get_gate(api_key: str, model: str) -> _ModelGate:
+    key_id = hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+    with _gates_lock:
+        gate = _gates.get((key_id, model))
+        if gate is None:
+            rpm, concurrency = MODEL_LIMITS.get(model, (DEFAULT_RPM, DEFAULT_CONCURRENCY))
+            gate = _gates[(key_id, model)] = _ModelGate(rpm, concurrency)
+        return gate
+
+@contextmanager
+def slot(api_key: str, model: str, priority: int = PRIORITY_INTERACTIVE):
+    """Blocks until a request for this key/model may be sent, recording the queueing time."""
+    gate = _get_gate(api_key, model)
+    start = time.perf_counter()
+    gate.acquire(priority)
+    telemetry.observe("rate_limit_wait_seconds", time.perf_counter() - start, model=model, priority=priority)
+    try:
+        yield gate
+    finally:
+        gate.release()
+
+def _status_code(exc: Exception):
+    for attr in ("code", "status_code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    if "RESOURCE_EXHAUSTED" in str(exc) or "429" in str(exc):
+        return 429
+    return None
+
+def _retry_after(exc: Exception):
+    """Reads the server's requested delay from headers or the error body, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    match = re.search(r"retry[_ ]?(?:delay|in)['\":\s]*([\d.]+)\s*s", str(exc), re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return None
+
+def call(api_key: str, model: str, fn, priority: int = PRIORITY_INTERACTIVE, max_retries: int = MAX_RETRIES):
+    """
+    Runs `fn()` (a Gemini/litellm request) under the shared limiter for this key
+    and model. Rate-limit and transient server errors are retried with jittered
+    exponential backoff, honoring retry-after when the server sends one.
+    """
+    for attempt in range(max_retries + 1):
+        with slot(api_key, model, priority) as gate:
+            try:
+                return fn()
+            except Exception as e:
+                code = _status_code(e)
+                if code not in RETRYABLE_CODES or attempt == max_retries:
+                    raise
+                if code == 429:
+                    gate.penalize()
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+                telemetry.incr("gemini_retries_total", model=model, code=code)
+                print(f"⏳ RATE LIMIT: {model} returned {code}, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+        time.sleep(delay)
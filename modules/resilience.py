@@ -0,0 +1,143 @@
+import time
+import asyncio
+import threading
+from collections import deque
+
+from modules import telemetry
+
+# Consecutive failures that open a site's circuit, and how long it stays open (seconds)
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 60
+
+# Hedge a page crawl once it runs longer than this percentile of recent crawls
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 8
+HEDGE_DEFAULT_DELAY = 12.0
+HEDGE_MIN_DELAY = 3.0
+HEDGE_MAX_DELAY = 20.0
+LATENCY_WINDOW = 50
+
+class CircuitBreaker:
+    """
+    Closed -> open after FAILURE_THRESHOLD consecutive failures; after
+    RESET_TIMEOUT one trial call is let through (half-open) and its outcome
+    closes or re-opens the circuit. A trial that is cancelled has no outcome,
+    so release_trial() hands the trial to the next caller.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def _transition(self, state: str):
+        if state != self.state:
+            print(f"🔌 CIRCUIT: {self.name} {self.state} -> {state}")
+            telemetry.incr("circuit_transitions_total", site=self.name, state=state)
+            self.state = state
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition("half_open")
+                return True
+            return self.state == "closed"
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self._transition("closed")
+
+    def release_trial(self):
+        with self.lock:
+            if self.state == "half_open":
+                # opened_at is already past reset_timeout, so the next allow() starts a new trial
+                print(f"🔌 CIRCUIT: {self.name} trial cancelled; the next call retries")
+                self.state = "open"
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition("open")
+
+class LatencyTracker:
+    """Rolling window of call durations, used to pick the hedging delay."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p: float):
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+    def hedge_delay(self) -> float:
+        with self.lock:
+            enough = len(self.samples) >= HEDGE_MIN_SAMPLES
+        if not enough:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, self.percentile(HEDGE_PERCENTILE)))
+
+_breakers = {}
+_trackers = {}
+_registry_lock = threading.Lock()
+
+def breaker_for(name: str) -> CircuitBreaker:
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def latency_for(name: str) -> LatencyTracker:
+    with _registry_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
+
+async def hedged(factory, delay: float, max_attempts: int = 2, label: str = ""):
+    """
+    Runs `factory()` and, if it has not produced a non-empty result within
+    `delay` seconds (or failed before that), starts another attempt. Returns
+    the first non-empty result and cancels the rest; if every attempt comes
+    back empty or failing, returns the last empty result or raises the last error.
+    """
+    tasks = {asyncio.ensure_future(factory())}
+    started = 1
+    last_error, last_result = None, None
+    try:
+        while tasks:
+            timeout = delay if started < max_attempts else None
+            done, tasks = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    last_error = task.exception()
+                elif task.result():
+                    if started > 1:
+                        telemetry.incr("hedged_requests_total", target=label, outcome="succeeded")
+                    return task.result()
+                else:
+                    last_result = task.result()
+            if started < max_attempts and (not done or not tasks):
+                # Slow (timeout) or already failed: fire the backup attempt
+                telemetry.incr("hedged_requests_total", target=label, outcome="started")
+                tasks.add(asyncio.ensure_future(factory()))
+                started += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+    if last_result is not None:
+        return last_result
+    raise last_error
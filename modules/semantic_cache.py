@@ -0,0 +1,203 @@
+import os
+import re
+import time
+import zlib
+import hashlib
+import threading
+from typing import Optional, List, Tuple
+
+import numpy as np
+
+from modules import telemetry, wardrobe
+
+# "on" answers near-duplicate questions about the same garments while the relevant
+# wardrobe items are unchanged; "strict" also requires the exact same full wardrobe
+# context and a closer match; "off" disables the cache
+CACHE_MODE = os.environ.get("FASHION_SEMANTIC_CACHE", "on").lower()
+
+SIMILARITY_THRESHOLD = 0.88
+STRICT_SIMILARITY_THRESHOLD = 0.97
+
+# Styling answers age slowly; answers with product cards follow the search cache's freshness
+ANSWER_TTL = 6 * 60 * 60
+SHOPPING_TTL = 30 * 60
+
+MAX_ENTRIES = 512
+EMBEDDING_DIM = 1024
+
+# Questions that lean on the previous turns cannot be answered out of context
+FOLLOW_UP = re.compile(
+    r"\b(it|its|that|this|those|these|them|one|ones|another|instead|else|also|again|same|above|previous)\b",
+    re.IGNORECASE,
+)
+
+STOPWORDS = {
+    "a", "an", "the", "some", "me", "my", "i", "im", "i'm", "for", "to", "of", "and", "or", "with", "in",
+    "on", "please", "can", "you", "could", "would", "should", "what", "which", "is", "are", "do", "does",
+    "be", "good", "nice", "best", "any", "idea", "ideas", "suggest", "recommend", "tell", "well", "show",
+    "find", "get", "help", "want", "need", "like",
+}
+
+# Garment nouns (singular, as _tokens leaves them) -> the wardrobe category whose items answer them
+GARMENT_CATEGORIES = {
+    **dict.fromkeys(("shirt", "tshirt", "t-shirt", "tee", "top", "kurta", "kurti", "sherwani", "blazer", "jacket",
+                     "coat", "hoodie", "sweater", "sweatshirt", "suit", "waistcoat"), "Upper Body"),
+    **dict.fromkeys(("jean", "jeans", "pant", "trouser", "chino", "short", "shorts", "jogger", "legging", "skirt",
+                     "dhoti", "churidar"), "Lower Body"),
+    **dict.fromkeys(("shoe", "sneaker", "loafer", "boot", "sandal", "heel", "slipper", "flat", "jutti", "juttis",
+                     "mojari", "oxford"), "Feet"),
+    **dict.fromkeys(("saree", "sari", "lehenga", "dress", "gown", "dupatta"), "Special: Saree/Drapes (Overlap)"),
+    **dict.fromkeys(("glasses", "sunglasses", "sunglass"), "Face (Glasses/Masks)"),
+    **dict.fromkeys(("hat", "cap"), "Head/Hair"),
+    **dict.fromkeys(("necklace", "scarf", "stole", "tie", "chain"), "Neck"),
+    **dict.fromkeys(("watch", "belt", "bag", "handbag", "clutch", "wallet", "earring", "bracelet", "ring", "sock"), None),
+}
+
+_entries = []      # dicts: question, gender, numbers, garments, fingerprint, context_hash, items, answer, expires
+_vectors = None    # (len(_entries), EMBEDDING_DIM) float32, rows match _entries
+_lock = threading.Lock()
+
+def _tokens(question: str) -> List[str]:
+    words = re.findall(r"[a-z0-9₹'-]+", question.lower())
+    return [w[:-1] if w.endswith("s") and len(w) > 3 else w for w in words if w not in STOPWORDS]
+
+def normalize(question: str) -> str:
+    return " ".join(_tokens(question))
+
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % EMBEDDING_DIM
+
+def embed(question: str) -> np.ndarray:
+    """
+    Hashed bag of words, word pairs and character trigrams, L2-normalized.
+    Words dominate so "black shirt" and "white shirt" stay apart while
+    rephrasings of the same question land close together.
+    """
+    tokens = _tokens(question)
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for token in tokens:
+        vector[_bucket("w:" + token)] += 1.0
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            vector[_bucket("c:" + padded[i:i + 3])] += 0.15
+    for a, b in zip(tokens, tokens[1:]):
+        vector[_bucket(f"b:{a} {b}")] += 0.5
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def _numbers(question: str) -> set:
+    return set(re.findall(r"\d+", question))
+
+def _garments(question: str) -> frozenset:
+    # _tokens trims a plural "s", which leaves "glasse"; trying the token with it restored covers those
+    return frozenset(next((f for f in (t, t + "s") if f in GARMENT_CATEGORIES), None) for t in _tokens(question)) - {None}
+
+def wardrobe_fingerprint(garments: frozenset) -> str:
+    """
+    Hash of the wardrobe items in the categories the question is about (every
+    category when it names no garment), so an upload that could change the
+    answer invalidates it.
+    """
+    categories = {GARMENT_CATEGORIES[g] for g in garments} - {None}
+    items = wardrobe.list_items()
+    relevant = sorted((c, files) for c, files in items.items() if not categories or c in categories)
+    return hashlib.sha256(repr(relevant).encode("utf-8")).hexdigest()[:16]
+
+def context_hash(wardrobe_context: str) -> str:
+    return hashlib.sha256((wardrobe_context or "").encode("utf-8")).hexdigest()[:16]
+
+def referenced_items(*texts: str) -> List[Tuple[str, str]]:
+    """(folder, file name) of wardrobe items named in any of the texts."""
+    found = []
+    for category, files in wardrobe.list_items().items():
+        for name in files:
+            if any(name in text for text in texts if text):
+                found.append((wardrobe.CATEGORIES[category], name))
+    return found
+
+def cacheable(question: str, history: list) -> bool:
+    if CACHE_MODE == "off" or not normalize(question):
+        return False
+    # The first question of a conversation always stands on its own
+    return not history or not FOLLOW_UP.search(question)
+
+def _still_valid(entry: dict, now: float) -> bool:
+    if entry["expires"] < now:
+        return False
+    return all(os.path.exists(os.path.join(wardrobe.WARDROBE_ROOT, folder, name)) for folder, name in entry["items"])
+
+def lookup(question: str, history: list, user_gender: str, wardrobe_context: str) -> Optional[str]:
+    """Cached answer to a question close enough to this one, or None."""
+    if not cacheable(question, history):
+        telemetry.incr("semantic_cache_total", outcome="skipped")
+        return None
+    strict = CACHE_MODE == "strict"
+    threshold = STRICT_SIMILARITY_THRESHOLD if strict else SIMILARITY_THRESHOLD
+    ctx = context_hash(wardrobe_context)
+    query = embed(question)
+    numbers = _numbers(question)
+    garments = _garments(question)
+    fingerprint = wardrobe_fingerprint(garments)
+    now = time.time()
+    with _lock:
+        if not _entries:
+            telemetry.incr("semantic_cache_total", outcome="miss")
+            return None
+        scores = _vectors @ query
+        for i in np.argsort(-scores):
+            if scores[i] < threshold:
+                break
+            entry = _entries[i]
+            if entry["gender"] != user_gender or (strict and entry["context_hash"] != ctx):
+                continue
+            # Budgets, sizes and the garments asked about must match exactly, however similar the wording,
+            # and the wardrobe items those garments draw on must be unchanged
+            if entry["numbers"] != numbers or entry["garments"] != garments or entry["fingerprint"] != fingerprint:
+                continue
+            if not _still_valid(entry, now):
+                continue
+            telemetry.incr("semantic_cache_total", outcome="hit")
+            print(f"🧠 SEMANTIC CACHE: '{question}' answered from '{entry['question']}' ({scores[i]:.2f})")
+            return entry["answer"]
+    telemetry.incr("semantic_cache_total", outcome="miss")
+    return None
+
+def store(question: str, history: list, user_gender: str, wardrobe_context: str, answer: str,
+          ttl: float = ANSWER_TTL) -> str:
+    """Remembers an answer (returned unchanged, so callers can `return store(...)`)."""
+    global _vectors
+    if not answer or not cacheable(question, history):
+        return answer
+    entry = {
+        "question": question,
+        "gender": user_gender,
+        "numbers": _numbers(question),
+        "garments": _garments(question),
+        "fingerprint": wardrobe_fingerprint(_garments(question)),
+        "context_hash": context_hash(wardrobe_context),
+        # Only items the answer itself names: the broader inventory context would tie every entry to every item
+        "items": referenced_items(answer),
+        "answer": answer,
+        "expires": time.time() + ttl,
+    }
+    vector = embed(question)[None, :]
+    now = time.time()
+    with _lock:
+        keep = [i for i, e in enumerate(_entries) if _still_valid(e, now)][-(MAX_ENTRIES - 1):]
+        _entries[:] = [_entries[i] for i in keep] + [entry]
+        _vectors = np.vstack([_vectors[keep], vector]) if keep else vector
+    return answer
+
+def invalidate_item(folder: str, name: str) -> int:
+    """Drops every cached answer that referenced this wardrobe item; returns how many."""
+    global _vectors
+    with _lock:
+        keep = [i for i, e in enumerate(_entries) if (folder, name) not in e["items"]]
+        dropped = len(_entries) - len(keep)
+        if dropped:
+            _entries[:] = [_entries[i] for i in keep]
+            _vectors = _vectors[keep] if keep else None
+    if dropped:
+        telemetry.incr("semantic_cache_invalidations_total", dropped)
+        print(f"🧠 SEMANTIC CACHE: Dropped {dropped} answers that referenced {name}")
+    return dropped
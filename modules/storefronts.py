@@ -0,0 +1,119 @@
+import os
+import abc
+import json
+import urllib.parse
+from typing import List, Dict, Any
+
+# Sites searched by default, in priority order (comma-separated adapter names)
+DEFAULT_SITES = [s.strip() for s in os.environ.get("SCRAPER_SITES", "amazon,flipkart").split(",") if s.strip()]
+
+class StorefrontAdapter(abc.ABC):
+    """
+    One e-commerce site: how to build its search URL for a page, what to wait
+    for before extracting (its results container, or enough `result_selector`
+    cards; `results_container` and `no_results_text` let a page with no
+    results finish early), how to instruct the extraction model, and how to
+    clean up what the model returned.
+    """
+    name = ""
+    base_url = ""
+    wait_for = ""
+    result_selector = ""
+    results_container = ""
+    no_results_text = ""
+
+    def __init__(self, base_url: str = None):
+        if base_url:
+            self.base_url = base_url.rstrip("/")
+
+    @abc.abstractmethod
+    def build_url(self, query: str, page: int = 1) -> str:
+        """Search results URL for `query` on 1-based result page `page`."""
+
+    @abc.abstractmethod
+    def extraction_instruction(self, record_count: int) -> str:
+        """Prompt telling the extraction model what to pull from a results page."""
+
+    def _absolute(self, link: str) -> str:
+        if not link or link.startswith(("http://", "https://")):
+            return link
+        return urllib.parse.urljoin(self.base_url + "/", link)
+
+    def parse(self, blocks) -> List[Dict[str, Any]]:
+        """Collects product dicts from LLM extraction output (ProductList blocks or bare items)."""
+        if isinstance(blocks, str):
+            blocks = json.loads(blocks)
+        if isinstance(blocks, dict):
+            blocks = [blocks]
+
+        products = []
+        for block in blocks or []:
+            if not isinstance(block, dict) or block.get("error"):
+                continue
+            if "products" in block:
+                products.extend(p for p in block["products"] if isinstance(p, dict))
+            elif "product_name" in block:
+                products.append(block)
+
+        for product in products:
+            product["product_link"] = self._absolute(product.get("product_link", ""))
+            product["image_link"] = self._absolute(product.get("image_link", ""))
+            product["source"] = self.name
+        return [p for p in products if p.get("product_name") and p.get("product_link")]
+
+class AmazonAdapter(StorefrontAdapter):
+    name = "amazon"
+    base_url = os.environ.get("AMAZON_BASE_URL", "https://www.amazon.in")
+    wait_for = "css:.s-main-slot"
+    result_selector = 'div[data-component-type="s-search-result"]'
+    results_container = ".s-main-slot"
+    no_results_text = "No results for"
+
+    def build_url(self, query: str, page: int = 1) -> str:
+        url = f"{self.base_url}/s?k={urllib.parse.quote_plus(query)}"
+        return url if page <= 1 else f"{url}&page={page}"
+
+    def extraction_instruction(self, record_count: int) -> str:
+        return (
+            f"Extract valid products with their names, prices, ratings, images, and links. "
+            f"Ignore sponsored ads. Return at least {record_count} items. "
+            "CRITICAL FOR LINKS: "
+            f"- For product_link: Extract the FULL absolute URL starting with {self.base_url}/. "
+            f"  If you find a relative URL like '/dp/B0XXX...' or '/gp/...', prepend '{self.base_url}' to make it absolute. "
+            "- For image_link: Extract the FULL image URL starting with https://. "
+            "For each product, also provide an 'occasion_fit' field explaining how well the product suits the searched occasion."
+        )
+
+class FlipkartAdapter(StorefrontAdapter):
+    name = "flipkart"
+    base_url = os.environ.get("FLIPKART_BASE_URL", "https://www.flipkart.com")
+    wait_for = "css:div[data-id]"
+    result_selector = "div[data-id]"
+    results_container = "#container"
+    no_results_text = "Sorry, no results found"
+
+    def build_url(self, query: str, page: int = 1) -> str:
+        url = f"{self.base_url}/search?q={urllib.parse.quote_plus(query)}"
+        return url if page <= 1 else f"{url}&page={page}"
+
+    def extraction_instruction(self, record_count: int) -> str:
+        return (
+            f"Extract valid fashion products from this Flipkart search page with their names, prices, ratings, images, and links. "
+            f"Skip 'Sponsored' and 'Ad' tiles. Return at least {record_count} items. "
+            "The selling price is offer_price; the struck-through MRP is actual_price. "
+            "Ratings appear as a number like '4.2' next to a star; write them as '4.2 out of 5 stars'. "
+            "CRITICAL FOR LINKS: "
+            f"- For product_link: Extract the FULL absolute URL starting with {self.base_url}/. "
+            f"  If you find a relative URL like '/product-name/p/itm...', prepend '{self.base_url}'. "
+            "- For image_link: Extract the FULL image URL starting with https:// (rukminim*.flixcart.com). "
+            "For each product, also provide an 'occasion_fit' field explaining how well the product suits the searched occasion."
+        )
+
+STOREFRONTS = {
+    AmazonAdapter.name: AmazonAdapter(),
+    FlipkartAdapter.name: FlipkartAdapter(),
+}
+
+def get_adapters(sites: List[str] = None) -> List[StorefrontAdapter]:
+    """Adapters for the requested site names (unknown names are skipped)."""
+    return [STOREFRONTS[name] for name in (sites or DEFAULT_SITES) if name in STOREFRONTS]
@@ -0,0 +1,157 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets (seconds) shared by every stage timer
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Optional file exporter target, rewritten after every finished span
+METRICS_FILE = os.environ.get("FASHION_METRICS_FILE", "")
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> float
+_histograms = {}  # (name, labels) -> {"buckets": [...], "sum": float, "count": int}
+_trace_path = contextvars.ContextVar("trace_path", default=())
+_exporter = None
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+def incr(name: str, value: float = 1, **labels):
+    """Increments a counter, e.g. incr("cache_hits_total", cache="search")."""
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, value: float, **labels):
+    """Records a value into a latency histogram."""
+    key = (name, _label_key(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+            _histograms[key] = hist
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+def record_token_usage(response, model: str, stage: str):
+    """Adds the prompt/output token counts of a Gemini response to the counters."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+    output_tokens = getattr(usage, "candidates_token_count", None) or 0
+    incr("gemini_tokens_total", prompt_tokens, model=model, stage=stage, kind="prompt")
+    incr("gemini_tokens_total", output_tokens, model=model, stage=stage, kind="output")
+
+@contextmanager
+def span(stage: str, **labels):
+    """
+    Times a hot-path stage. Spans nest per thread/asyncio task, so the printed
+    trace shows which request each stage belongs to, and every span feeds the
+    `stage_duration_seconds` histogram.
+    """
+    parent = _trace_path.get()
+    token = _trace_path.set(parent + (stage,))
+    path = "/".join(parent + (stage,))
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _trace_path.reset(token)
+        observe("stage_duration_seconds", elapsed, stage=stage, **labels)
+        if status == "error":
+            incr("stage_errors_total", stage=stage, **labels)
+        print(f"⏱️ TRACE: {path} {elapsed * 1000:.1f}ms ({status})")
+        if METRICS_FILE:
+            write_metrics_file(METRICS_FILE)
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + body + "}"
+
+def export_prometheus() -> str:
+    """Renders every counter and histogram in the Prometheus text format."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, dict(v, buckets=list(v["buckets"]))) for k, v in _histograms.items())
+
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    for (name, labels), hist in histograms:
+        if name not in seen:
+            lines.append(f"# TYPE {name} histogram")
+            seen.add(name)
+        for bound, count in zip(LATENCY_BUCKETS, hist["buckets"]):
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {hist['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+
+    return "\n".join(lines) + "\n"
+
+def write_metrics_file(path: str):
+    """Atomically writes the Prometheus snapshot to disk (node_exporter textfile style)."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(export_prometheus())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ TELEMETRY: Could not write metrics file: {e}")
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = export_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port: int = 9464):
+    """Serves /metrics on a daemon thread. Safe to call on every Streamlit rerun."""
+    global _exporter
+    with _lock:
+        if _exporter is not None:
+            return _exporter
+        try:
+            _exporter = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError as e:
+            print(f"⚠️ TELEMETRY: Metrics endpoint unavailable on port {port}: {e}")
+            return None
+    threading.Thread(target=_exporter.serve_forever, daemon=True).start()
+    print(f"📈 TELEMETRY: Serving Prometheus metrics on :{port}/metrics")
+    return _exporter
+
+def reset():
+    """Clears all recorded metrics."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
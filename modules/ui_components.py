@@ -1,9 +1,25 @@
 import streamlit as st
+import io
 import os
 from PIL import Image
-from modules import wardrobe, chatbot, vton
+from modules import wardrobe, image_cache, image_io, conversation_store, api_client, cutouts
+# chatbot (Gemini SDK + scraper) and vton are imported on first use to keep cold start fast
 import time
 
+# Number of most recent chat messages rendered by default; "Load older" pages by this much
+HISTORY_WINDOW = 20
+
+@st.cache_data(max_entries=1000, ttl=3600, show_spinner=False)
+def _cached_render(content: str, cache_generation: int) -> str:
+    return image_cache.rewrite_card_images(content)
+
+def _render_message(content: str) -> str:
+    """
+    Pre-renders a chat message (image proxy rewrite) once per distinct content.
+    Keyed by the image cache generation so HTML never points at evicted files.
+    """
+    return _cached_render(content, image_cache.generation())
+
 def render_left_column():
     st.header("👗 Your Wardrobe")
     st.caption("Upload & Categorize")
@@ -25,6 +41,33 @@ def render_left_column():
         st.session_state['wardrobe_updated'] = True
         st.rerun() # Rerun to show the new image immediately
 
+    with st.expander("💾 Backup & Restore"):
+        from modules import wardrobe_snapshot
+        if st.button("Prepare backup", use_container_width=True):
+            st.session_state['wardrobe_backup'] = wardrobe_snapshot.export_bytes()
+        if st.session_state.get('wardrobe_backup'):
+            st.download_button(
+                "⬇️ Download wardrobe.ffws",
+                st.session_state['wardrobe_backup'],
+                file_name="wardrobe.ffws",
+                mime="application/octet-stream",
+                use_container_width=True,
+            )
+        backup = st.file_uploader("Restore from a backup", type=["ffws"], key="wardrobe_restore")
+        if backup and st.button("Restore", use_container_width=True):
+            try:
+                counts = wardrobe_snapshot.import_bytes(backup.getvalue())
+                st.success(f"Restored {counts['written']} items ({counts['skipped']} already present)")
+                st.session_state['wardrobe_updated'] = True
+            except (ValueError, OSError) as e:
+                st.error(f"Could not restore the backup: {e}")
+
+    with st.expander("📊 Wardrobe Analytics"):
+        try:
+            _render_wardrobe_analytics()
+        except Exception as e:
+            st.error(f"Error analysing wardrobe: {e}")
+
     st.divider()
     
     # 3. Visual Display of Folders
@@ -46,8 +89,8 @@ def render_left_column():
                         # Use a container for each grid item (image + delete button)
                         with cols[i % 3].container(border=True):
                             try:
-                                img = Image.open(img_path)
-                                st.image(img, use_container_width=True)
+                                # Reduced decode of the garment cutout (or the photo until it is ready), shared across sessions
+                                st.image(cutouts.thumbnail(img_path), use_container_width=True)
                                 st.caption(file_name)
                                 
                                 # Add Delete Button (Trash Icon)
@@ -63,7 +106,32 @@ def render_left_column():
                             except Exception as e:
                                 st.error(f"Error loading image: {e}")
 
+def _render_wardrobe_analytics():
+    """Colour mix per category (measured from the photos) and what the wardrobe is missing."""
+    from modules import wardrobe_analytics
+    items = wardrobe_analytics.analyze_wardrobe()
+    if not items:
+        st.caption("Add a few items to see your colour mix.")
+        return
+    for category, colors in wardrobe_analytics.dominant_colors(items).items():
+        swatches = " ".join(
+            f"<span style='display:inline-block;width:0.8em;height:0.8em;border-radius:50%;"
+            f"background:rgb{wardrobe_analytics.NAMED_COLORS[c]};border:1px solid #888'></span> {c} ×{n}"
+            for c, n in colors.items()
+        )
+        st.markdown(f"**{category}**<br>{swatches}", unsafe_allow_html=True)
+    for gap in wardrobe_analytics.gaps(items):
+        st.caption(f"🕳️ {gap.capitalize()}")
+    unreadable = sum(1 for entry in items.values() if entry.get("unreadable"))
+    if unreadable:
+        st.caption(f"⚠️ {unreadable} photo(s) could not be read and are left out")
+
+@st.fragment
 def render_middle_column():
+    """
+    Chat pane. Runs as a fragment so chatting, paging and gender changes rerun
+    only this column, and messages come from the pre-render cache.
+    """
     st.header("💬 Style Assistant")
     
     # Gender Selection - above chat
@@ -78,22 +146,55 @@ def render_middle_column():
         )
         # Update session state when changed
         st.session_state.user_gender = gender
+    with col_spacer:
+        st.toggle(
+            "⚡ Fast shopping answers",
+            key="fast_shopping_mode",
+            help="Show product cards as soon as the search finishes, without an AI-written intro"
+        )
     
-    # Initialize Chat History
+    # Initialize Chat History (resumes the latest stored conversation, most recent window only)
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        user_id = conversation_store.user_id_for(st.session_state.get('gemini_api_key'))
+        session_id = conversation_store.resume_session(user_id)
+        conversation_store.compact(user_id)
+        messages, has_more = conversation_store.load_messages(session_id, HISTORY_WINDOW)
+        st.session_state.conversation_ids = (user_id, session_id)
+        st.session_state.messages = messages
+        st.session_state.history_has_more = has_more
+    user_id, session_id = st.session_state.conversation_ids
 
     # Display Chat History
     chat_container = st.container(height=450)
     with chat_container:
-        for message in st.session_state.messages:
+        messages = st.session_state.messages
+        window = st.session_state.get("history_window", HISTORY_WINDOW)
+        hidden = max(0, len(messages) - window)
+        has_more = st.session_state.get("history_has_more", False)
+        label = f"⬆️ Load older messages ({hidden})" if hidden and not has_more else "⬆️ Load older messages"
+        if (hidden or has_more) and st.button(label, key="load_older_messages", use_container_width=True):
+            window += HISTORY_WINDOW
+            st.session_state.history_window = window
+            if len(messages) < window and has_more:
+                # Lazily page older messages in from the conversation store
+                older, has_more = conversation_store.load_messages(
+                    session_id, window - len(messages), before_id=messages[0]["event_id"]
+                )
+                messages[:0] = older
+                st.session_state.history_has_more = has_more
+            hidden = max(0, len(messages) - window)
+
+        for message in messages[hidden:]:
             with st.chat_message(message["role"]):
-                st.markdown(message["content"], unsafe_allow_html=True)
+                # Only assistant messages carry product cards; user text is never fetched server-side
+                content = _render_message(message["content"]) if message["role"] == "assistant" else message["content"]
+                st.markdown(content, unsafe_allow_html=True)
 
     # Chat Input
     if prompt := st.chat_input("Ask about your outfit..."):
         # 1. Display User Message
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        event_id = conversation_store.append_message(user_id, session_id, "user", prompt)
+        st.session_state.messages.append({"role": "user", "content": prompt, "event_id": event_id})
         with chat_container:
             with st.chat_message("user"):
                 st.markdown(prompt, unsafe_allow_html=True)
@@ -104,16 +205,39 @@ def render_middle_column():
         # 3. Generate AI Response
         with chat_container:
             with st.chat_message("assistant"):
+                # Product cards appear here one by one while the search is still running
+                live_cards = st.empty()
+                streamed_cards = []
+
+                def on_event(kind, data):
+                    if kind == "product":
+                        streamed_cards.append(data["card"])
+                        live_cards.markdown(_render_message("".join(streamed_cards)), unsafe_allow_html=True)
+
                 with st.spinner("Thinking..."):
-                    # Use synchronous wrapper
-                    response = chatbot.run_chat_tool(
-                        prompt, 
-                        st.session_state.messages[:-1], 
-                        current_inventory
-                    )
-                    st.markdown(response, unsafe_allow_html=True)
+                    if api_client.enabled():
+                        response = api_client.chat(
+                            prompt,
+                            st.session_state.messages[:-1],
+                            st.session_state.get('gemini_api_key'),
+                            st.session_state.get('chat_model', 'gemini-2.0-flash'),
+                            st.session_state.get('user_gender', 'Male'),
+                            st.session_state.get('fast_shopping_mode', False),
+                        )
+                    else:
+                        from modules import chatbot
+                        # Use synchronous wrapper
+                        response = chatbot.run_chat_tool(
+                            prompt, 
+                            st.session_state.messages[:-1], 
+                            current_inventory,
+                            on_event=on_event,
+                        )
+                    live_cards.empty()
+                    st.markdown(_render_message(response), unsafe_allow_html=True)
         
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        event_id = conversation_store.append_message(user_id, session_id, "assistant", response)
+        st.session_state.messages.append({"role": "assistant", "content": response, "event_id": event_id})
 
 def render_right_column():
     st.header("🪄 Virtual Try-On")
@@ -127,29 +251,113 @@ def render_right_column():
             
     with col2:
         garment = st.file_uploader("2. Upload Dress", type=["jpg", "png"], key="vton_cloth")
-        if garment:
-            st.image(garment, caption="Dress", use_container_width=True)
+        garment_path = None
+        if not garment:
+            # Wardrobe garments can be tried on directly (and may already be pre-rendered)
+            from modules import prerender
+            options = {}
+            for category, files in wardrobe.list_items().items():
+                if category in prerender.GARMENT_CATEGORIES:
+                    for file_name in files:
+                        options[file_name] = os.path.join(wardrobe.WARDROBE_ROOT, wardrobe.CATEGORIES[category], file_name)
+            choice = st.selectbox("...or pick from your wardrobe", ["—", *options], key="vton_wardrobe_pick")
+            garment_path = options.get(choice)
+        if garment or garment_path:
+            st.image(garment or garment_path, caption="Dress", use_container_width=True)
+
+    st.toggle(
+        "🎨 Pre-render likely try-ons",
+        key="prerender_enabled",
+        help="After you upload a photo, quietly render your most likely wardrobe garments in the background "
+             "(recently added or mentioned in chat) so they appear instantly. Uses a few API calls per hour."
+    )
+    st.toggle(
+        "⚡ Progressive preview",
+        key="vton_progressive",
+        # The API renders full quality only, so thin clients have no preview tier
+        disabled=api_client.enabled(),
+        help="Show a fast low-resolution try-on first, then swap in the full-quality result when it is ready"
+    )
+    if person and st.session_state.get('prerender_enabled', False):
+        from modules import prerender, vton
+        api_key = st.session_state.get('gemini_api_key')
+        candidates = prerender.likely_garments(st.session_state.get('messages', []))
+        # Decoding and hashing the photos is only worth it when the photo or the likely garments changed
+        selection = (
+            getattr(person, "file_id", None) or (person.name, person.size),
+            vton.get_vton_model(),
+            tuple((path, os.stat(path).st_mtime_ns) for path in candidates),
+        )
+        if st.session_state.get('prerender_selection') != selection:
+            st.session_state.prerender_selection = selection
+            st.session_state.prerender_queued = prerender.schedule(
+                image_io.load_image(person),
+                conversation_store.user_id_for(api_key),
+                api_key,
+                vton.get_vton_model(),
+                garments=candidates,
+            )
+        if st.session_state.get('prerender_queued'):
+            st.caption(f"🎨 Pre-rendering {st.session_state.prerender_queued} likely look(s) in the background...")
 
-    if person and garment:
+    if person and (garment or garment_path):
         if st.button("Generate Try-On", type="primary", use_container_width=True):
-            with st.status("Generating look...", expanded=True) as status:
-                st.write("Identifying body keypoints...")
-                time.sleep(0.5)
-                st.write("Warping garment...")
-                time.sleep(0.5)
-                st.write("Blending textures...")
-                
-                # Call the VTON module
+            from modules import vton, prerender
+            # Decoded once (capped at the model's input size) and shared with pre-renders
+            person_img = image_io.load_image(person)
+            # Background removed and cropped to the garment: a smaller, cleaner model input
+            garment_img = cutouts.load_garment(garment or garment_path)
+            # A finished or in-flight pre-render answers the click without a new generation
+            result_img = prerender.take(person_img, garment_img, vton.get_vton_model())
+            if result_img is not None:
+                st.image(result_img, caption="Virtual Try-On Result (Nano Banana)", use_container_width=True)
+            elif st.session_state.get('vton_progressive', False) and not api_client.enabled():
+                # Quick low-resolution preview first, replaced in place by the full render
+                result_slot = st.empty()
                 try:
-                    # UPDATED: Now returns just the image
-                    result_img = vton.process_virtual_tryon(Image.open(person), Image.open(garment))
-                    status.update(label="Complete!", state="complete", expanded=False)
-                    
-                    # Display the result
-                    st.image(result_img, caption="Virtual Try-On Result (Nano Banana)", use_container_width=True)
-                    
+                    with st.spinner("Sketching a quick preview..."):
+                        preview, preview_seconds, full = vton.process_virtual_tryon_progressive(person_img, garment_img)
+                    if preview is not None:
+                        result_slot.image(preview, caption=f"Preview ({preview_seconds:.1f}s) - full quality on the way...",
+                                          use_container_width=True)
+                    with st.spinner("Rendering full quality..."):
+                        result_img, full_seconds = full.result()
+                    timing = f"preview {preview_seconds:.1f}s, full {full_seconds:.1f}s" if preview is not None else f"{full_seconds:.1f}s"
+                    result_slot.image(result_img, caption=f"Virtual Try-On Result (Nano Banana) - {timing}",
+                                      use_container_width=True)
                 except Exception as e:
-                    status.update(label="Failed", state="error", expanded=False)
                     st.error(f"Generation failed: {str(e)}")
+            else:
+                with st.status("Generating look...", expanded=True) as status:
+                    st.write("Identifying body keypoints...")
+                    time.sleep(0.5)
+                    st.write("Warping garment...")
+                    time.sleep(0.5)
+                    st.write("Blending textures...")
+                    
+                    # Call the VTON module
+                    try:
+                        if api_client.enabled():
+                            if garment:
+                                garment_bytes = garment.getvalue()
+                            else:
+                                with open(garment_path, "rb") as f:
+                                    garment_bytes = f.read()
+                            result_png = api_client.tryon(
+                                person.getvalue(), garment_bytes,
+                                st.session_state.get('gemini_api_key'), vton.get_vton_model(),
+                            )
+                            result_img = Image.open(io.BytesIO(result_png)) if result_png else person_img
+                        else:
+                            # UPDATED: Now returns just the image
+                            result_img = vton.process_virtual_tryon(person_img, garment_img)
+                        status.update(label="Complete!", state="complete", expanded=False)
+                        
+                        # Display the result
+                        st.image(result_img, caption="Virtual Try-On Result (Nano Banana)", use_container_width=True)
+                        
+                    except Exception as e:
+                        status.update(label="Failed", state="error", expanded=False)
+                        st.error(f"Generation failed: {str(e)}")
 
             st.info("Powered by Google's experimental Nano Banana model.")
@@ -1,17 +1,54 @@
+import os
 import io
 import time
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from PIL import Image
 import streamlit as st
 
+from modules import telemetry, rate_limiter, async_runtime, image_io
+
 from google import genai
 from google.genai import types
 
+# Finished try-ons kept in memory, keyed by (person, garment, model) content
+RESULT_CACHE_ENTRIES = 32
+
+# Point the Gemini SDK at another endpoint (e.g. the load-test stand-in); empty = Google's API
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "")
+
+VTON_PROMPT = (
+    "Generate a virtual try-on image. "
+    "Take the person from the first image and show them wearing the garment from the second image. "
+    "Keep the person's face, body pose, and background the same. "
+    "Only replace their clothing with the garment shown."
+)
+
+# Progressive mode: a quick preview from shrunken inputs on the fastest image model
+PREVIEW_MODEL = "gemini-2.0-flash-preview-image-generation"
+PREVIEW_MAX_SIDE = 384
+
+_results = OrderedDict()  # result key -> PIL image
+_results_lock = threading.Lock()
+
+# Full-quality renders running behind a preview
+_full_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vton-full")
+_full_renders = {}  # result key -> Future
+
 def get_gemini_client():
     """Get Gemini client using API key from session state."""
     api_key = st.session_state.get('gemini_api_key')
     if not api_key:
         raise ValueError("Gemini API key not found. Please enter it in the sidebar.")
-    return genai.Client(api_key=api_key)
+    return _client_for_key(api_key)
+
+@functools.lru_cache(maxsize=32)
+def _client_for_key(api_key: str) -> genai.Client:
+    http_options = types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
+    return genai.Client(api_key=api_key, http_options=http_options)
 
 def get_vton_model():
     """Get the selected VTON model from session state."""
@@ -22,13 +59,10 @@ def _load_pil_image_as_part(pil_image: Image.Image, filename_hint: str) -> types
     Helper to convert a PIL Image directly into a Gemini API Part object
     without saving it to disk first.
     """
-    # Convert PIL image to byte buffer in memory
-    buf = io.BytesIO()
     # Use the format derived from the filename hint (e.g., 'person.jpg' -> 'JPEG')
     img_format = 'PNG' if filename_hint.lower().endswith('.png') else 'JPEG'
-    # Save using high quality
-    pil_image.save(buf, format=img_format, quality=95)
-    byte_data = buf.getvalue()
+    # Encode at high quality; the intermediate buffer is released immediately
+    byte_data = image_io.encode(pil_image, img_format, quality=95)
     
     # Determine mime type based on the format we just used
     mime_type = f"image/{img_format.lower()}"
@@ -40,9 +74,84 @@ def _load_pil_image_as_part(pil_image: Image.Image, filename_hint: str) -> types
         )
     )
 
-def process_virtual_tryon(person_img_pil: Image.Image, garment_img_pil: Image.Image):
+def result_key(person_img_pil: Image.Image, garment_img_pil: Image.Image, model_name: str) -> str:
+    """Content hash identifying one try-on, independent of where the images came from."""
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    for img in (person_img_pil, garment_img_pil):
+        digest.update(f"{img.mode}{img.size}".encode("utf-8"))
+        digest.update(img.tobytes())
+    return digest.hexdigest()
+
+def get_cached_result(key: str):
+    with _results_lock:
+        img = _results.get(key)
+        if img is not None:
+            _results.move_to_end(key)
+    telemetry.incr("cache_hits_total" if img is not None else "cache_misses_total", cache="vton")
+    return img
+
+def store_result(key: str, img: Image.Image):
+    with _results_lock:
+        _results[key] = img
+        _results.move_to_end(key)
+        while len(_results) > RESULT_CACHE_ENTRIES:
+            _results.popitem(last=False)
+
+def generate_tryon(person_img_pil: Image.Image, garment_img_pil: Image.Image, api_key: str, model_name: str,
+                   priority: int = rate_limiter.PRIORITY_BATCH) -> Image.Image:
+    """
+    Calls the image model and returns the generated try-on. Has no Streamlit
+    dependencies so it can run on background threads; raises on failure.
+    """
+    client = _client_for_key(api_key)
+
+    # Load images using our in-memory helper
+    with telemetry.span("image_encode"):
+        contents = [
+            _load_pil_image_as_part(person_img_pil, "person.png"),
+            _load_pil_image_as_part(garment_img_pil, "garment.png"),
+            types.Part.from_text(text=VTON_PROMPT),
+        ]
+
+    # Configuration for image generation
+    config = types.GenerateContentConfig(
+        response_modalities=["IMAGE", "TEXT"],
+    )
+
+    # Call the generate_content API
+    with telemetry.span("upload", model=model_name):
+        response = rate_limiter.call(
+            api_key,
+            model_name,
+            lambda: async_runtime.run(client.aio.models.generate_content(
+                model=model_name,
+                contents=contents,
+                config=config,
+            )),
+            priority=priority,
+        )
+    telemetry.record_token_usage(response, model_name, "vton")
+
+    # Process the response - look for image data
+    if response.candidates and response.candidates[0].content.parts:
+        for part in response.candidates[0].content.parts:
+            if part.inline_data:
+                # Convert raw bytes back to a PIL Image for Streamlit
+                with telemetry.span("decode"):
+                    generated_img = Image.open(io.BytesIO(part.inline_data.data))
+                    generated_img.load()
+                return generated_img
+
+    # If no image found, check for text response
+    if response.text:
+        raise Exception(f"Model returned text instead of image: {response.text[:200]}")
+    raise Exception("API response did not contain valid image data.")
+
+def process_virtual_tryon(person_img_pil: Image.Image, garment_img_pil: Image.Image, priority: int = rate_limiter.PRIORITY_BATCH):
     """
     Generates a Virtual Try-On image using Google Gemini's image generation model.
+    Requests queue behind interactive chat traffic on the shared rate limiter;
+    repeated (or pre-rendered) pairs are served from the result cache.
     """
     model_name = get_vton_model()
     print(f"\n--- VTON: Starting Image Generation ({model_name}) ---")
@@ -50,63 +159,108 @@ def process_virtual_tryon(person_img_pil: Image.Image, garment_img_pil: Image.Im
     start_time = time.time()
 
     try:
-        client = get_gemini_client()
-
-        # Prepare the contents list for the API call
-        contents = []
-        
-        # Load images using our in-memory helper
-        contents.append(_load_pil_image_as_part(person_img_pil, "person.png"))
-        contents.append(_load_pil_image_as_part(garment_img_pil, "garment.png"))
-        
-        # Add the text prompt defining the VTON task
-        vton_prompt = (
-            "Generate a virtual try-on image. "
-            "Take the person from the first image and show them wearing the garment from the second image. "
-            "Keep the person's face, body pose, and background the same. "
-            "Only replace their clothing with the garment shown."
-        )
-        contents.append(types.Part.from_text(text=vton_prompt))
+        key = result_key(person_img_pil, garment_img_pil, model_name)
+        cached = get_cached_result(key)
+        if cached is not None:
+            print("⚡ VTON: Served from result cache")
+            return cached
+
+        api_key = st.session_state.get('gemini_api_key')
+        if not api_key:
+            raise ValueError("Gemini API key not found. Please enter it in the sidebar.")
 
         print(f"Sending request to Gemini model {model_name}...")
         st.toast("Sending request to Gemini...", icon="✨")
 
-        # Configuration for image generation
-        config = types.GenerateContentConfig(
-            response_modalities=["IMAGE", "TEXT"],
-        )
-
-        # Call the generate_content API
-        response = client.models.generate_content(
-            model=model_name,
-            contents=contents,
-            config=config,
-        )
+        generated_img = generate_tryon(person_img_pil, garment_img_pil, api_key, model_name, priority)
+        store_result(key, generated_img)
 
         end_time = time.time()
         print(f"Generation complete in {end_time - start_time:.2f}s.")
-
-        # Process the response - look for image data
-        if response.candidates and response.candidates[0].content.parts:
-            for part in response.candidates[0].content.parts:
-                if part.inline_data:
-                    # Extract the raw image bytes
-                    raw_image_bytes = part.inline_data.data
-                    
-                    # Convert raw bytes back to a PIL Image for Streamlit
-                    generated_img = Image.open(io.BytesIO(raw_image_bytes))
-                    
-                    st.toast("Image Generation Complete!", icon="✨")
-                    return generated_img
-        
-        # If no image found, check for text response
-        if response.text:
-            raise Exception(f"Model returned text instead of image: {response.text[:200]}")
-        else:
-            raise Exception("API response did not contain valid image data.")
+        st.toast("Image Generation Complete!", icon="✨")
+        return generated_img
 
     except Exception as e:
         error_msg = str(e)
         print(f"\n❌ VTON Error: {error_msg}")
+        telemetry.incr("vton_errors_total")
         st.error(f"An error occurred during image generation: {error_msg}")
         return person_img_pil
+
+def _downscale(img: Image.Image, max_side: int) -> Image.Image:
+    small = img.copy()
+    small.thumbnail((max_side, max_side))
+    return small
+
+def _timed_render(key: str, tier: str, person_img_pil: Image.Image, garment_img_pil: Image.Image, api_key: str,
+                  model_name: str, priority: int):
+    """Generates and caches one tier; returns (image, seconds)."""
+    start_time = time.time()
+    generated_img = generate_tryon(person_img_pil, garment_img_pil, api_key, model_name, priority)
+    elapsed = time.time() - start_time
+    store_result(key, generated_img)
+    telemetry.observe("vton_tier_seconds", elapsed, tier=tier, model=model_name)
+    print(f"🪄 VTON: {tier} tier ready in {elapsed:.2f}s")
+    return generated_img, elapsed
+
+def start_full_render(person_img_pil: Image.Image, garment_img_pil: Image.Image, api_key: str, model_name: str):
+    """
+    Starts (or joins) the full-quality render on a worker thread. The Future
+    resolves to (image, seconds); cached results resolve immediately with 0s.
+    """
+    key = result_key(person_img_pil, garment_img_pil, model_name)
+    cached = get_cached_result(key)
+    if cached is not None:
+        future = Future()
+        future.set_result((cached, 0.0))
+        return future
+    with _results_lock:
+        future = _full_renders.get(key)
+        if future is not None:
+            return future
+        future = _full_renders[key] = _full_executor.submit(
+            _timed_render, key, "full", person_img_pil.copy(), garment_img_pil.copy(), api_key, model_name,
+            rate_limiter.PRIORITY_BATCH,
+        )
+    # Registered outside the lock: the callback takes it, and runs right here if the render already finished
+    future.add_done_callback(lambda done: _forget_full_render(key, done))
+    return future
+
+def _forget_full_render(key: str, future):
+    with _results_lock:
+        if _full_renders.get(key) is future:
+            del _full_renders[key]
+
+def process_virtual_tryon_progressive(person_img_pil: Image.Image, garment_img_pil: Image.Image):
+    """
+    Two-tier try-on: kicks off the full-quality render in the background, then
+    returns (preview image, preview seconds, full-render Future). The preview is
+    made from inputs shrunk to PREVIEW_MAX_SIDE on PREVIEW_MODEL at interactive
+    priority. Both tiers are cached; the preview is None when the full result
+    is already cached or the preview fails.
+    """
+    model_name = get_vton_model()
+    api_key = st.session_state.get('gemini_api_key')
+    if not api_key:
+        raise ValueError("Gemini API key not found. Please enter it in the sidebar.")
+
+    full = start_full_render(person_img_pil, garment_img_pil, api_key, model_name)
+    if full.done() and full.exception() is None:
+        return None, 0.0, full
+
+    small_person = _downscale(person_img_pil, PREVIEW_MAX_SIDE)
+    small_garment = _downscale(garment_img_pil, PREVIEW_MAX_SIDE)
+    preview_key = result_key(small_person, small_garment, PREVIEW_MODEL)
+    cached = get_cached_result(preview_key)
+    if cached is not None:
+        return cached, 0.0, full
+    try:
+        preview, elapsed = _timed_render(
+            preview_key, "preview", small_person, small_garment, api_key, PREVIEW_MODEL, rate_limiter.PRIORITY_INTERACTIVE
+        )
+        return preview, elapsed, full
+    except Exception as e:
+        # The full render is still coming; a missing preview is not fatal
+        print(f"⚠️ VTON: Preview failed: {str(e)}")
+        telemetry.incr("vton_errors_total", tier="preview")
+        return None, 0.0, full
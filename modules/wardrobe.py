@@ -1,6 +1,4 @@
 import os
-import shutil
-from PIL import Image
 
 # Define the root directory for the wardrobe
 WARDROBE_ROOT = "user_wardrobe"
@@ -16,6 +14,9 @@ CATEGORIES = {
     "Special: Saree/Drapes (Overlap)": "special_overlap" 
 }
 
+# Only these files count as wardrobe items (skips .DS_Store, index files, etc.)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
 def init_wardrobe():
     """Ensures all necessary folders exist."""
     if not os.path.exists(WARDROBE_ROOT):
@@ -43,26 +44,44 @@ def save_uploaded_item(uploaded_file, category):
     # Save the file
     with open(file_path, "wb") as f:
         f.write(uploaded_file.getbuffer())
+
+    # Background-removed cutout for try-ons and thumbnails, made off the upload path
+    from modules import cutouts
+    cutouts.schedule(file_path)
     
     return file_path
 
+def list_items():
+    """Returns {category: [file names]} for every category that has image files."""
+    items = {}
+    for category, folder in CATEGORIES.items():
+        path = os.path.join(WARDROBE_ROOT, folder)
+        if os.path.exists(path):
+            files = sorted(f for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+            if files:
+                items[category] = files
+    return items
+
+def item_path(folder: str, file_name: str):
+    """Path of an item addressed by category folder and file name; None if either is not allowed."""
+    name = os.path.basename(file_name or "")
+    if folder not in CATEGORIES.values() or not name.lower().endswith(IMAGE_EXTENSIONS) or name.startswith("."):
+        return None
+    return os.path.join(WARDROBE_ROOT, folder, name)
+
 def get_wardrobe_inventory():
     """Returns a text summary of what is in the wardrobe for the LLM context."""
-    inventory = []
-    if os.path.exists(WARDROBE_ROOT):
-        for category, folder in CATEGORIES.items():
-            path = os.path.join(WARDROBE_ROOT, folder)
-            if os.path.exists(path):
-                files = os.listdir(path)
-                if files:
-                    inventory.append(f"Category {category}: {', '.join(files)}")
-    return "\n".join(inventory)
+    return "\n".join(f"Category {category}: {', '.join(files)}" for category, files in list_items().items())
 
 def delete_item(file_path):
     """Deletes an item from the wardrobe given its full file path."""
     try:
         if os.path.exists(file_path):
+            from modules import cutouts
+            cutouts.discard(file_path)
             os.remove(file_path)
+            from modules import semantic_cache
+            semantic_cache.invalidate_item(os.path.basename(os.path.dirname(file_path)), os.path.basename(file_path))
             return True, f"Deleted {os.path.basename(file_path)}"
         else:
             return False, "File not found."
@@ -0,0 +1,285 @@
+"""
+Wardrobe analytics from the images themselves: per-item colour histograms
+and dominant palettes, computed in batched NumPy over small thumbnails in a
+process pool and cached in the wardrobe index (WARDROBE_ROOT/.analytics.json,
+keyed by file size and mtime). Aggregate queries (colour distribution per
+category, wardrobe gaps) then only read the index.
+"""
+import os
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any
+
+import numpy as np
+
+from modules import wardrobe, telemetry
+
+INDEX_FILE = os.path.join(wardrobe.WARDROBE_ROOT, ".analytics.json")
+INDEX_VERSION = 1
+
+# Thumbnails are resampled to this square so a batch stacks into one array
+ANALYSIS_SIDE = 64
+
+# Items per worker task, and below how many new items the pool is not worth starting
+BATCH_SIZE = 16
+POOL_MIN_ITEMS = 12
+POOL_WORKERS = min(4, os.cpu_count() or 1)
+
+# Hue histogram: 12 chromatic bins (30° wide, centred on the label's hue; red spans 345-15°) plus black, grey and white
+HUE_BINS = 12
+HISTOGRAM_LABELS = ["red", "orange", "yellow", "lime", "green", "teal", "cyan", "sky", "blue", "purple", "magenta", "pink",
+                    "black", "grey", "white"]
+
+# Named reference colours for palettes; names match outfits.COLOR_FAMILIES where possible
+NAMED_COLORS = {
+    "black": (20, 20, 20), "charcoal": (54, 54, 58), "grey": (128, 128, 128), "silver": (192, 192, 192),
+    "white": (245, 245, 245), "cream": (240, 230, 200), "beige": (215, 195, 160), "khaki": (190, 170, 120),
+    "tan": (180, 140, 100), "brown": (110, 70, 40), "camel": (193, 154, 107), "olive": (110, 110, 50),
+    "mustard": (210, 170, 40), "yellow": (240, 220, 60), "gold": (200, 160, 60), "orange": (240, 130, 40),
+    "rust": (170, 75, 40), "peach": (250, 190, 160), "coral": (245, 120, 100), "red": (200, 30, 40),
+    "maroon": (110, 20, 35), "pink": (240, 150, 180), "purple": (110, 50, 140), "lavender": (190, 170, 220),
+    "navy": (25, 35, 80), "blue": (40, 90, 190), "denim": (70, 100, 140), "sky": (130, 190, 235),
+    "teal": (20, 120, 120), "turquoise": (60, 200, 200), "green": (40, 130, 60), "mint": (170, 230, 190),
+}
+_NAMED_RGB = np.array(list(NAMED_COLORS.values()), dtype=np.float32)
+_NAMED_KEYS = list(NAMED_COLORS)
+
+PALETTE_SIZE = 3
+
+# Categories whose gaps are worth pointing out, with a readable noun
+GAP_CATEGORIES = {"Upper Body": "tops", "Lower Body": "bottoms", "Feet": "footwear"}
+FORMAL_THRESHOLD = 0.7
+
+_index_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+def _key(folder: str, name: str) -> str:
+    return f"{folder}/{name}"
+
+# --- Per-item analysis (runs in worker processes) ----------------------------
+
+def _load_batch(paths: List[str]):
+    """
+    (B, ANALYSIS_SIDE, ANALYSIS_SIDE, 3) uint8 stack of draft-decoded thumbnails,
+    and a (B,) mask of the images that decoded (unreadable ones stay black).
+    """
+    from modules import image_io
+    batch = np.zeros((len(paths), ANALYSIS_SIDE, ANALYSIS_SIDE, 3), dtype=np.uint8)
+    readable = np.ones(len(paths), dtype=bool)
+    for i, path in enumerate(paths):
+        try:
+            img = image_io.load_image(path, ANALYSIS_SIDE * 2).convert("RGB")
+        except Exception as e:
+            print(f"⚠️ ANALYTICS: Could not read {os.path.basename(path)}: {str(e)}")
+            readable[i] = False
+            continue
+        batch[i] = np.asarray(img.resize((ANALYSIS_SIDE, ANALYSIS_SIDE)))
+    return batch, readable
+
+def _foreground(rgb: np.ndarray) -> np.ndarray:
+    """Mask of garment pixels: those clearly different from each image's border (backdrop) colour."""
+    border = np.concatenate([rgb[:, 0], rgb[:, -1], rgb[:, :, 0], rgb[:, :, -1]], axis=1)
+    backdrop = np.median(border, axis=1)[:, None, None, :]
+    mask = np.abs(rgb - backdrop).sum(axis=-1) > 60
+    # A garment filling the frame leaves (almost) no backdrop: use every pixel
+    sparse = mask.mean(axis=(1, 2)) < 0.05
+    mask[sparse] = True
+    return mask
+
+def _histograms(rgb: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """(B, 15) share of foreground pixels per hue bin / black / grey / white."""
+    mx, mn = rgb.max(axis=-1), rgb.min(axis=-1)
+    chroma = mx - mn
+    value = mx / 255.0
+    saturation = np.where(mx > 0, chroma / np.maximum(mx, 1e-6), 0.0)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    safe = np.maximum(chroma, 1e-6)
+    hue = np.select(
+        [mx == r, mx == g],
+        [((g - b) / safe) % 6, (b - r) / safe + 2],
+        (r - g) / safe + 4,
+    ) * 60.0
+    bins = np.where(
+        (saturation > 0.25) & (value > 0.2),
+        ((hue + 180 / HUE_BINS) // (360 / HUE_BINS)).astype(np.int64) % HUE_BINS,
+        np.where(value <= 0.2, HUE_BINS, np.where(value >= 0.85, HUE_BINS + 2, HUE_BINS + 1)),
+    )
+    counts = np.zeros((rgb.shape[0], len(HISTOGRAM_LABELS)), dtype=np.float64)
+    batch_index = np.broadcast_to(np.arange(rgb.shape[0])[:, None, None], bins.shape)
+    np.add.at(counts, (batch_index[mask], bins[mask]), 1)
+    return counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+
+def _palettes(rgb: np.ndarray, mask: np.ndarray) -> List[List[Dict[str, Any]]]:
+    """Dominant named colours per image: pixels are snapped to the nearest reference colour and counted."""
+    flat = rgb.reshape(rgb.shape[0], -1, 3)
+    distances = ((flat[:, :, None, :] - _NAMED_RGB[None, None]) ** 2).sum(axis=-1)
+    nearest = distances.argmin(axis=-1)
+    flat_mask = mask.reshape(rgb.shape[0], -1)
+    palettes = []
+    for i in range(rgb.shape[0]):
+        counts = np.bincount(nearest[i][flat_mask[i]], minlength=len(_NAMED_KEYS))
+        total = max(counts.sum(), 1)
+        top = np.argsort(-counts)[:PALETTE_SIZE]
+        palettes.append([{"color": _NAMED_KEYS[j], "share": round(float(counts[j] / total), 3)} for j in top if counts[j]])
+    return palettes
+
+def _analyze_batch(paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Histogram and palette for each image path (worker-process entry point).
+    Unreadable images get a placeholder (no histogram, empty palette), kept in
+    the index until the file changes so they are not retried on every run.
+    """
+    batch, readable = _load_batch(paths)
+    rgb = batch.astype(np.float32)
+    mask = _foreground(rgb)
+    histograms = _histograms(rgb, mask)
+    palettes = _palettes(rgb, mask)
+    return [
+        {"histogram": [round(float(x), 3) for x in h], "palette": p} if ok else {"histogram": None, "palette": [], "unreadable": True}
+        for h, p, ok in zip(histograms, palettes, readable)
+    ]
+
+# --- Index ------------------------------------------------------------------
+
+def _read_index() -> Dict[str, Any]:
+    try:
+        with open(INDEX_FILE, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "items": {}}
+
+def _write_index(index: Dict[str, Any]):
+    os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+    tmp = INDEX_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp, INDEX_FILE)
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs Streamlit / asyncio threads is unsafe
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def analyze_wardrobe() -> Dict[str, Dict[str, Any]]:
+    """
+    Brings the index up to date with the wardrobe (new or changed items are
+    analysed, deleted ones dropped) and returns 'folder/name' -> entry.
+    """
+    with _index_lock:
+        index = _read_index()
+        current, stale = {}, []
+        for category, files in wardrobe.list_items().items():
+            folder = wardrobe.CATEGORIES[category]
+            for name in files:
+                path = os.path.join(wardrobe.WARDROBE_ROOT, folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                key = _key(folder, name)
+                entry = index["items"].get(key)
+                if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                    current[key] = entry
+                else:
+                    current[key] = {"category": category, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                    stale.append((key, path))
+
+        changed = len(current) != len(index["items"]) or bool(stale)
+        if stale:
+            paths = [path for _, path in stale]
+            batches = [paths[i:i + BATCH_SIZE] for i in range(0, len(paths), BATCH_SIZE)]
+            with telemetry.span("wardrobe_analysis", items=len(paths)):
+                if len(paths) < POOL_MIN_ITEMS:
+                    results = [r for batch in batches for r in _analyze_batch(batch)]
+                else:
+                    results = [r for batch_results in _get_pool().map(_analyze_batch, batches) for r in batch_results]
+            for (key, _), result in zip(stale, results):
+                current[key].update(result)
+            telemetry.incr("wardrobe_items_analyzed_total", len(stale))
+        if changed:
+            index["items"] = current
+            _write_index(index)
+        return current
+
+# --- Aggregate queries (index only) --------------------------------------------
+
+def _family(color: str) -> str:
+    from modules import outfits
+    return next((f for f in outfits.FAMILY_NAMES[:-1] if color in outfits.COLOR_FAMILIES[f]), "unknown")
+
+def color_distribution(items: Dict[str, Dict[str, Any]] = None) -> Dict[str, Dict[str, float]]:
+    """category -> {histogram label: share of that category's garment pixels}, largest first."""
+    items = analyze_wardrobe() if items is None else items
+    by_category = {}
+    for entry in items.values():
+        if entry.get("histogram"):
+            by_category.setdefault(entry["category"], []).append(entry["histogram"])
+    distribution = {}
+    for category, histograms in by_category.items():
+        mean = np.mean(histograms, axis=0)
+        distribution[category] = {HISTOGRAM_LABELS[i]: round(float(mean[i]), 3) for i in np.argsort(-mean) if mean[i] >= 0.01}
+    return distribution
+
+def dominant_colors(items: Dict[str, Dict[str, Any]] = None) -> Dict[str, Dict[str, int]]:
+    """category -> {named main colour: number of items}."""
+    items = analyze_wardrobe() if items is None else items
+    counts = {}
+    for entry in items.values():
+        if entry["palette"]:
+            color = entry["palette"][0]["color"]
+            per_category = counts.setdefault(entry["category"], {})
+            per_category[color] = per_category.get(color, 0) + 1
+    return {c: dict(sorted(v.items(), key=lambda kv: -kv[1])) for c, v in counts.items()}
+
+def gaps(items: Dict[str, Dict[str, Any]] = None) -> List[str]:
+    """Plain-language holes in the wardrobe, e.g. "no formal footwear"."""
+    from modules import outfits
+    items = analyze_wardrobe() if items is None else items
+    found = []
+    by_category = {}
+    for key, entry in items.items():
+        attributes = outfits.item_attributes(entry["category"], key.split("/", 1)[1])
+        attributes["main_color"] = entry["palette"][0]["color"] if entry["palette"] else None
+        by_category.setdefault(entry["category"], []).append(attributes)
+
+    for category, noun in GAP_CATEGORIES.items():
+        category_items = by_category.get(category, [])
+        if not category_items:
+            found.append(f"no {noun}")
+            continue
+        if not any(i["formality"] >= FORMAL_THRESHOLD for i in category_items):
+            found.append(f"no formal {noun}")
+        families = {_family(i["main_color"]) for i in category_items if i["main_color"]}
+        if "neutral" not in families:
+            found.append(f"no neutral-coloured {noun}")
+        elif len(category_items) >= 3 and families == {"neutral"}:
+            found.append(f"only neutral-coloured {noun}")
+
+    all_items = [i for group in by_category.values() for i in group]
+    if all_items and not any(i["style"] == "ethnic" for i in all_items):
+        found.append("no ethnic wear")
+    return found
+
+def compact_context(items: Dict[str, Dict[str, Any]] = None) -> str:
+    """Short wardrobe description for the chat model: counts and main colours per category, then gaps."""
+    items = analyze_wardrobe() if items is None else items
+    colors = dominant_colors(items)
+    lines = [f"Wardrobe summary ({len(items)} items, colours measured from the photos):"]
+    for category in wardrobe.CATEGORIES:
+        count = sum(1 for e in items.values() if e["category"] == category)
+        if count:
+            palette = ", ".join(f"{c} x{n}" if n > 1 else c for c, n in colors.get(category, {}).items())
+            lines.append(f"- {category} ({count}): {palette}")
+    missing = gaps(items)
+    if missing:
+        lines.append(f"Gaps: {'; '.join(missing)}")
+    return "\n".join(lines)
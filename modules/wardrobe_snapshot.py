@@ -0,0 +1,262 @@
+"""
+Single-file wardrobe snapshots for backup and migration.
+
+Layout: MAGIC, then item blobs and thumbnails back to back, then a JSON index,
+then a fixed footer (index offset, index length, MAGIC). Readers mmap the file,
+read the footer and index, and slice any item without extracting the rest.
+
+An incremental snapshot stores only items added or changed since its base
+snapshot; unchanged entries point at the base by name, and import follows the
+chain. Usage:
+
+    python -m modules.wardrobe_snapshot export backup.ffws [--base previous.ffws]
+    python -m modules.wardrobe_snapshot import backup.ffws [--overwrite]
+    python -m modules.wardrobe_snapshot list backup.ffws
+"""
+import os
+import json
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+from typing import Dict, Any, Optional
+
+from modules import wardrobe, image_io, telemetry
+
+MAGIC = b"FFWSNAP1"
+FOOTER = struct.Struct("<QQ8s")  # index offset, index length, magic
+FORMAT_VERSION = 1
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _item_metadata(category: str, path: str) -> Dict[str, Any]:
+    """Attributes and embedding from the outfit engine, so a restored wardrobe needs no recomputation."""
+    from modules import outfits
+    attributes = outfits.item_attributes(category, os.path.basename(path))
+    return {
+        "attributes": {k: attributes[k] for k in ("color", "formality", "style")},
+        "embedding": [round(float(x), 4) for x in outfits._embedding(attributes)],
+    }
+
+def _thumbnail_bytes(path: str) -> bytes:
+    return image_io.encode(image_io.load_thumbnail(path), "JPEG", quality=80)
+
+class Snapshot:
+    """Memory-mapped, read-only view of a snapshot file (and its base chain)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty, not a wardrobe snapshot")
+        self._base = None
+        try:
+            self.index = self._read_index()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_index(self) -> Dict[str, Any]:
+        """Footer and index, checked so that every later read stays inside the file; ValueError if malformed."""
+        if self._map[:len(MAGIC)] != MAGIC or len(self._map) < len(MAGIC) + FOOTER.size:
+            raise ValueError(f"{self.path} is not a wardrobe snapshot")
+        index_offset, index_length, magic = FOOTER.unpack(self._map[-FOOTER.size:])
+        if magic != MAGIC or not len(MAGIC) <= index_offset <= index_offset + index_length <= len(self._map) - FOOTER.size:
+            raise ValueError(f"{self.path} is truncated")
+        try:
+            # JSONDecodeError and UnicodeDecodeError are both ValueErrors
+            index = json.loads(self._map[index_offset:index_offset + index_length])
+        except ValueError:
+            raise ValueError(f"{self.path} has a corrupt index")
+        items = index.get("items") if isinstance(index, dict) else None
+        if not isinstance(items, dict):
+            raise ValueError(f"{self.path} has a corrupt index")
+        for key, entry in items.items():
+            if not isinstance(entry, dict) or "/" not in key:
+                raise ValueError(f"{self.path} has a corrupt entry for {key!r}")
+            if entry.get("in_base"):
+                continue
+            for field in ("blob", "thumbnail"):
+                span = entry.get(field)
+                if not (isinstance(span, list) and len(span) == 2 and all(isinstance(v, int) for v in span)
+                        and len(MAGIC) <= span[0] and span[1] >= 0 and span[0] + span[1] <= index_offset):
+                    raise ValueError(f"{self.path} has a corrupt entry for {key!r}")
+        return index
+
+    @property
+    def base(self) -> Optional["Snapshot"]:
+        name = self.index.get("base")
+        if name and self._base is None:
+            self._base = Snapshot(os.path.join(os.path.dirname(os.path.abspath(self.path)), name))
+            if self._base.index["snapshot_id"] != self.index["base_id"]:
+                raise ValueError(f"Base snapshot {name} does not match the one {self.path} was built on")
+        return self._base
+
+    @property
+    def items(self) -> Dict[str, Dict[str, Any]]:
+        """'folder/name' -> entry for every item in the wardrobe at snapshot time."""
+        return self.index["items"]
+
+    def _slice(self, key: str, field: str) -> bytes:
+        entry = self.items[key]
+        if entry.get("in_base"):
+            return self.base._slice(key, field)
+        offset, length = entry[field]
+        # Only these pages of the mapping are touched
+        return self._map[offset:offset + length]
+
+    def read(self, key: str) -> bytes:
+        """Original image bytes of one item, without reading anything else."""
+        return self._slice(key, "blob")
+
+    def thumbnail(self, key: str) -> bytes:
+        return self._slice(key, "thumbnail")
+
+    def close(self):
+        if self._base is not None:
+            self._base.close()
+        if getattr(self, "_map", None) is not None and not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def export_snapshot(out_path: str, base_path: str = None) -> Dict[str, int]:
+    """
+    Packs the wardrobe into `out_path`. With `base_path`, only items added or
+    changed since that snapshot are stored (unchanged size+mtime skips hashing).
+    Returns counts of stored, reused and total items.
+    """
+    base = Snapshot(base_path) if base_path else None
+    stored = reused = 0
+    items = {}
+    with telemetry.span("snapshot_export"):
+        tmp_path = out_path + ".tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(MAGIC)
+            for category, files in wardrobe.list_items().items():
+                folder = wardrobe.CATEGORIES[category]
+                for name in files:
+                    path = os.path.join(wardrobe.WARDROBE_ROOT, folder, name)
+                    stat = os.stat(path)
+                    key = f"{folder}/{name}"
+                    previous = base.items.get(key) if base else None
+                    if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+                        sha = previous["sha256"]
+                    else:
+                        sha = _sha256(path)
+                    entry = {"category": category, "size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha}
+                    if previous and previous["sha256"] == sha:
+                        entry.update(in_base=True, **{k: previous[k] for k in ("attributes", "embedding")})
+                        reused += 1
+                    else:
+                        with open(path, "rb") as f:
+                            blob_offset = out.tell()
+                            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                                out.write(chunk)
+                        thumbnail = _thumbnail_bytes(path)
+                        entry["blob"] = [blob_offset, stat.st_size]
+                        entry["thumbnail"] = [out.tell(), len(thumbnail)]
+                        out.write(thumbnail)
+                        entry.update(_item_metadata(category, path))
+                        stored += 1
+                    items[key] = entry
+
+            index = {
+                "version": FORMAT_VERSION,
+                "snapshot_id": hashlib.sha256(f"{time.time()}{out_path}".encode("utf-8")).hexdigest()[:16],
+                "created": time.time(),
+                "base": os.path.basename(base_path) if base_path else None,
+                "base_id": base.index["snapshot_id"] if base else None,
+                "deleted": sorted(set(base.items) - set(items)) if base else [],
+                "items": items,
+            }
+            index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+            index_offset = out.tell()
+            out.write(index_bytes)
+            out.write(FOOTER.pack(index_offset, len(index_bytes), MAGIC))
+        os.replace(tmp_path, out_path)
+    if base:
+        base.close()
+    print(f"💾 SNAPSHOT: Wrote {out_path} ({stored} stored, {reused} from base)")
+    return {"stored": stored, "reused": reused, "total": len(items)}
+
+def import_snapshot(path: str, overwrite: bool = False) -> Dict[str, int]:
+    """Restores every item of a snapshot (following its base chain). Existing files are kept unless `overwrite`."""
+    written = skipped = 0
+    with Snapshot(path) as snapshot, telemetry.span("snapshot_import"):
+        for key in snapshot.items:
+            folder, name = key.split("/", 1)
+            target = wardrobe.item_path(folder, name)
+            if target is None:
+                continue
+            if os.path.exists(target) and not overwrite:
+                skipped += 1
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target + ".tmp", "wb") as f:
+                f.write(snapshot.read(key))
+            os.replace(target + ".tmp", target)
+            written += 1
+    print(f"💾 SNAPSHOT: Imported {written} items from {path} ({skipped} already present)")
+    return {"written": written, "skipped": skipped}
+
+def export_bytes() -> bytes:
+    """Full snapshot as bytes, for download buttons."""
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "wardrobe.ffws")
+        export_snapshot(path)
+        with open(path, "rb") as f:
+            return f.read()
+
+def import_bytes(data: bytes, overwrite: bool = False) -> Dict[str, int]:
+    """Imports a self-contained (non-incremental) snapshot uploaded as bytes."""
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "upload.ffws")
+        with open(path, "wb") as f:
+            f.write(data)
+        with Snapshot(path) as snapshot:
+            if snapshot.index.get("base"):
+                raise ValueError("Incremental snapshots must be imported from disk next to their base")
+        return import_snapshot(path, overwrite=overwrite)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import wardrobe snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export")
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--base", help="previous snapshot; store only what changed since")
+    import_cmd = sub.add_parser("import")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--overwrite", action="store_true")
+    list_cmd = sub.add_parser("list")
+    list_cmd.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.path, args.base)
+    elif args.command == "import":
+        import_snapshot(args.path, args.overwrite)
+    else:
+        with Snapshot(args.path) as snapshot:
+            for key, entry in snapshot.items.items():
+                source = "base" if entry.get("in_base") else "here"
+                print(f"{key}\t{entry['size']} bytes\t{entry['attributes']}\t({source})")
+
+if __name__ == "__main__":
+    main()
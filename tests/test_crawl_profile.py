@@ -0,0 +1,140 @@
+import os
+import asyncio
+
+import pytest
+
+from modules import crawl_profile, storefronts
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Requests a storefront results page makes, as (resource type, url)
+PAGE_REQUESTS = [
+    ("document", "https://www.amazon.in/s?k=kurta"),
+    ("stylesheet", "https://m.media-amazon.com/images/I/31abc.css"),
+    ("script", "https://m.media-amazon.com/images/I/61xyz.js"),
+    ("image", "https://m.media-amazon.com/images/I/71kurta.jpg"),
+    ("font", "https://m.media-amazon.com/images/I/amazonember.woff2"),
+    ("media", "https://m.media-amazon.com/images/I/promo.mp4"),
+    ("script", "https://www.googletagmanager.com/gtm.js"),
+    ("xhr", "https://aax-eu.amazon-adsystem.com/e/dtb/bid"),
+    ("ping", "https://unagi.amazon.in/1/events/beacon"),
+]
+
+class _Request:
+    def __init__(self, resource_type, url):
+        self.resource_type = resource_type
+        self.url = url
+
+class _Route:
+    def __init__(self, resource_type, url):
+        self.request = _Request(resource_type, url)
+        self.outcome = None
+
+    async def abort(self):
+        self.outcome = "aborted"
+
+    async def continue_(self):
+        self.outcome = "continued"
+
+class _Page:
+    """Records the handlers crawl_profile installs on a Playwright page."""
+
+    def __init__(self):
+        self.route_handler = None
+        self.listeners = {}
+
+    async def route(self, pattern, handler):
+        self.route_handler = handler
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+def _load_page(profile):
+    """Runs the page hook inside track_page and sends PAGE_REQUESTS through it."""
+    async def load():
+        with crawl_profile.track_page("amazon", profile=profile) as stats:
+            page = _Page()
+            await crawl_profile._on_page_context_created(page)
+            routes = [_Route(*request) for request in PAGE_REQUESTS]
+            for route in routes:
+                await page.route_handler(route)
+        return stats, routes
+    return asyncio.run(load())
+
+def test_block_reason():
+    assert crawl_profile.block_reason("font", "https://cdn/x.woff2") == "font"
+    assert crawl_profile.block_reason("media", "https://cdn/x.mp4") == "media"
+    assert crawl_profile.block_reason("script", "https://www.google-analytics.com/analytics.js") == "tracker"
+    assert crawl_profile.block_reason("image", "https://m.media-amazon.com/images/I/71kurta.jpg") is None
+    assert crawl_profile.block_reason("document", "https://www.amazon.in/s?k=kurta") is None
+
+def test_lean_profile_blocks_fonts_media_and_trackers():
+    stats, routes = _load_page("lean")
+    outcomes = {route.request.url: route.outcome for route in routes}
+    assert [url for url, outcome in outcomes.items() if outcome == "continued"] == [
+        url for _, url in PAGE_REQUESTS[:4]
+    ]
+    assert stats["blocked"] == {"font": 1, "media": 1, "tracker": 3}
+
+def test_full_profile_blocks_nothing():
+    stats, routes = _load_page("full")
+    assert all(route.outcome == "continued" for route in routes)
+    assert stats["blocked"] == {}
+
+def test_hook_leaves_untracked_pages_alone():
+    page = _Page()
+    asyncio.run(crawl_profile._on_page_context_created(page))
+    assert page.route_handler is None
+
+def test_run_config_kwargs_per_profile():
+    adapter = storefronts.AmazonAdapter()
+    assert crawl_profile.run_config_kwargs(adapter, 5, profile="full") == {
+        "wait_for": adapter.wait_for, "js_code": crawl_profile.FULL_SCROLL_SCRIPT,
+    }
+    lean = crawl_profile.run_config_kwargs(adapter, 5, profile="lean")
+    assert lean["wait_for"].startswith("js:") and "js_code" not in lean
+
+# --- Card wait on fixture pages (needs a Playwright browser) ---------------------
+
+@pytest.fixture(scope="module")
+def browser_page():
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as playwright:
+        try:
+            browser = playwright.chromium.launch()
+        except Exception as e:
+            pytest.skip(f"no Playwright browser: {e}")
+        yield browser.new_page()
+        browser.close()
+
+def _card_wait(page, fixture, adapter, count, timeout_ms):
+    """True if the adapter's lean wait condition is met on the fixture page within timeout_ms."""
+    with open(os.path.join(FIXTURES, fixture), encoding="utf-8") as f:
+        page.set_content(f.read())
+    page.evaluate("delete window.__cardWait")
+    condition = crawl_profile.run_config_kwargs(adapter, count, profile="lean")["wait_for"][len("js:"):]
+    try:
+        page.wait_for_function(f"({condition})()", timeout=timeout_ms, polling=100)
+        return True
+    except Exception:
+        return False
+
+def test_wait_returns_once_enough_cards_loaded(browser_page):
+    # Three cards are in the markup; scrolling lazy-loads three more
+    assert _card_wait(browser_page, "amazon_results.html", storefronts.AmazonAdapter(), 5, 1000)
+
+def test_wait_accepts_fewer_cards_once_settled(browser_page):
+    assert not _card_wait(browser_page, "amazon_results.html", storefronts.AmazonAdapter(), 20, 500)
+    assert _card_wait(browser_page, "amazon_results.html", storefronts.AmazonAdapter(), 20,
+                      crawl_profile.CARDS_SETTLE_MS + 1500)
+
+def test_wait_accepts_no_results_text(browser_page):
+    assert _card_wait(browser_page, "amazon_no_results.html", storefronts.AmazonAdapter(), 5, 500)
+
+def test_wait_accepts_settled_empty_container(browser_page):
+    assert _card_wait(browser_page, "flipkart_empty.html", storefronts.FlipkartAdapter(), 5,
+                      crawl_profile.CARDS_SETTLE_MS + 1500)
+
+def test_wait_keeps_waiting_for_a_page_still_loading(browser_page):
+    assert not _card_wait(browser_page, "blank.html", storefronts.AmazonAdapter(), 5,
+                          crawl_profile.CARDS_SETTLE_MS + 1000)
@@ -0,0 +1,124 @@
+import os
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+from modules import image_cache
+
+CDN_URL = "https://m.media-amazon.com/images/I/71kurta.jpg"
+
+def _resolves_to(monkeypatch, *ips):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET6 if ":" in ip else socket.AF_INET, socket.SOCK_STREAM, 6, "", (ip, port)) for ip in ips]
+    monkeypatch.setattr(image_cache.socket, "getaddrinfo", getaddrinfo)
+
+@pytest.mark.parametrize("url", [
+    CDN_URL,
+    "http://images-eu.ssl-images-amazon.com/images/I/81shirt.jpg",
+    "https://rukminim2.flixcart.com/image/312/312/kurta.jpeg",
+])
+def test_storefront_cdns_are_allowed(url):
+    assert image_cache._host_allowed(url)
+
+@pytest.mark.parametrize("url", [
+    "https://example.com/kurta.jpg",
+    "https://m.media-amazon.com.attacker.net/kurta.jpg",
+    "https://attacker.net/m.media-amazon.com/kurta.jpg",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://localhost:8501/app/static/x.jpg",
+    "file:///etc/passwd",
+    "ftp://m.media-amazon.com/images/I/71kurta.jpg",
+])
+def test_other_hosts_and_schemes_are_rejected(url):
+    assert not image_cache._host_allowed(url)
+
+def test_cdn_resolving_to_public_addresses_is_fetchable(monkeypatch):
+    _resolves_to(monkeypatch, "23.52.184.13", "2600:1406:3a00::17")
+    assert image_cache.is_fetchable(CDN_URL)
+
+@pytest.mark.parametrize("ip", ["127.0.0.1", "10.0.0.8", "192.168.1.20", "169.254.169.254", "::1", "fd00::1"])
+def test_cdn_resolving_to_private_or_loopback_is_rejected(monkeypatch, ip):
+    _resolves_to(monkeypatch, "23.52.184.13", ip)
+    assert not image_cache.is_fetchable(CDN_URL)
+
+def test_unresolvable_host_is_rejected(monkeypatch):
+    def getaddrinfo(*args, **kwargs):
+        raise socket.gaierror("no such host")
+    monkeypatch.setattr(image_cache.socket, "getaddrinfo", getaddrinfo)
+    assert not image_cache.is_fetchable(CDN_URL)
+
+def test_redirects_are_checked_like_the_original(monkeypatch):
+    _resolves_to(monkeypatch, "23.52.184.13")
+    handler = image_cache._CheckedRedirects()
+    request = urllib.request.Request(CDN_URL)
+    follow = handler.redirect_request(request, None, 302, "Found", {}, "https://m.media-amazon.com/images/I/moved.jpg")
+    assert follow.full_url == "https://m.media-amazon.com/images/I/moved.jpg"
+    for target in ("http://169.254.169.254/latest/meta-data/", "https://attacker.net/x.jpg"):
+        with pytest.raises(urllib.error.HTTPError):
+            handler.redirect_request(request, None, 302, "Found", {}, target)
+
+def test_redirect_to_cdn_name_on_private_address_is_rejected(monkeypatch):
+    _resolves_to(monkeypatch, "10.0.0.8")
+    with pytest.raises(urllib.error.HTTPError):
+        image_cache._CheckedRedirects().redirect_request(
+            urllib.request.Request(CDN_URL), None, 302, "Found", {}, "https://m.media-amazon.com/images/I/moved.jpg"
+        )
+
+def test_disallowed_urls_are_returned_without_fetching(monkeypatch):
+    def fetch(url):
+        raise AssertionError(f"fetched {url}")
+    monkeypatch.setattr(image_cache, "_fetch_and_resize", fetch)
+    assert image_cache.cached_image_url("http://169.254.169.254/x.jpg") == "http://169.254.169.254/x.jpg"
+    _resolves_to(monkeypatch, "127.0.0.1")
+    assert image_cache.cached_image_url(CDN_URL) == CDN_URL
+
+# --- LRU eviction -----------------------------------------------------------------
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(image_cache, "_total_bytes", None)
+    monkeypatch.setattr(image_cache, "CACHE_MAX_BYTES", 1000)
+    return tmp_path
+
+def _cached_file(directory, name, size, mtime):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+def test_eviction_removes_least_recently_used_first(cache_dir):
+    oldest = _cached_file(cache_dir, "a.jpg", 300, 1000)
+    middle = _cached_file(cache_dir, "b.jpg", 300, 2000)
+    newest = _cached_file(cache_dir, "c.jpg", 300, 3000)
+    incoming = _cached_file(cache_dir, "d.jpg", 300, 4000)
+    generation = image_cache.generation()
+
+    image_cache._evict_if_needed(incoming.stat().st_size)
+
+    # 1200 bytes against a 1000 budget: evicts down to 90% (900), oldest first
+    assert not oldest.exists()
+    assert middle.exists() and newest.exists() and incoming.exists()
+    assert image_cache._total_bytes == 900
+    assert image_cache.generation() == generation + 1
+
+def test_cache_hit_refreshes_recency(cache_dir, monkeypatch):
+    monkeypatch.setattr(image_cache, "_fetch_and_resize", lambda url: b"y" * 300)
+    _resolves_to(monkeypatch, "23.52.184.13")
+    hit = _cached_file(cache_dir, image_cache._cache_name(CDN_URL), 300, 1000)
+    other = _cached_file(cache_dir, "b.jpg", 300, 2000)
+    _cached_file(cache_dir, "c.jpg", 300, 3000)
+
+    assert image_cache.cached_image_url(CDN_URL).endswith(hit.name)  # touches the file
+    image_cache.cached_image_url("https://m.media-amazon.com/images/I/new.jpg")  # 1200 bytes: one must go
+
+    assert hit.exists() and not other.exists()
+
+def test_under_budget_evicts_nothing(cache_dir):
+    files = [_cached_file(cache_dir, f"{n}.jpg", 200, 1000 + n) for n in range(4)]
+    generation = image_cache.generation()
+    image_cache._evict_if_needed(200)
+    assert all(f.exists() for f in files)
+    assert image_cache.generation() == generation
@@ -0,0 +1,123 @@
+import pytest
+
+from modules import model_router, rate_limiter, resilience
+
+LITE, FLASH_15, FLASH, PRO = "gemini-2.0-flash-lite", "gemini-1.5-flash", "gemini-2.0-flash", "gemini-1.5-pro"
+
+OFFERED_SEARCH = [
+    {"role": "user", "content": "what goes with my navy blazer?"},
+    {"role": "assistant", "content": "Beige chinos work well. Shall I search for some for you?"},
+]
+SHOWED_CARDS = [
+    {"role": "user", "content": "find me a black kurta"},
+    {"role": "assistant", "content": "Here are some picks:\n\n### 🛍️ Black Cotton Kurta\n₹899"},
+]
+STYLED = [
+    {"role": "user", "content": "what should I wear to dinner?"},
+    {"role": "assistant", "content": "Try your white shirt with the grey trousers and brown loafers."},
+]
+
+@pytest.fixture(autouse=True)
+def router(monkeypatch):
+    """Routing on, no latency history, and no waiting between rate-limit retries."""
+    monkeypatch.setattr(model_router, "ROUTING_ENABLED", True)
+    monkeypatch.setattr(resilience, "_trackers", {})
+    monkeypatch.setattr(rate_limiter, "_gates", {})
+    monkeypatch.setattr(rate_limiter, "BASE_BACKOFF", 0.0)
+
+@pytest.mark.parametrize("user_input, history, route", [
+    # First turn of a conversation
+    ("hi", [], "smalltalk"),
+    ("ok", [], "smalltalk"),
+    ("find me a black kurta under 2000", [], "shopping"),
+    ("what should I wear to a wedding?", [], "wardrobe"),
+    ("do my sneakers go with chinos", [], "wardrobe"),
+    ("tell me about linen", [], "wardrobe"),
+    # Follow-ups to a turn that searched and showed product cards
+    ("make it cheaper", SHOWED_CARDS, "shopping"),
+    ("any in blue?", SHOWED_CARDS, "shopping"),
+    ("thanks", SHOWED_CARDS, "smalltalk"),
+    # Accepting an offer continues the offered route; a pleasantry is still small talk
+    ("yes please", OFFERED_SEARCH, "shopping"),
+    ("yes", OFFERED_SEARCH, "shopping"),
+    ("go ahead", OFFERED_SEARCH, "shopping"),
+    ("perfect", OFFERED_SEARCH, "smalltalk"),
+    ("okay", STYLED, "wardrobe"),
+    ("something more casual?", STYLED, "wardrobe"),
+    # An explicit new request wins over the previous route
+    ("show me sunglasses", STYLED, "shopping"),
+])
+def test_classify_turn(user_input, history, route):
+    assert model_router.classify_turn(user_input, history) == route
+
+@pytest.mark.parametrize("route, selected, chain", [
+    # Cheap routes start on the cheapest model and keep the user's model as the last resort
+    ("smalltalk", FLASH, [LITE, FLASH_15, FLASH]),
+    ("format", PRO, [LITE, FLASH_15, PRO]),
+    ("format", LITE, [LITE, FLASH_15]),
+    # Styling and shopping lead with the user's model when it meets the tier...
+    ("wardrobe", FLASH, [FLASH, FLASH_15]),
+    ("shopping", PRO, [PRO, FLASH_15]),
+    # ...and skip it, except as the last resort, when it does not
+    ("shopping", LITE, [FLASH_15, FLASH, LITE]),
+    ("unknown", PRO, [PRO]),
+])
+def test_route_chain(route, selected, chain):
+    assert model_router.route_chain(route, selected) == chain
+
+def test_route_chain_demotes_models_over_their_latency_target():
+    for _ in range(10):
+        resilience.latency_for(f"model:{LITE}").record(5.0)  # smalltalk target is 2 s
+    assert model_router.route_chain("format", PRO) == [FLASH_15, FLASH, PRO]
+
+def test_routing_off_uses_the_selected_model(monkeypatch):
+    monkeypatch.setattr(model_router, "ROUTING_ENABLED", False)
+    assert model_router.route_chain("format", PRO) == [PRO]
+
+# --- call(): falling back down the chain --------------------------------------------
+
+class ApiError(Exception):
+    def __init__(self, code, message=""):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+class Models:
+    """fn for model_router.call(): raises the error listed for a model, otherwise answers."""
+
+    def __init__(self, **errors):
+        self.errors = errors
+        self.calls = []
+
+    def __call__(self, model):
+        self.calls.append(model)
+        error = self.errors.get(model.replace("-", "_").replace(".", "_"))
+        if error is not None:
+            raise error
+        return f"reply from {model}"
+
+@pytest.mark.parametrize("error, attempts_on_lite", [
+    (ApiError(429, "RESOURCE_EXHAUSTED"), 1 + model_router.FALLBACK_RETRIES),  # quota: short retry, then fall back
+    (ApiError(503, "UNAVAILABLE"), 1 + model_router.FALLBACK_RETRIES),
+    (ApiError(400, "INVALID_ARGUMENT"), 1),                                    # not retryable: straight to the next
+    (ValueError("empty response"), 1),
+])
+def test_call_falls_back_to_the_next_model(error, attempts_on_lite):
+    models = Models(gemini_2_0_flash_lite=error)
+    assert model_router.call("test-key", "format", PRO, models, stage="test") == (f"reply from {FLASH_15}", FLASH_15)
+    assert models.calls == [LITE] * attempts_on_lite + [FLASH_15]
+
+def test_call_records_latency_only_for_the_model_that_answered():
+    models = Models(gemini_2_0_flash_lite=ApiError(400))
+    model_router.call("test-key", "format", PRO, models, stage="test")
+    assert resilience.latency_for(f"model:{LITE}").percentile(0.5) is None
+    assert resilience.latency_for(f"model:{FLASH_15}").percentile(0.5) is not None
+
+def test_call_raises_the_last_error_when_every_model_fails():
+    models = Models(
+        gemini_2_0_flash_lite=ApiError(400, "lite"),
+        gemini_1_5_flash=ApiError(400, "flash"),
+        gemini_1_5_pro=ApiError(400, "pro"),
+    )
+    with pytest.raises(ApiError, match="pro"):
+        model_router.call("test-key", "format", PRO, models, stage="test")
+    assert models.calls == [LITE, FLASH_15, PRO]
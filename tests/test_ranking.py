@@ -0,0 +1,29 @@
+from modules import ranking
+
+def _product(name, link):
+    return {"product_name": name, "product_link": link, "asin": None}
+
+def test_same_title_different_brand_stays_separate():
+    products = [
+        _product("Allen Solly Mens Solid Regular Fit Cotton Casual Shirt with Full Sleeves", "https://a/1"),
+        _product("US Polo Assn Mens Solid Regular Fit Cotton Casual Shirt with Full Sleeves", "https://a/2"),
+        _product("Amazon Brand - Symbol Mens Solid Regular Fit Cotton Casual Shirt with Full Sleeves", "https://a/3"),
+        _product("Manyavar Men Silk Blend Kurta Pyjama Set for Wedding", "https://a/4"),
+        _product("Fabindia Men Silk Blend Kurta Pyjama Set for Wedding", "https://a/5"),
+    ]
+    assert len(set(ranking.group_duplicates(products))) == 5
+
+    variants = ranking.VariantFilter()
+    assert all(variants.is_new(p) for p in products)
+
+def test_colour_variants_of_one_listing_are_grouped():
+    products = [
+        _product("Manyavar Men Silk Blend Kurta Pyjama Set for Wedding - Maroon", "https://a/1"),
+        _product("Manyavar Men Silk Blend Kurta Pyjama Set for Wedding - Navy Blue", "https://a/2"),
+    ]
+    groups = ranking.group_duplicates(products)
+    assert groups[0] == groups[1]
+
+    variants = ranking.VariantFilter()
+    assert variants.is_new(products[0])
+    assert not variants.is_new(products[1])
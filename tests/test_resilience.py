@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+
+from modules import resilience, ecommerce_scraper, storefronts
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+def _tripped_breaker(monkeypatch, clock):
+    """An open breaker whose reset timeout has just passed: the next allow() is the trial."""
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = resilience.CircuitBreaker("fake-site", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    clock.now += 60
+    return breaker
+
+def test_cancelled_trial_crawl_releases_the_half_open_breaker(monkeypatch):
+    clock = FakeClock()
+    breaker = _tripped_breaker(monkeypatch, clock)
+    monkeypatch.setattr(resilience, "breaker_for", lambda name: breaker)
+    started = asyncio.Event()
+
+    async def never_finishes(*args):
+        started.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(ecommerce_scraper, "_scrape_page", never_finishes)
+
+    async def cancel_trial():
+        task = asyncio.create_task(
+            ecommerce_scraper._scrape_page_resilient(storefronts.AmazonAdapter(), "kurta", 1, 5, "key")
+        )
+        await started.wait()
+        assert breaker.state == "half_open"
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(cancel_trial())
+    assert breaker.state == "open"
+    assert breaker.allow() and breaker.state == "half_open"
+
+# --- CircuitBreaker ---------------------------------------------------------------
+
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    monkeypatch.setattr(resilience, "time", FakeClock())
+    breaker = resilience.CircuitBreaker("fake-site", failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+def test_breaker_lets_one_trial_through_after_the_reset_timeout(monkeypatch):
+    clock = FakeClock()
+    breaker = _tripped_breaker(monkeypatch, clock)
+    clock.now -= 1
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # only one trial at a time
+
+def test_successful_trial_closes_the_breaker(monkeypatch):
+    clock = FakeClock()
+    breaker = _tripped_breaker(monkeypatch, clock)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0 and breaker.allow()
+
+def test_failed_trial_reopens_for_another_reset_timeout(monkeypatch):
+    clock = FakeClock()
+    breaker = _tripped_breaker(monkeypatch, clock)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened_at == clock.now
+    clock.now += 59
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+def test_release_trial_only_affects_a_half_open_breaker(monkeypatch):
+    clock = FakeClock()
+    breaker = _tripped_breaker(monkeypatch, clock)
+    breaker.release_trial()
+    assert breaker.state == "open"
+    breaker.record_success()
+    breaker.release_trial()
+    assert breaker.state == "closed"
+
+# --- LatencyTracker ---------------------------------------------------------------
+
+def test_hedge_delay_defaults_until_enough_samples():
+    tracker = resilience.LatencyTracker()
+    for _ in range(resilience.HEDGE_MIN_SAMPLES - 1):
+        tracker.record(5.0)
+    assert tracker.hedge_delay() == resilience.HEDGE_DEFAULT_DELAY
+
+def test_hedge_delay_is_the_clamped_p95():
+    tracker = resilience.LatencyTracker()
+    for seconds in range(1, 21):  # 0.5 s .. 10 s: p95 is 10 s
+        tracker.record(float(seconds) / 2)
+    assert tracker.hedge_delay() == 10.0
+
+    fast = resilience.LatencyTracker()
+    for _ in range(20):
+        fast.record(0.5)
+    assert fast.hedge_delay() == resilience.HEDGE_MIN_DELAY
+
+    slow = resilience.LatencyTracker()
+    for _ in range(20):
+        slow.record(60.0)
+    assert slow.hedge_delay() == resilience.HEDGE_MAX_DELAY
+
+def test_latency_window_drops_old_samples():
+    tracker = resilience.LatencyTracker(window=10)
+    for _ in range(10):
+        tracker.record(60.0)
+    for _ in range(10):
+        tracker.record(4.0)
+    assert tracker.percentile(0.95) == 4.0
+
+# --- hedged() ---------------------------------------------------------------------
+
+class Attempts:
+    """Factory for hedged(): attempt n runs behaviours[n] and the outcome of each is recorded."""
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.started = 0
+        self.cancelled = []
+
+    def __call__(self):
+        behaviour = self.behaviours[self.started]
+        number = self.started
+        self.started += 1
+
+        async def attempt():
+            try:
+                return await behaviour()
+            except asyncio.CancelledError:
+                self.cancelled.append(number)
+                raise
+        return attempt()
+
+async def _hang():
+    await asyncio.Event().wait()
+
+def _returns(value):
+    async def behaviour():
+        await asyncio.sleep(0)
+        return value
+    return behaviour
+
+def _raises(error):
+    async def behaviour():
+        await asyncio.sleep(0)
+        raise error
+    return behaviour
+
+def _run_hedged(attempts, delay=0.01):
+    async def run():
+        result = await resilience.hedged(attempts, delay, label="test")
+        await asyncio.sleep(0)  # let cancelled attempts unwind
+        return result
+    return asyncio.run(run())
+
+def test_hedged_fast_result_needs_no_backup():
+    attempts = Attempts(_returns(["a"]), _returns(["b"]))
+    assert _run_hedged(attempts, delay=5) == ["a"]
+    assert attempts.started == 1
+
+def test_hedged_slow_attempt_is_backed_up_and_cancelled():
+    attempts = Attempts(_hang, _returns(["backup"]))
+    assert _run_hedged(attempts) == ["backup"]
+    assert attempts.started == 2 and attempts.cancelled == [0]
+
+def test_hedged_early_failure_fires_the_backup_at_once():
+    attempts = Attempts(_raises(RuntimeError("blocked")), _returns(["backup"]))
+    assert _run_hedged(attempts, delay=5) == ["backup"]
+
+def test_hedged_empty_results_return_the_last_empty():
+    attempts = Attempts(_returns([]), _returns([]))
+    assert _run_hedged(attempts, delay=5) == []
+    assert attempts.started == 2
+
+def test_hedged_raises_when_every_attempt_fails():
+    attempts = Attempts(_raises(RuntimeError("first")), _raises(RuntimeError("second")))
+    with pytest.raises(RuntimeError, match="second"):
+        _run_hedged(attempts, delay=5)
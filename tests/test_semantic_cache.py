@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from modules import semantic_cache, wardrobe
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    """An empty cache in "on" mode over a wardrobe with one shirt and one pair of chinos."""
+    monkeypatch.setattr(semantic_cache, "CACHE_MODE", "on")
+    monkeypatch.setattr(semantic_cache, "_entries", [])
+    monkeypatch.setattr(semantic_cache, "_vectors", None)
+    monkeypatch.setattr(wardrobe, "WARDROBE_ROOT", str(tmp_path / "wardrobe"))
+    wardrobe.init_wardrobe()
+    (tmp_path / "wardrobe" / "upper_body" / "black shirt.jpg").write_bytes(b"jpg")
+    (tmp_path / "wardrobe" / "lower_body" / "beige chinos.jpg").write_bytes(b"jpg")
+    return tmp_path / "wardrobe"
+
+@pytest.fixture
+def same_embedding(monkeypatch):
+    """Every question embeds identically, so only the exact-match checks can tell them apart."""
+    vector = np.zeros(semantic_cache.EMBEDDING_DIM, dtype=np.float32)
+    vector[0] = 1.0
+    monkeypatch.setattr(semantic_cache, "embed", lambda question: vector)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+def _store(question, answer, gender="male", history=None, context=""):
+    return semantic_cache.store(question, history or [], gender, context, answer)
+
+def _lookup(question, gender="male", history=None, context=""):
+    return semantic_cache.lookup(question, history or [], gender, context)
+
+def test_rephrased_question_hits():
+    _store("what should I wear to a beach wedding?", "Linen shirt and chinos.")
+    assert _lookup("What to wear for a beach wedding") == "Linen shirt and chinos."
+
+@pytest.mark.parametrize("stored, asked", [
+    ("suggest a black kurta under 2000", "suggest a black kurta under 3000"),          # budget
+    ("formal shirt in size 40 for office", "formal shirt in size 42 for office"),      # size
+    ("what goes with my navy blazer for a wedding", "what goes with my navy jacket for a wedding"),  # garment
+    ("black sneakers for college", "black loafers for college"),                  # garment, same category
+])
+def test_near_duplicates_asking_for_something_else_miss(same_embedding, stored, asked):
+    _store(stored, "cached answer")
+    assert _lookup(stored) == "cached answer"
+    assert _lookup(asked) is None
+
+def test_other_gender_misses(same_embedding):
+    _store("what to wear to a wedding", "A sherwani.", gender="male")
+    assert _lookup("what to wear to a wedding", gender="female") is None
+
+def test_follow_ups_are_not_cached():
+    history = [{"role": "user", "content": "find me a kurta"}, {"role": "assistant", "content": "Here you go."}]
+    _store("show me that in blue", "Blue kurtas.", history=history)
+    assert _lookup("show me that in blue") is None
+
+def test_expired_answers_miss(same_embedding, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(semantic_cache, "time", clock)
+    semantic_cache.store("black kurta under 2000", [], "male", "", "Kurtas.", ttl=60)
+    assert _lookup("black kurta under 2000") == "Kurtas."
+    clock.now += 61
+    assert _lookup("black kurta under 2000") is None
+
+def test_strict_mode_needs_the_same_wardrobe_context(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "CACHE_MODE", "strict")
+    _store("what to wear to a wedding", "The black shirt.", context="shirts: black shirt.jpg")
+    assert _lookup("what to wear to a wedding", context="shirts: black shirt.jpg") == "The black shirt."
+    assert _lookup("what to wear to a wedding", context="shirts: black shirt.jpg, white shirt.jpg") is None
+
+def test_new_item_in_the_asked_category_invalidates(cache):
+    _store("which shirt goes with chinos", "The black shirt.")
+    _store("which sneakers go with jeans", "White ones.")
+    (cache / "upper_body" / "white shirt.jpg").write_bytes(b"jpg")
+    assert _lookup("which shirt goes with chinos") is None
+    assert _lookup("which sneakers go with jeans") == "White ones."
+
+def test_invalidate_item_drops_answers_that_named_it():
+    _store("what to wear to a wedding", "Your black shirt.jpg with a blazer.")
+    _store("what to wear to the office", "The black shirt.jpg and beige chinos.jpg.")
+    _store("what to wear to the beach", "The beige chinos.jpg.")
+
+    assert semantic_cache.invalidate_item("upper_body", "black shirt.jpg") == 2
+    assert _lookup("what to wear to a wedding") is None
+    assert _lookup("what to wear to the office") is None
+    assert _lookup("what to wear to the beach") == "The beige chinos.jpg."
+    assert semantic_cache.invalidate_item("upper_body", "black shirt.jpg") == 0
+
+def test_invalidating_the_last_entry_empties_the_cache():
+    _store("what to wear to a wedding", "Your black shirt.jpg.")
+    assert semantic_cache.invalidate_item("upper_body", "black shirt.jpg") == 1
+    assert _lookup("what to wear to a wedding") is None
+    _store("what to wear to the beach", "The beige chinos.jpg.")
+    assert _lookup("what to wear to the beach") == "The beige chinos.jpg."
@@ -0,0 +1,96 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from modules import wardrobe, wardrobe_snapshot
+
+@pytest.fixture
+def wardrobe_root(tmp_path, monkeypatch):
+    root = tmp_path / "wardrobe"
+    monkeypatch.setattr(wardrobe, "WARDROBE_ROOT", str(root))
+    wardrobe.init_wardrobe()
+    _add_item(root, "upper_body", "black shirt.jpg", (20, 20, 20))
+    _add_item(root, "lower_body", "beige chinos.png", (200, 180, 140))
+    return root
+
+def _add_item(root, folder, name, color):
+    buf = io.BytesIO()
+    Image.new("RGB", (60, 80), color).save(buf, format="PNG" if name.endswith(".png") else "JPEG")
+    (root / folder / name).write_bytes(buf.getvalue())
+    return root / folder / name
+
+def _contents(root):
+    return {f"{p.parent.name}/{p.name}": p.read_bytes() for p in root.glob("*/*") if p.is_file()}
+
+def test_round_trip_restores_every_item(wardrobe_root):
+    before = _contents(wardrobe_root)
+    data = wardrobe_snapshot.export_bytes()
+    for path in wardrobe_root.glob("*/*"):
+        path.unlink()
+
+    assert wardrobe_snapshot.import_bytes(data) == {"written": 2, "skipped": 0}
+    assert _contents(wardrobe_root) == before
+
+def test_import_keeps_existing_items_unless_overwrite(wardrobe_root):
+    data = wardrobe_snapshot.export_bytes()
+    shirt = wardrobe_root / "upper_body" / "black shirt.jpg"
+    shirt.write_bytes(b"edited")
+
+    assert wardrobe_snapshot.import_bytes(data) == {"written": 0, "skipped": 2}
+    assert shirt.read_bytes() == b"edited"
+    assert wardrobe_snapshot.import_bytes(data, overwrite=True) == {"written": 2, "skipped": 0}
+    assert shirt.read_bytes() != b"edited"
+
+def test_incremental_snapshot_reuses_its_base(wardrobe_root, tmp_path):
+    base, incremental = str(tmp_path / "base.ffws"), str(tmp_path / "incremental.ffws")
+    wardrobe_snapshot.export_snapshot(base)
+    _add_item(wardrobe_root, "feet", "brown shoe.jpg", (120, 70, 30))
+    before = _contents(wardrobe_root)
+
+    assert wardrobe_snapshot.export_snapshot(incremental, base) == {"stored": 1, "reused": 2, "total": 3}
+    for path in wardrobe_root.glob("*/*"):
+        path.unlink()
+    assert wardrobe_snapshot.import_snapshot(incremental) == {"written": 3, "skipped": 0}
+    assert _contents(wardrobe_root) == before
+
+    with open(incremental, "rb") as f, pytest.raises(ValueError):
+        wardrobe_snapshot.import_bytes(f.read())
+
+def _corrupt_index(data, change):
+    """Snapshot bytes with the JSON index rewritten by `change` (footer updated to match)."""
+    index_offset, index_length, magic = wardrobe_snapshot.FOOTER.unpack(data[-wardrobe_snapshot.FOOTER.size:])
+    index = json.loads(data[index_offset:index_offset + index_length])
+    change(index)
+    index_bytes = json.dumps(index).encode("utf-8")
+    return data[:index_offset] + index_bytes + wardrobe_snapshot.FOOTER.pack(index_offset, len(index_bytes), magic)
+
+def _point_past_the_blobs(index):
+    entry = next(iter(index["items"].values()))
+    entry["blob"] = [entry["blob"][0], 10 ** 9]
+
+@pytest.mark.parametrize("mangle", [
+    lambda data: b"",
+    lambda data: data[:len(data) // 2],                       # truncated: no footer
+    lambda data: data[:-1],                                   # footer cut short
+    lambda data: b"NOTASNAP" + data[8:],
+    lambda data: data[:-wardrobe_snapshot.FOOTER.size] + wardrobe_snapshot.FOOTER.pack(
+        len(data), 50, wardrobe_snapshot.MAGIC),               # index offset past the end
+    lambda data: _corrupt_index(data, lambda index: index.pop("items")),
+    lambda data: _corrupt_index(data, lambda index: next(iter(index["items"].values())).pop("blob")),
+    lambda data: _corrupt_index(data, _point_past_the_blobs),
+], ids=["empty", "truncated", "short-footer", "bad-magic", "index-offset", "no-items", "no-blob", "blob-offset"])
+def test_malformed_snapshots_raise_value_error(wardrobe_root, mangle):
+    data = wardrobe_snapshot.export_bytes()
+    before = _contents(wardrobe_root)
+    with pytest.raises(ValueError):
+        wardrobe_snapshot.import_bytes(mangle(data), overwrite=True)
+    assert _contents(wardrobe_root) == before
+
+def test_corrupt_index_bytes_raise_value_error(wardrobe_root):
+    data = bytearray(wardrobe_snapshot.export_bytes())
+    index_offset, _, _ = wardrobe_snapshot.FOOTER.unpack(bytes(data[-wardrobe_snapshot.FOOTER.size:]))
+    data[index_offset:index_offset + 4] = b"\xff\xfe\x00{"
+    with pytest.raises(ValueError):
+        wardrobe_snapshot.import_bytes(bytes(data))